@@ -0,0 +1,2 @@
+Added the ``STAGES_ADAPTIVE_PIPELINE`` setting to tune the batch sizes and queue depths of Stages
+API pipelines while they run. The throughput and blocked time of each stage are now logged.
@@ -0,0 +1,2 @@
+Workers now look for a task to run in a single pass over the unfinished tasks, read in bounded
+windows, instead of iterating over every incomplete task again for each task they start.
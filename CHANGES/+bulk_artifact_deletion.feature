@@ -0,0 +1,2 @@
+Orphan cleanup and reclaim space now delete artifacts in batches, and delete their files in
+parallel, or with ``DeleteObjects`` requests on S3.
@@ -0,0 +1,2 @@
+Pulp imports now register artifacts in bulk, and place their files into the storage in batches
+with a pool of threads.
@@ -0,0 +1,8 @@
+The content app now stores cached responses in a compact binary format, fetches the content guard
+check and the response from Redis in one round trip, and can keep responses in memory in front of
+Redis with ``CACHE_LOCAL_SIZE``.
+The new entries are stored under their own Redis keys, so content apps of different versions never
+read each other's entries during a rolling upgrade, and upgraded content apps start with an empty
+cache. Invalidations by API servers and workers that are not upgraded yet do not reach the new
+entries, so upgrade those before the content apps, or wait for ``CACHE_SETTINGS["EXPIRES_TTL"]``
+after the upgrade for stale responses to expire.
@@ -0,0 +1,2 @@
+ContentSaver now inserts new content units with one statement per content type, for content types
+whose saving does not run any custom code.
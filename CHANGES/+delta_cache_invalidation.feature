@@ -0,0 +1,2 @@
+Added ``CACHE_DELTA_INVALIDATION_MAX_PATHS`` to only invalidate the cached responses of the paths
+that changed when a new publication or repository version is created, or when space is reclaimed.
@@ -0,0 +1,2 @@
+Added the ``DISTRIBUTION_CACHE_ENABLED`` setting to cache matched distributions in each content app
+process.
@@ -0,0 +1,2 @@
+Added the ``DOWNLOAD_CONNECTION_POOLING`` setting to keep connections to remotes alive and reuse
+them across downloads.
@@ -0,0 +1,2 @@
+Pulp exports are now hashed while they are written and split into chunks without the ``split``
+command. Added the ``EXPORT_COMPRESSION_THREADS`` setting to compress exports with several threads.
@@ -0,0 +1,2 @@
+Added the ``OBJECT_STORAGE_CACHE_DIR`` setting to serve artifacts kept in object storage from a
+local, size-bounded disk cache when the content app does not redirect to the storage.
@@ -0,0 +1,2 @@
+Added the ``ON_DEMAND_RANGE_REQUESTS`` setting to forward Range requests for on-demand content
+that is not saved to the remote, with a per-process sparse cache of the fetched ranges.
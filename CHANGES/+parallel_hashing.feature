@@ -0,0 +1,2 @@
+Large chunks of downloaded and uploaded data are now hashed with all the checksum algorithms
+concurrently in a thread pool, off the event loop for downloads.
@@ -0,0 +1 @@
+Sped up matching declared artifacts against existing ones in the ``QueryExistingArtifacts`` stage.
@@ -0,0 +1,2 @@
+Repository versions now index their content artifacts by relative path when completed, so the
+content app serves repository versions with a single indexed lookup.
@@ -0,0 +1,2 @@
+HttpDownloader now resumes a failed download where it stopped on retry, with a Range request,
+when the server supports it.
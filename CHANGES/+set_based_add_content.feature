@@ -0,0 +1,2 @@
+``RepositoryVersion.add_content``, ``remove_content`` and ``set_content`` now run entirely in the
+database, without loading the primary keys of the content into memory.
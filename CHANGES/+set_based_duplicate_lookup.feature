@@ -0,0 +1,2 @@
+Existing content artifacts in ContentSaver and repository duplicates in ``remove_duplicates`` are
+now looked up with set-based queries instead of large OR'ed filters.
@@ -0,0 +1,4 @@
+Added ``ShardedStage`` to run parallel replicas of a Stages API stage, each with its own database
+connection, and the ``STAGES_DATABASE_REPLICAS`` setting to use it for the stages saving artifacts
+and content during syncs. The order of the content passing through a ``ShardedStage`` is not
+preserved.
@@ -0,0 +1,2 @@
+Concurrent requests for the same on-demand content are now served from a single download of it
+per content app process, instead of each request downloading it from the remote.
@@ -0,0 +1,3 @@
+Artifacts in object storage are now streamed into Pulp exports instead of being copied to a
+temporary file first. Added the ``EXPORT_PREFETCH_ARTIFACTS`` setting to read the next artifacts
+ahead in parallel.
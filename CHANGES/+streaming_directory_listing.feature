@@ -0,0 +1,2 @@
+Directory listings of the content app are now computed in the database and streamed to the client
+when they are large. They can be paged through with the ``limit`` and ``offset`` query parameters.
@@ -0,0 +1,2 @@
+Pulp imports now read the exported tarball once, streaming the artifact files into the storage
+instead of extracting the whole tarball to disk first.
@@ -0,0 +1,2 @@
+Scoping querysets by roles no longer casts the primary key of every object to text, nor loads the
+objects of the permitted domains, or of each type of a master viewset, into memory.
@@ -0,0 +1,2 @@
+Added the ``--slots`` option to ``pulpcore-worker`` to run several tasks at once in one worker,
+sharing its heartbeat and database connection.
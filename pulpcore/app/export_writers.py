@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ChunkedHashingWriter:
+    """
+    A write-only file object writing an export into one file, or into chunks of a fixed size.
+
+    The sha256 of the whole stream and of each file are computed while writing, so the files do
+    not need to be read again to be hashed. Chunks are named like the output of
+    ``split -a 4 -d``, i.e. ``<path>.0000``, ``<path>.0001``, and so on.
+
+    When used as a context manager, the files written are removed if an exception is raised.
+    """
+
+    def __init__(self, path, chunk_size=None):
+        """
+        Args:
+            path (str): The path of the export file, or the prefix of the chunks.
+            chunk_size (int): The size of the chunks in bytes, or `None` to write a single file.
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.global_hash = hashlib.sha256()
+        # The sha256 hex digest of each file written, by path
+        self.hashes = {}
+        self._file = None
+        self._file_path = None
+        self._file_hash = None
+        self._file_size = 0
+
+    def writable(self):
+        return True
+
+    def _open_file(self):
+        if self.chunk_size:
+            self._file_path = "{}.{:04d}".format(self.path, len(self.hashes))
+        else:
+            self._file_path = self.path
+        self._file = open(self._file_path, "wb")
+        self._file_hash = hashlib.sha256()
+        self._file_size = 0
+        self.hashes[self._file_path] = None
+
+    def _close_file(self):
+        self._file.close()
+        self.hashes[self._file_path] = self._file_hash.hexdigest()
+        self._file = None
+
+    def write(self, data):
+        view = memoryview(data)
+        size = len(view)
+        while view:
+            if self._file is None:
+                self._open_file()
+            length = len(view)
+            if self.chunk_size:
+                length = min(length, self.chunk_size - self._file_size)
+            part = view[:length]
+            self._file.write(part)
+            self._file_hash.update(part)
+            self.global_hash.update(part)
+            self._file_size += length
+            view = view[length:]
+            if self.chunk_size and self._file_size == self.chunk_size:
+                self._close_file()
+        return size
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._close_file()
+
+    def remove(self):
+        """Close and remove all the files written."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        for path in self.hashes:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # no matter what went wrong, we can't trust the files we created.
+            self.remove()
+
+
+class ParallelGzipWriter:
+    """
+    A write-only file object compressing a stream into gzip format with several threads.
+
+    The stream is cut into blocks that are compressed independently, each into a gzip member of
+    its own. A gzip file made of several members is valid, it is read by all gzip readers (e.g.
+    ``tarfile.open(path, "r:gz")`` or ``gunzip``) as the concatenation of its members.
+    """
+
+    BLOCK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, fileobj, threads, compresslevel=1, block_size=BLOCK_SIZE):
+        """
+        Args:
+            fileobj: The file object to write the compressed stream to.
+            threads (int): The number of threads compressing blocks.
+            compresslevel (int): The gzip compression level.
+            block_size (int): The number of bytes of the stream compressed by a thread at once.
+        """
+        self.fileobj = fileobj
+        self.threads = threads
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self._buffer = bytearray()
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+
+    def writable(self):
+        return True
+
+    def _write_compressed(self, max_pending):
+        # Blocks are written in order, waiting for the oldest one to be compressed
+        while len(self._pending) > max_pending:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def _submit(self, block):
+        # zlib releases the GIL while compressing, so the blocks are compressed in parallel
+        self._pending.append(
+            self._executor.submit(gzip.compress, block, self.compresslevel, mtime=0)
+        )
+        # Bound the memory used by blocks waiting to be compressed or written
+        self._write_compressed(2 * self.threads)
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            self._submit(bytes(self._buffer[: self.block_size]))
+            del self._buffer[: self.block_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        """Compress and write the rest of the stream."""
+        if self._buffer:
+            self._submit(bytes(self._buffer))
+            self._buffer = bytearray()
+        self._write_compressed(0)
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            for future in self._pending:
+                future.cancel()
+            self._executor.shutdown()
@@ -15,9 +15,7 @@ class PulpTemporaryUploadedFile(TemporaryUploadedFile):
     """
 
     def __init__(self, name, content_type, size, charset, content_type_extra=None):
-        self.hashers = {}
-        for hasher in models.Artifact.DIGEST_FIELDS:
-            self.hashers[hasher] = pulp_hashlib.new(hasher)
+        self.hashers = pulp_hashlib.Hashers(models.Artifact.DIGEST_FIELDS)
         super().__init__(name, content_type, size, charset, content_type_extra)
 
     @classmethod
@@ -40,8 +38,7 @@ class PulpTemporaryUploadedFile(TemporaryUploadedFile):
         instance.file = file
         # Default 1MB
         while data := file.read(1048576):
-            for hasher in models.Artifact.DIGEST_FIELDS:
-                instance.hashers[hasher].update(data)
+            instance.hashers.update(data)
 
         # calling the method read() moves the file's pointer to the end of the file object,
         # thus, it is necessary to reset the file's pointer position back to 0 in case of
@@ -85,8 +82,7 @@ class HashingFileUploadHandler(TemporaryFileUploadHandler):
 
     def receive_data_chunk(self, raw_data, start):
         self.file.write(raw_data)
-        for hasher in models.Artifact.DIGEST_FIELDS:
-            self.file.hashers[hasher].update(raw_data)
+        self.file.hashers.update(raw_data)
 
 
 class TemporaryDownloadedFile(TemporaryUploadedFile):
@@ -4,6 +4,9 @@ import json
 import tarfile
 import tempfile
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
 
 from django.conf import settings
 from django.db.models.query import QuerySet
@@ -16,8 +19,13 @@ from pulpcore.app.modelresource import (
     ContentArtifactResource,
     RepositoryResource,
 )
+from pulpcore.app.util import get_domain
 from pulpcore.constants import TASK_STATES, EXPORT_BATCH_SIZE
 
+# Artifacts up to this size are prefetched into memory when EXPORT_PREFETCH_ARTIFACTS is set,
+# larger ones are streamed when their turn comes.
+PREFETCH_MAX_ARTIFACT_SIZE = 8 * 1024 * 1024
+
 log = logging.getLogger(__name__)
 
 
@@ -88,6 +96,64 @@ def export_versions(export, version_info):
     export.tarfile.addfile(info, io.BytesIO(version_json))
 
 
+def _open_artifact_file(storage, storage_class, name):
+    """
+    Open a stream of an artifact file in a storage.
+
+    S3 and Google Cloud Storage objects are streamed from the network, rather than downloaded
+    into a local temporary file first like the files of these storages are.
+    """
+    if storage_class in (
+        "storages.backends.s3boto3.S3Boto3Storage",
+        "storages.backends.gcloud.GoogleCloudStorage",
+    ):
+        from storages.utils import clean_name
+
+        # Keys are computed the way the storages do it
+        key = storage._normalize_name(clean_name(name))
+        if storage_class == "storages.backends.s3boto3.S3Boto3Storage":
+            return storage.bucket.Object(key).get()["Body"]
+        return storage.bucket.blob(key).open("rb")
+    return storage.open(name, "rb")
+
+
+def _artifact_files(artifacts, storage, storage_class):
+    """
+    Yield the artifacts along with a stream of their file.
+
+    With `EXPORT_PREFETCH_ARTIFACTS`, that many of the next artifacts up to
+    `PREFETCH_MAX_ARTIFACT_SIZE` are read into memory in parallel, while the current one is
+    written.
+    """
+    prefetch = settings.EXPORT_PREFETCH_ARTIFACTS
+    if not prefetch:
+        for artifact in artifacts:
+            yield artifact, _open_artifact_file(storage, storage_class, artifact.file.name)
+        return
+
+    def fetch(artifact):
+        if artifact.size > PREFETCH_MAX_ARTIFACT_SIZE:
+            return None
+        with closing(_open_artifact_file(storage, storage_class, artifact.file.name)) as f:
+            return io.BytesIO(f.read())
+
+    def next_file(pending):
+        artifact, future = pending.popleft()
+        fileobj = future.result()
+        if fileobj is None:
+            fileobj = _open_artifact_file(storage, storage_class, artifact.file.name)
+        return artifact, fileobj
+
+    with ThreadPoolExecutor(max_workers=prefetch) as executor:
+        pending = deque()
+        for artifact in artifacts:
+            pending.append((artifact, executor.submit(fetch, artifact)))
+            if len(pending) > prefetch:
+                yield next_file(pending)
+        while pending:
+            yield next_file(pending)
+
+
 def export_artifacts(export, artifacts):
     """
     Export a set of Artifacts, ArtifactResources, and RepositoryResources
@@ -100,18 +166,21 @@ def export_artifacts(export, artifacts):
         ValidationError: When path is not in the ALLOWED_EXPORT_PATHS setting
     """
     data = dict(message="Exporting Artifacts", code="export.artifacts", total=len(artifacts))
+    domain = get_domain()
     with ProgressReport(**data) as pb:
-        for artifact in pb.iter(artifacts):
-            dest = artifact.file.name
-            if settings.DEFAULT_FILE_STORAGE != "pulpcore.app.models.storage.FileSystem":
-                with tempfile.TemporaryDirectory(dir=".") as temp_dir:
-                    with tempfile.NamedTemporaryFile(dir=temp_dir) as temp_file:
-                        temp_file.write(artifact.file.read())
-                        temp_file.flush()
-                        artifact.file.close()
-                        export.tarfile.add(temp_file.name, dest)
-            else:
-                export.tarfile.add(artifact.file.path, dest)
+        if domain.storage_class == "pulpcore.app.models.storage.FileSystem":
+            for artifact in pb.iter(artifacts):
+                export.tarfile.add(artifact.file.path, artifact.file.name)
+        else:
+            # The files are streamed from the storage into the tarfile
+            artifact_files = _artifact_files(artifacts, domain.get_storage(), domain.storage_class)
+            for artifact, fileobj in pb.iter(artifact_files):
+                info = tarfile.TarInfo(name=artifact.file.name)
+                info.size = artifact.size
+                info.mtime = int(artifact.pulp_created.timestamp())
+                info.mode = 0o644
+                with closing(fileobj):
+                    export.tarfile.addfile(info, fileobj)
 
     resource = ArtifactResource()
     resource.queryset = artifacts
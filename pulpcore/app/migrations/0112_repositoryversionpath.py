@@ -0,0 +1,45 @@
+# Generated by Django 4.2.4 on 2023-09-20 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0111_task_enc_args_task_enc_kwargs"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RepositoryVersionPath",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("relative_path", models.TextField()),
+                (
+                    "content_artifact",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="core.contentartifact",
+                    ),
+                ),
+                (
+                    "repository_version",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="paths",
+                        to="core.repositoryversion",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["repository_version", "relative_path"],
+                        name="core_rvpath_version_path_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.4 on 2023-09-25 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("core", "0112_repositoryversionpath"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="task",
+            index=models.Index(
+                condition=models.Q(("state__in", ("waiting", "running", "canceling"))),
+                fields=["pulp_created"],
+                name="core_task_incomplete_idx",
+            ),
+        ),
+    ]
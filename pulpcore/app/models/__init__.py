@@ -65,6 +65,7 @@ from .repository import (
     RepositoryContent,
     RepositoryVersion,
     RepositoryVersionContentDetails,
+    RepositoryVersionPath,
 )
 
 from .status import ApiAppStatus, ContentAppStatus
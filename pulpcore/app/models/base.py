@@ -17,6 +17,19 @@ def pulp_uuid():
     return uuid7()
 
 
+_RANDOM_WORD_SQL = "lpad(to_hex(floor(random() * 4294967296)::bigint), 8, '0')"
+
+# SQL expression generating UUIDs like `pulp_uuid`, for rows created by INSERT ... SELECT: the
+# first 48 bits are the Unix time in milliseconds, followed by the version and variant bits and
+# random bits.
+PULP_UUID_SQL = (
+    "encode(set_byte(set_byte(overlay(decode({random}, 'hex') PLACING "
+    "substring(int8send(floor(extract(epoch FROM clock_timestamp()) * 1000)::bigint) FROM 3) "
+    "FROM 1 FOR 6), 6, 112 + floor(random() * 16)::int), 8, 128 + floor(random() * 64)::int), "
+    "'hex')::uuid"
+).format(random=" || ".join([_RANDOM_WORD_SQL] * 4))
+
+
 class BaseModel(LifecycleModel):
     """
     Base model class for all Pulp models.
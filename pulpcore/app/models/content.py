@@ -332,14 +332,13 @@ class Artifact(HandleTempFilesMixin, BaseModel):
         """
         if isinstance(file, str):
             with open(file, "rb") as f:
-                hashers = {n: pulp_hashlib.new(n) for n in Artifact.DIGEST_FIELDS}
+                hashers = pulp_hashlib.Hashers(Artifact.DIGEST_FIELDS)
                 size = 0
                 while True:
                     chunk = f.read(1048576)  # 1 megabyte
                     if not chunk:
                         break
-                    for algorithm in hashers.values():
-                        algorithm.update(chunk)
+                    hashers.update(chunk)
                     size = size + len(chunk)
         else:
             size = file.size
@@ -453,14 +452,13 @@ class PulpTemporaryFile(HandleTempFilesMixin, BaseModel):
 
         if isinstance(file, str):
             with open(file, "rb") as f:
-                hashers = {n: pulp_hashlib.new(n) for n in expected_digests.keys()}
+                hashers = pulp_hashlib.Hashers(expected_digests.keys())
                 size = 0
                 while True:
                     chunk = f.read(1048576)  # 1 megabyte
                     if not chunk:
                         break
-                    for algorithm in hashers.values():
-                        algorithm.update(chunk)
+                    hashers.update(chunk)
                     size = size + len(chunk)
         else:
             size = file.size
@@ -10,6 +10,7 @@ from aiohttp.web_exceptions import HTTPNotFound
 from django.conf import settings
 from django.contrib.postgres.fields import HStoreField
 from django.db import IntegrityError, models, transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from django_lifecycle import hook, AFTER_UPDATE, BEFORE_DELETE
 
@@ -22,7 +23,13 @@ from pulpcore.cache import Cache
 from rest_framework.exceptions import APIException
 from pulpcore.app.models import AutoAddObjPermsMixin
 from pulpcore.responses import ArtifactResponse
-from pulpcore.app.util import get_domain_pk, cache_key
+from pulpcore.app.util import (
+    cache_key,
+    collect_cache_paths,
+    get_domain_pk,
+    invalidate_cache_paths,
+    notify_distribution_cache,
+)
 
 
 class PublicationQuerySet(models.QuerySet):
@@ -165,6 +172,9 @@ class Publication(MasterModel):
                 # Invalidate cache for all distributions serving this publication
                 if base_paths:
                     Cache().delete(base_key=cache_key(base_paths))
+            notify_distribution_cache(
+                self.distribution_set.values_list("pulp_domain_id", "base_path")
+            )
 
             CreatedResource.objects.filter(object_id=self.pk).delete()
             super().delete(**kwargs)
@@ -224,8 +234,73 @@ class Publication(MasterModel):
                     repository=self.repository_version.repository
                 ).values_list("base_path", flat=True)
                 if base_paths:
-                    base_keys = [f"{self.pulp_domain.name}:{base_path}" for base_path in base_paths]
-                    Cache().delete(base_key=base_keys)
+                    self._invalidate_cache(base_paths)
+
+    def _invalidate_cache(self, base_paths):
+        """
+        Invalidate the cached responses of the distributions serving the latest publication.
+
+        With CACHE_DELTA_INVALIDATION_MAX_PATHS, only the paths whose content differs from the
+        publication served before are invalidated, so that the rest of the cache stays warm.
+        """
+        max_paths = settings.CACHE_DELTA_INVALIDATION_MAX_PATHS
+        paths = None
+        if max_paths:
+            publications = Publication.objects.filter(
+                repository_version__repository=self.repository_version.repository, complete=True
+            )
+            latest = publications.latest("repository_version", "pulp_created")
+            try:
+                previous = publications.exclude(pk=self.pk).latest(
+                    "repository_version", "pulp_created"
+                )
+            except Publication.DoesNotExist:
+                pass
+            else:
+                paths = latest._changed_paths(previous, max_paths)
+        invalidate_cache_paths(base_paths, paths)
+
+    def _changed_paths(self, previous, max_paths):
+        """
+        Find the relative paths served differently by this publication and a previous one.
+
+        Args:
+            previous (Publication): The publication served before this one.
+            max_paths (int): How many changed paths to find at most.
+
+        Returns:
+            set: The relative paths, or `None` if there are more than `max_paths` of them, or the
+                publications cannot be compared.
+        """
+        if previous.pk == self.pk:
+            return set()
+        if previous.pass_through != self.pass_through:
+            return None
+
+        def published_not_in(publication, other):
+            same = PublishedArtifact.objects.filter(
+                publication=other,
+                relative_path=OuterRef("relative_path"),
+                content_artifact=OuterRef("content_artifact"),
+            )
+            return publication.published_artifact.exclude(Exists(same)).values_list(
+                "relative_path", flat=True
+            )
+
+        changed = [published_not_in(self, previous), published_not_in(previous, self)]
+        if self.pass_through:
+            content = self.repository_version.content
+            previous_content = previous.repository_version.content
+            for added in (
+                content.exclude(pk__in=previous_content),
+                previous_content.exclude(pk__in=content),
+            ):
+                changed.append(
+                    ContentArtifact.objects.filter(content__in=added).values_list(
+                        "relative_path", flat=True
+                    )
+                )
+        return collect_cache_paths(changed, max_paths)
 
 
 class PublishedArtifact(BaseModel):
@@ -351,6 +426,12 @@ class ContentGuard(MasterModel):
             if base_paths:
                 Cache().delete(base_key=cache_key(base_paths))
 
+    @hook(BEFORE_DELETE)
+    @hook(AFTER_UPDATE)
+    def invalidate_distribution_cache(self):
+        """Drops the distributions using this guard from the content apps' distribution cache."""
+        notify_distribution_cache(self.distribution_set.values_list("pulp_domain_id", "base_path"))
+
     class Meta:
         unique_together = ("name", "pulp_domain")
 
@@ -603,6 +684,8 @@ class Distribution(MasterModel):
         if settings.CACHE_ENABLED:
             Cache().delete(base_key=cache_key(self.base_path))
             # Can also preload cache here possibly
+        base_paths = {self.initial_value("base_path"), self.base_path}
+        notify_distribution_cache((self.pulp_domain_id, base_path) for base_path in base_paths)
 
 
 class ArtifactDistribution(Distribution):
@@ -12,9 +12,11 @@ from asyncio_throttle import Throttler
 from django.conf import settings
 from django.contrib.postgres.fields import HStoreField
 from django.core.validators import MinValueValidator
-from django.db import models, transaction
+from django.db import connection, models, transaction
 from django.db.models import F, Func, Q, Value
+from django.db.models.expressions import RawSQL
 from django.urls import reverse
+from django.utils import timezone
 from django_lifecycle import AFTER_UPDATE, BEFORE_DELETE, hook
 from rest_framework.exceptions import APIException
 
@@ -25,6 +27,9 @@ from pulpcore.app.util import (
     get_domain,
     get_domain_pk,
     cache_key,
+    collect_cache_paths,
+    invalidate_cache_paths,
+    notify_distribution_cache,
 )
 from pulpcore.constants import ALL_KNOWN_CONTENT_CHECKSUMS
 from pulpcore.download.factory import DownloaderFactory
@@ -32,8 +37,8 @@ from pulpcore.exceptions import ResourceImmutableError
 
 from pulpcore.cache import Cache
 
-from .base import MasterModel, BaseModel
-from .content import Artifact, Content
+from .base import MasterModel, BaseModel, PULP_UUID_SQL
+from .content import Artifact, Content, ContentArtifact
 from .fields import EncryptedTextField
 from .task import CreatedResource, Task
 
@@ -166,8 +171,6 @@ class Repository(MasterModel):
                 resource = CreatedResource(content_object=version)
                 resource.save()
 
-            self.invalidate_cache()
-
             return version
 
     def initialize_new_version(self, new_version):
@@ -290,23 +293,45 @@ class Repository(MasterModel):
                 version.delete()
 
     @hook(BEFORE_DELETE)
-    def invalidate_cache(self, everything=False):
-        """Invalidates the cache if repository is present."""
+    def invalidate_cache(self, everything=False, content=None):
+        """
+        Invalidates the cache if repository is present.
+
+        Args:
+            everything (bool): Whether to also invalidate the distributions serving any version or
+                publication of the repository, instead of only the ones serving the repository.
+            content (django.db.models.QuerySet): The content whose files changed, if known. With
+                CACHE_DELTA_INVALIDATION_MAX_PATHS, only the paths it is served at are invalidated.
+        """
         if settings.CACHE_ENABLED:
+            from .publication import Distribution, Publication, PublishedArtifact
+
             distributions = self.distributions.all()
             if everything:
-                from .publication import Distribution, Publication
-
                 versions = self.versions.all()
                 pubs = Publication.objects.filter(repository_version__in=versions, complete=True)
                 distributions |= Distribution.objects.filter(publication__in=pubs)
                 distributions |= Distribution.objects.filter(repository_version__in=versions)
             if distributions.exists():
                 base_paths = distributions.values_list("base_path", flat=True)
-                if base_paths:
-                    Cache().delete(base_key=cache_key(base_paths))
+                paths = None
+                max_paths = settings.CACHE_DELTA_INVALIDATION_MAX_PATHS
+                if content is not None and max_paths:
+                    changed = [
+                        ContentArtifact.objects.filter(content__in=content).values_list(
+                            "relative_path", flat=True
+                        )
+                    ]
+                    if everything:
+                        changed.append(
+                            PublishedArtifact.objects.filter(
+                                publication__in=pubs, content_artifact__content__in=content
+                            ).values_list("relative_path", flat=True)
+                        )
+                    paths = collect_cache_paths(changed, max_paths)
+                invalidate_cache_paths(base_paths, paths)
                 # Could do preloading here for immediate artifacts with artifacts_for_version
-
+        notify_distribution_cache(self.distributions.values_list("pulp_domain_id", "base_path"))
 
 class Remote(MasterModel):
     """
@@ -551,6 +576,12 @@ class Remote(MasterModel):
             base_paths = self.distribution_set.values_list("base_path", flat=True)
             if base_paths:
                 Cache().delete(base_key=cache_key(base_paths))
+        notify_distribution_cache(self.distribution_set.values_list("pulp_domain_id", "base_path"))
+
+    @hook(AFTER_UPDATE)
+    def invalidate_distribution_cache(self):
+        """Drops the distributions using the remote from the distribution caches."""
+        notify_distribution_cache(self.distribution_set.values_list("pulp_domain_id", "base_path"))
 
     class Meta:
         default_related_name = "remotes"
@@ -838,6 +869,9 @@ class RepositoryVersion(BaseModel):
         """
         Add a content unit to this version.
 
+        The memberships are updated and created by the database, with an ``UPDATE`` and an
+        ``INSERT ... SELECT``, so the content does not need to be loaded into Python.
+
         Args:
            content (django.db.models.QuerySet): Set of Content to add
 
@@ -849,27 +883,44 @@ class RepositoryVersion(BaseModel):
         if self.complete:
             raise ResourceImmutableError(self)
 
-        repo_content = []
-        to_add = set(content.exclude(pk__in=self.content).values_list("pk", flat=True))
-
         # Normalize representation if content has already been removed in this version and
         # is re-added: Undo removal by setting version_removed to None.
-        for removed in batch_qs(self.removed().order_by("pk").values_list("pk", flat=True)):
-            to_readd = to_add.intersection(set(removed))
-            if to_readd:
-                RepositoryContent.objects.filter(
-                    content__in=to_readd, repository=self.repository, version_removed=self
-                ).update(version_removed=None)
-                to_add = to_add - to_readd
-
-        for content_pk in to_add:
-            repo_content.append(
-                RepositoryContent(
-                    repository=self.repository, content_id=content_pk, version_added=self
-                )
+        RepositoryContent.objects.filter(
+            content__in=content.values("pk"),
+            repository_id=self.repository_id,
+            version_removed=self,
+        ).update(version_removed=None)
+
+        now = timezone.now()
+        new_memberships = (
+            Content.objects.filter(pk__in=content.exclude(pk__in=self.content).values("pk"))
+            .order_by()
+            .annotate(
+                membership_id=RawSQL(PULP_UUID_SQL, [], output_field=models.UUIDField()),
+                membership_created=Value(now, output_field=models.DateTimeField()),
+                membership_last_updated=Value(now, output_field=models.DateTimeField()),
+                membership_repository_id=Value(self.repository_id, output_field=models.UUIDField()),
+                membership_version_id=Value(self.pk, output_field=models.UUIDField()),
+            )
+            # Fields are selected before annotations, in the order they are annotated
+            .values_list(
+                "pk",
+                "membership_id",
+                "membership_created",
+                "membership_last_updated",
+                "membership_repository_id",
+                "membership_version_id",
+            )
+        )
+        query, params = new_memberships.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO {table} (content_id, pulp_id, pulp_created, pulp_last_updated, "
+                "repository_id, version_added_id) {query}".format(
+                    table=RepositoryContent._meta.db_table, query=query
+                ),
+                params,
             )
-
-        RepositoryContent.objects.bulk_create(repo_content)
 
     def remove_content(self, content):
         """
@@ -886,20 +937,31 @@ class RepositoryVersion(BaseModel):
         if self.complete:
             raise ResourceImmutableError(self)
 
-        if not content or not content.count():
+        if content is None or not content.exists():
             return
 
         # Normalize representation if content has already been added in this version.
-        # Undo addition by deleting the RepositoryContent.
-        RepositoryContent.objects.filter(
-            repository=self.repository,
-            content_id__in=content,
+        # Undo addition by deleting the RepositoryContent. The rows are deleted by the database,
+        # a queryset delete() would load them to collect their (nonexistent) roles.
+        added_memberships = RepositoryContent.objects.filter(
+            repository_id=self.repository_id,
+            content_id__in=content.values("pk"),
             version_added=self,
             version_removed=None,
-        ).delete()
+        ).values("pk")
+        query, params = added_memberships.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM {table} WHERE pulp_id IN ({query})".format(
+                    table=RepositoryContent._meta.db_table, query=query
+                ),
+                params,
+            )
 
         q_set = RepositoryContent.objects.filter(
-            repository=self.repository, content_id__in=content, version_removed=None
+            repository_id=self.repository_id,
+            content_id__in=content.values("pk"),
+            version_removed=None,
         )
         q_set.update(version_removed=self)
 
@@ -907,6 +969,8 @@ class RepositoryVersion(BaseModel):
         """
         Sets the repo version content by calling remove_content() then add_content().
 
+        Both run in the database, so the content does not need to be loaded into Python.
+
         Args:
             content (django.db.models.QuerySet): Set of desired content
 
@@ -1017,6 +1081,9 @@ class RepositoryVersion(BaseModel):
                 base_paths = self.distribution_set.values_list("base_path", flat=True)
                 if base_paths:
                     Cache().delete(base_key=base_paths)
+            notify_distribution_cache(
+                self.distribution_set.values_list("pulp_domain_id", "base_path")
+            )
 
             # Handle the manipulation of the repository version content and its final deletion in
             # the same transaction.
@@ -1038,6 +1105,7 @@ class RepositoryVersion(BaseModel):
                     raise RuntimeError(
                         _("Some repo relations of this version were not translated.")
                     )
+                self._drop_path_index()
                 super().delete(**kwargs)
 
         else:
@@ -1045,6 +1113,7 @@ class RepositoryVersion(BaseModel):
                 RepositoryContent.objects.filter(version_added=self).delete()
                 RepositoryContent.objects.filter(version_removed=self).update(version_removed=None)
                 CreatedResource.objects.filter(object_id=self.pk).delete()
+                self._drop_path_index()
                 super().delete(**kwargs)
 
     def _compute_counts(self):
@@ -1076,6 +1145,30 @@ class RepositoryVersion(BaseModel):
                     counts_list.append(count_obj)
             RepositoryVersionContentDetails.objects.bulk_create(counts_list)
 
+    def _build_path_index(self):
+        """
+        Materialize the relative path index of this version's ContentArtifacts.
+
+        The index is stored as :class:`~pulpcore.app.models.RepositoryVersionPath` rows with a
+        single ``INSERT ... SELECT``, so the content does not need to be loaded into Python.
+        """
+        content_artifacts = (
+            ContentArtifact.objects.filter(content__in=self.content)
+            .annotate(version_id=Value(self.pk, output_field=models.UUIDField()))
+            .values_list("pk", "relative_path", "version_id")
+        )
+        query, params = content_artifacts.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO {table} (content_artifact_id, relative_path, repository_version_id) "
+                "{query}".format(table=RepositoryVersionPath._meta.db_table, query=query),
+                params,
+            )
+
+    def _drop_path_index(self):
+        """Delete the relative path index of this version."""
+        RepositoryVersionPath.objects.filter(repository_version=self).delete()
+
     def __enter__(self):
         """
         Create the repository version
@@ -1124,7 +1217,13 @@ class RepositoryVersion(BaseModel):
                         self.repository.save()
                         self.save()
                         self._compute_counts()
+                        self._build_path_index()
                     self.repository.cleanup_old_versions()
+                    self.repository.invalidate_cache(
+                        content=Content.objects.filter(
+                            Q(pk__in=self.added()) | Q(pk__in=self.removed())
+                        )
+                    )
                     repository.on_new_version(self)
             except Exception:
                 self.delete()
@@ -1134,6 +1233,41 @@ class RepositoryVersion(BaseModel):
         return "<Repository: {}; Version: {}>".format(self.repository.name, self.number)
 
 
+class RepositoryVersionPath(models.Model):
+    """
+    An index of the ContentArtifacts contained in a RepositoryVersion by their relative path.
+
+    The index is built when the RepositoryVersion is completed. It lets the content app find the
+    ContentArtifact served at a relative path with a single indexed lookup, instead of a subquery
+    over the repository's content relationships.
+
+    Fields:
+
+        relative_path (models.TextField): The relative path of the ContentArtifact.
+
+    Relations:
+
+        repository_version (models.ForeignKey): The indexed RepositoryVersion.
+        content_artifact (models.ForeignKey): The ContentArtifact found at relative_path.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    relative_path = models.TextField()
+    repository_version = models.ForeignKey(
+        "RepositoryVersion", related_name="paths", on_delete=models.CASCADE, db_index=False
+    )
+    content_artifact = models.ForeignKey(
+        "ContentArtifact", related_name="+", on_delete=models.CASCADE
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["repository_version", "relative_path"], name="core_rvpath_version_path_idx"
+            )
+        ]
+
+
 class RepositoryVersionContentDetails(models.Model):
     ADDED = "A"
     PRESENT = "P"
@@ -276,7 +276,14 @@ class Task(BaseModel, AutoAddObjPermsMixin):
         super().refresh_from_db(using, fields, **kwargs)
 
     class Meta:
-        indexes = [models.Index(fields=["pulp_created"])]
+        indexes = [
+            models.Index(fields=["pulp_created"]),
+            models.Index(
+                fields=["pulp_created"],
+                name="core_task_incomplete_idx",
+                condition=models.Q(state__in=TASK_INCOMPLETE_STATES),
+            ),
+        ]
         permissions = [
             ("manage_roles_task", "Can manage role assignments on task"),
         ]
@@ -1,10 +1,23 @@
 """A wrapper around `hashlib` providing only hashers named in settings.ALLOWED_CONTENT_CHECKSUMS"""
 
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from gettext import gettext as _
 import hashlib as the_real_hashlib
+import threading
+import time
 
 from django.conf import settings
 
+# Chunks at least this large are hashed with all the algorithms at once, in a thread pool. hashlib
+# releases the GIL while hashing them.
+PARALLEL_HASHING_THRESHOLD = 65536
+
+_executor = None
+_executor_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
 
 def new(name, *args, **kwargs):
     """
@@ -34,3 +47,86 @@ def new(name, *args, **kwargs):
             ).format(name)
         )
     return the_real_hashlib.new(name, *args, **kwargs)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=len(settings.ALLOWED_CONTENT_CHECKSUMS),
+                thread_name_prefix="pulp-hashing",
+            )
+        return _executor
+
+
+def _timed_update(name, hasher, data):
+    start = time.perf_counter()
+    hasher.update(data)
+    elapsed = time.perf_counter() - start
+    with _stats_lock:
+        stats = _stats.setdefault(name, [0, 0.0])
+        stats[0] += len(data)
+        stats[1] += elapsed
+
+
+def throughput():
+    """
+    Return the bytes hashed and the time spent hashing them per algorithm, in this process.
+
+    Returns:
+        dict: Keyed on the algorithm name, the values are dictionaries with the ``bytes`` hashed,
+            the ``seconds`` spent and the resulting ``bytes_per_second``.
+    """
+    with _stats_lock:
+        return {
+            name: {
+                "bytes": size,
+                "seconds": seconds,
+                "bytes_per_second": int(size / seconds) if seconds else None,
+            }
+            for name, (size, seconds) in _stats.items()
+        }
+
+
+class Hashers(Mapping):
+    """
+    Hashers for several algorithms, all updated with the same data.
+
+    Large chunks of data are hashed with all the algorithms concurrently in a thread pool. The
+    hashers are accessed by algorithm name like in a dictionary.
+    """
+
+    def __init__(self, names):
+        """
+        Args:
+            names (iterable): The names of the hashers, see :func:`new`.
+        """
+        self._hashers = {name: new(name) for name in names}
+
+    def __getitem__(self, name):
+        return self._hashers[name]
+
+    def __iter__(self):
+        return iter(self._hashers)
+
+    def __len__(self):
+        return len(self._hashers)
+
+    def update(self, data):
+        """
+        Update all the hashers with `data`.
+
+        Args:
+            data (bytes): The data to hash.
+        """
+        if len(data) >= PARALLEL_HASHING_THRESHOLD and len(self._hashers) > 1:
+            futures = [
+                _get_executor().submit(_timed_update, name, hasher, data)
+                for name, hasher in self._hashers.items()
+            ]
+            for future in futures:
+                future.result()
+        else:
+            for name, hasher in self._hashers.items():
+                _timed_update(name, hasher, data)
@@ -3,9 +3,10 @@ from gettext import gettext as _
 from collections import defaultdict
 from functools import lru_cache
 
+from django.apps import apps
 from django.conf import settings
 from django.core.exceptions import BadRequest
-from django.db.models import Q, Exists, OuterRef, CharField
+from django.db.models import Q, Exists, OuterRef
 from django.db.models.functions import Cast
 from django.contrib.auth import get_user_model as django_get_user_model
 from django.contrib.auth.models import Permission
@@ -98,6 +99,30 @@ def get_perms_for_model(obj):
     return Permission.objects.filter(content_type__pk=ctype.id)
 
 
+def _object_content_type_ids(model):
+    """Returns the ids of the content types roles on objects of `model` are assigned with."""
+    models = {model, model._meta.concrete_model, *model._meta.get_parent_list()}
+    models.update(m for m in apps.get_models() if issubclass(m, model))
+    content_types = ContentType.objects.get_for_models(*models, for_concrete_model=False)
+    return [content_type.pk for content_type in content_types.values()]
+
+
+def _role_object_pks(roles, model):
+    """
+    Returns the primary keys of the objects of `model` some roles are assigned on, as a subquery.
+
+    The object_id of the roles is cast to the type of the primary key of `model`, so that the
+    objects are matched with their primary key index rather than by casting each of them to text.
+    Only the roles on objects of `model` are considered, whose object_id can be cast.
+    """
+    pk_field = model._meta.pk
+    while pk_field.is_relation:
+        pk_field = pk_field.target_field
+    return roles.filter(content_type_id__in=_object_content_type_ids(model)).values(
+        object_pk=Cast("object_id", output_field=pk_field.__class__())
+    )
+
+
 def get_objects_for_user_roles(
     user,
     permission_name,
@@ -133,35 +158,28 @@ def get_objects_for_user_roles(
         ):
             return qs
 
-    user_role_pks = user.object_roles.filter(
-        domain__isnull=True, role__permissions=permission
-    ).values_list("object_id", flat=True)
-    final_q = Q(pk_str__in=user_role_pks)
+    user_roles = user.object_roles.filter(domain__isnull=True, role__permissions=permission)
+    final_q = Q(pk__in=_role_object_pks(user_roles, qs.model))
     if accept_domain_perms and hasattr(qs.model, "pulp_domain"):
-        domains = list(
-            user.object_roles.filter(
-                domain__isnull=False, role__permissions=permission
-            ).values_list("domain_id", flat=True)
-        )
+        domains = user.object_roles.filter(
+            domain__isnull=False, role__permissions=permission
+        ).values("domain_id")
+        final_q |= Q(pulp_domain_id__in=domains)
         if use_groups:
-            domains.extend(
-                GroupRole.objects.filter(
-                    group__in=user.groups.all(),
-                    domain__isnull=False,
-                    role__permissions=permission,
-                ).values_list("domain_id", flat=True)
-            )
-        final_q |= Q(
-            pk_str__in=list(qs.filter(pulp_domain_id__in=domains).values_list("pk", flat=True))
-        )
+            group_domains = GroupRole.objects.filter(
+                group__in=user.groups.all(),
+                domain__isnull=False,
+                role__permissions=permission,
+            ).values("domain_id")
+            final_q |= Q(pulp_domain_id__in=group_domains)
 
     if use_groups:
-        group_role_pks = GroupRole.objects.filter(
+        group_roles = GroupRole.objects.filter(
             group__in=user.groups.all(), role__permissions=permission, domain__isnull=True
-        ).values_list("object_id", flat=True)
-        final_q |= Q(pk_str__in=group_role_pks)
+        )
+        final_q |= Q(pk__in=_role_object_pks(group_roles, qs.model))
 
-    return qs.annotate(pk_str=Cast("pk", output_field=CharField())).filter(final_q)
+    return qs.filter(final_q)
 
 
 def get_objects_for_user(
@@ -238,17 +256,15 @@ def get_objects_for_group_roles(
     ):
         return qs
 
-    group_role_pks = group.object_roles.filter(
-        domain_id__isnull=True, role__permissions=permission
-    ).values_list("object_id", flat=True)
-    final_q = Q(pk_str__in=group_role_pks)
+    group_roles = group.object_roles.filter(domain_id__isnull=True, role__permissions=permission)
+    final_q = Q(pk__in=_role_object_pks(group_roles, qs.model))
     if accept_domain_perms and hasattr(qs.model, "pulp_domain"):
         domains = group.object_roles.filter(
             domain__isnull=False, role__permissions=permission
-        ).values_list("domain_id", flat=True)
-        final_q |= Q(pk_str__in=qs.filter(pulp_domain_id__in=domains).values_list("pk", flat=True))
+        ).values("domain_id")
+        final_q |= Q(pulp_domain_id__in=domains)
 
-    return qs.annotate(pk_str=Cast("pk", output_field=CharField())).filter(final_q)
+    return qs.filter(final_q)
 
 
 def get_objects_for_group(
@@ -258,6 +258,41 @@ CACHE_ENABLED = False
 CACHE_SETTINGS = {
     "EXPIRES_TTL": 600,  # 10 minutes
 }
+# In-process tier in front of Redis for the content app's cached responses, 0 disables it
+CACHE_LOCAL_SIZE = 0
+CACHE_LOCAL_TTL = 5
+# Invalidate only the changed paths of new publications or versions, up to this many, 0 means all
+CACHE_DELTA_INVALIDATION_MAX_PATHS = 0
+
+# Per-process cache of base_path -> distribution in the content app
+DISTRIBUTION_CACHE_ENABLED = False
+DISTRIBUTION_CACHE_TTL = 60
+
+# Forward Range requests for on-demand content that is not saved to the remote
+ON_DEMAND_RANGE_REQUESTS = False
+# Bytes of fetched ranges each content app process keeps on disk, 0 disables the range cache
+ON_DEMAND_RANGE_CACHE_SIZE = 1073741824  # 1 GiB
+
+# Local disk cache of artifacts served from object storage by the content app
+OBJECT_STORAGE_CACHE_DIR = None
+OBJECT_STORAGE_CACHE_SIZE = 10737418240  # 10 GiB
+
+# Keep connections to remotes alive and reuse them across downloads
+DOWNLOAD_CONNECTION_POOLING = False
+
+# Tune the batch sizes and queue depths of Stages API pipelines while they run
+STAGES_ADAPTIVE_PIPELINE = False
+STAGES_MIN_BATCH_SIZE = 50
+STAGES_MAX_BATCH_SIZE = 5000
+STAGES_BATCH_DURATION = 2.0  # seconds
+STAGES_MAX_QUEUE_SIZE = 1000
+# Parallel replicas of the stages saving artifacts and content, each with a database connection
+STAGES_DATABASE_REPLICAS = 1
+
+# Threads compressing a Pulp export, 1 compresses it with a single gzip stream
+EXPORT_COMPRESSION_THREADS = 1
+# Artifacts read ahead from object storage during Pulp exports, 0 disables prefetching
+EXPORT_PREFETCH_ARTIFACTS = 0
 
 SPECTACULAR_SETTINGS = {
     "SERVE_URLCONF": ROOT_URLCONF,
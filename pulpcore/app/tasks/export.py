@@ -4,12 +4,11 @@ import logging
 import os
 import os.path
 import sys
-import subprocess
 import tarfile
 
+from contextlib import contextmanager
 from distutils.util import strtobool
 from gettext import gettext as _
-from glob import glob
 from pathlib import Path
 from pkg_resources import get_distribution
 
@@ -27,6 +26,7 @@ from pulpcore.app.models import (
     Task,
 )
 from pulpcore.app.models.content import ContentArtifact
+from pulpcore.app.export_writers import ChunkedHashingWriter, ParallelGzipWriter
 from pulpcore.app.serializers import PulpExportSerializer
 
 # ensure the compression patch is loaded
@@ -398,60 +398,13 @@ def pulp_export(exporter_pk, params):
         if not path.is_dir():
             path.mkdir(mode=0o775, parents=True)
 
-        rslts = {}
-        if the_export.validated_chunk_size:
-            # write it into chunks
-            with subprocess.Popen(
-                [
-                    "split",
-                    "-a",
-                    "4",
-                    "-b",
-                    str(the_export.validated_chunk_size),
-                    "-d",
-                    "-",
-                    tarfile_fp + ".",
-                ],
-                stdin=subprocess.PIPE,
-            ) as split_process:
-                try:
-                    # on Python < 3.12 we have a monkeypatch which enables compression levels
-                    if sys.version_info.major == 3 and sys.version_info.minor < 12:
-                        with tarfile.open(tarfile_fp, "w|gz", fileobj=split_process.stdin) as tar:
-                            _do_export(pulp_exporter, tar, the_export)
-                    else:
-                        with tarfile.open(
-                            tarfile_fp, "w|gz", fileobj=split_process.stdin, compresslevel=1
-                        ) as tar:
-                            _do_export(pulp_exporter, tar, the_export)
-                except Exception:
-                    # no matter what went wrong, we can't trust the files we (may have) created.
-                    # Delete the ones we can find and pass the problem up.
-                    for pathname in glob(tarfile_fp + ".*"):
-                        os.remove(pathname)
-                    raise
-            # compute the hashes
-            global_hash = hashlib.sha256()
-            paths = sorted([str(Path(p)) for p in glob(tarfile_fp + ".*")])
-            for a_file in paths:
-                a_hash = _compute_hash(a_file, global_hash)
-                rslts[a_file] = a_hash
-            tarfile_hash = global_hash.hexdigest()
-
-        else:
-            # write into the file
-            try:
-                with tarfile.open(tarfile_fp, "w:gz", compresslevel=1) as tar:
-                    _do_export(pulp_exporter, tar, the_export)
-            except Exception:
-                # no matter what went wrong, we can't trust the file we created.
-                # Delete it if it exists and pass the problem up.
-                if os.path.exists(tarfile_fp):
-                    os.remove(tarfile_fp)
-                raise
-            # compute the hash
-            tarfile_hash = _compute_hash(tarfile_fp)
-            rslts[tarfile_fp] = tarfile_hash
+        # write it into the file, or into chunks, hashing it on the way. If anything goes wrong,
+        # the writer deletes the files created.
+        with ChunkedHashingWriter(tarfile_fp, the_export.validated_chunk_size) as writer:
+            with _open_export_tarfile(tarfile_fp, writer) as tar:
+                _do_export(pulp_exporter, tar, the_export)
+        rslts = writer.hashes
+        tarfile_hash = writer.global_hash.hexdigest()
 
         # store the outputfile/hash info
         the_export.output_file_info = rslts
@@ -492,6 +445,23 @@ def pulp_export(exporter_pk, params):
     pulp_exporter.save()
 
 
+@contextmanager
+def _open_export_tarfile(tarfile_fp, fileobj):
+    """Open a gzip-compressed tarfile stream writing to `fileobj`."""
+    threads = settings.EXPORT_COMPRESSION_THREADS
+    if threads > 1:
+        with ParallelGzipWriter(fileobj, threads) as compressed_fileobj:
+            with tarfile.open(tarfile_fp, "w|", fileobj=compressed_fileobj) as tar:
+                yield tar
+    # on Python < 3.12 we have a monkeypatch which enables compression levels
+    elif sys.version_info.major == 3 and sys.version_info.minor < 12:
+        with tarfile.open(tarfile_fp, "w|gz", fileobj=fileobj) as tar:
+            yield tar
+    else:
+        with tarfile.open(tarfile_fp, "w|gz", fileobj=fileobj, compresslevel=1) as tar:
+            yield tar
+
+
 def _compute_hash(filename, global_hash=None):
     sha256_hash = hashlib.sha256()
     with open(filename, "rb") as f:
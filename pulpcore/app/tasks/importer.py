@@ -5,10 +5,14 @@ import re
 import subprocess
 import tempfile
 import tarfile
+from concurrent.futures import ThreadPoolExecutor
 from gettext import gettext as _
+from itertools import islice
 from logging import getLogger
 
 from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
 from django.core.files.storage import default_storage
 from django.db.models import F
 from naya.json import stream_array, tokenize
@@ -18,6 +22,7 @@ from rest_framework.serializers import ValidationError
 from tablib import Dataset
 
 from pulpcore.app.apps import get_plugin_config
+from pulpcore.app.util import get_domain_pk
 from pulpcore.app.models import (
     Artifact,
     Content,
@@ -26,13 +31,13 @@ from pulpcore.app.models import (
     ProgressReport,
     PulpImport,
     PulpImporter,
+    PulpTemporaryFile,
     Repository,
     Task,
     TaskGroup,
     Worker,
 )
 from pulpcore.app.modelresource import (
-    ArtifactResource,
     ContentArtifactResource,
     RepositoryResource,
 )
@@ -51,12 +56,166 @@ VERSIONS_FILE = "versions.json"
 CONTENT_MAPPING_FILE = "content_mapping.json"
 # How many entities from an import-file should be processed at one time
 IMPORT_BATCH_SIZE = 100
+# Artifact files in the export, named after their sha256 like get_artifact_path() does
+ARTIFACT_MEMBER_RE = re.compile(r"^artifact/(?:[^/]+/)?([0-9a-f]{2})/([0-9a-f]{62})$")
+# How many artifacts are registered, or have their files placed into the storage, at one time
+ARTIFACT_BATCH_SIZE = 1000
+# Artifact files up to this size are read into memory and placed into the storage in batches,
+# larger ones are streamed into the storage one at a time
+ARTIFACT_BUFFER_MAX_SIZE = 1024 * 1024
+# How many bytes of artifact files are held in memory at most
+ARTIFACT_BATCH_MAX_BYTES = 64 * 1024 * 1024
+# How many threads place artifact files into the storage concurrently
+ARTIFACT_FILE_WORKERS = 16
 
 # Concurrent imports w/ overlapping content can collide - how many attempts are we willing to
 # make before we decide this is a fatal error?
 MAX_ATTEMPTS = 3
 
 
+def _is_within_directory(directory, target):
+    abs_directory = os.path.abspath(directory)
+    abs_target = os.path.abspath(target)
+
+    prefix = os.path.commonprefix([abs_directory, abs_target])
+
+    return prefix == abs_directory
+
+
+def _safe_extract_member(tar, member, path):
+    """Extract a member of a tarfile into `path`, refusing to write outside of it."""
+    if not _is_within_directory(path, os.path.join(path, member.name)):
+        raise Exception("Attempted Path Traversal in Tar File")
+    tar.extract(member, path=path)
+
+
+def _import_artifact_file(tar, member, sha256, temp_dir):
+    """
+    Copy an artifact file from the export into the storage, verifying its sha256.
+
+    The file is spooled to a temporary file in `temp_dir` first, so that it is only saved under
+    its final name once it is verified, and storage backends get a regular, seekable file.
+    Files that already exist in the storage are skipped.
+
+    Returns:
+        bool: Whether the file was written.
+    """
+    base_path = os.path.join("artifact", sha256[0:2], sha256[2:])
+    if default_storage.exists(base_path):
+        return False
+    hasher = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=temp_dir) as temp_file:
+        source = tar.extractfile(member)
+        while chunk := source.read(1024 * 1024):
+            hasher.update(chunk)
+            temp_file.write(chunk)
+        if hasher.hexdigest() != sha256:
+            raise ValidationError(
+                _("The sha256 of {name} does not match its name, the export is corrupted.").format(
+                    name=member.name
+                )
+            )
+        temp_file.flush()
+        temp_file.seek(0)
+        default_storage.save(base_path, File(temp_file))
+    return True
+
+
+def _place_artifact_file(sha256, data):
+    """
+    Write an artifact file into the storage, verifying its sha256.
+
+    Returns:
+        bool: Whether the file was written, it is not if the storage has it already.
+    """
+    base_path = os.path.join("artifact", sha256[0:2], sha256[2:])
+    if default_storage.exists(base_path):
+        return False
+    if hashlib.sha256(data).hexdigest() != sha256:
+        raise ValidationError(
+            _("The sha256 of artifact {sha256} does not match, the export is corrupted.").format(
+                sha256=sha256
+            )
+        )
+    default_storage.save(base_path, ContentFile(data))
+    return True
+
+
+def _place_artifact_files(batch, executor):
+    """
+    Place a batch of artifact files into the storage.
+
+    The storage is checked for the files, and the missing ones are written, concurrently. The
+    artifacts already known in the domain are looked up with one query for the whole batch, so
+    that restoring the lost file of one of them is reported.
+
+    Args:
+        batch (dict): The content of the artifact files, by sha256.
+        executor (concurrent.futures.Executor): The pool of threads to write the files with.
+
+    Returns:
+        int: The number of files written into the storage.
+    """
+    known = Artifact.objects.filter(pulp_domain_id=get_domain_pk(), sha256__in=batch.keys())
+    known = set(known.values_list("sha256", flat=True))
+    placed = executor.map(_place_artifact_file, batch.keys(), batch.values())
+    written = 0
+    for sha256, written_file in zip(batch.keys(), placed):
+        if written_file:
+            written += 1
+            if sha256 in known:
+                log.warning(
+                    _("Restored the missing file of artifact {sha256}.").format(sha256=sha256)
+                )
+    return written
+
+
+def _import_artifacts(fpath, pb):
+    """
+    Register the artifacts of an export in bulk.
+
+    The rows of the resource-file are inserted a batch at a time, skipping the artifacts that
+    already exist in the domain, whose timestamp_of_interest is refreshed instead. This is the
+    equivalent of importing the file with ArtifactResource, without its per-row overhead.
+
+    Args:
+        fpath (str): The path of the ArtifactResource file.
+        pb (ProgressReport): The progress report to increase by the number of artifacts handled.
+
+    Returns:
+        int: The number of artifacts created.
+    """
+    domain_pk = get_domain_pk()
+    fields = {field.name for field in Artifact._meta.concrete_fields} - {
+        "pulp_id",
+        "pulp_created",
+        "pulp_last_updated",
+        "pulp_domain",
+    }
+    created = 0
+    with open(fpath, "r") as json_file:
+        rows = stream_array(tokenize(json_file))
+        while batch := list(islice(rows, ARTIFACT_BATCH_SIZE)):
+            artifacts = {}
+            for row in batch:
+                # the export converts None to blank strings, see ArtifactResource
+                values = {key: None if row[key] == "" else row[key] for key in fields & row.keys()}
+                artifact = Artifact(**values, pulp_domain_id=domain_pk)
+                artifact.before_save()
+                artifacts[artifact.sha256] = artifact
+            existing = Artifact.objects.filter(pulp_domain_id=domain_pk, sha256__in=artifacts)
+            existing_pks = []
+            for pk, sha256 in existing.values_list("pk", "sha256"):
+                existing_pks.append(pk)
+                del artifacts[sha256]
+            Artifact.objects.filter(pk__in=existing_pks).touch()
+            # A concurrent import may have created some of them since
+            Artifact.objects.bulk_create(artifacts.values(), ignore_conflicts=True)
+            created += len(artifacts)
+            pb.increase_by(len(batch))
+    return created
+
+
 def _get_destination_repo_name(importer, source_repo_name):
     """
     Return the name of a destination repository considering the mapping or source repository name.
@@ -184,8 +343,30 @@ def _check_versions(version_json):
         raise ValidationError((" ".join(error_messages)))
 
 
+def _extract_repo_version_resources(tar, src_repo_name, path):
+    """
+    Extract the resource files of the exported version of a repository in one pass.
+
+    Returns:
+        str: The name of the directory of the repository version in the export.
+    """
+    rv_name = ""
+    for member in tar:
+        match = re.search(rf"(^repository-{re.escape(src_repo_name)}_[0-9]+)/.+", member.name)
+        if match:
+            rv_name = match.group(1)
+            _safe_extract_member(tar, member, path)
+    return rv_name
+
+
 def import_repository_version(
-    importer_pk, src_repo_name, src_repo_type, dest_repo_name, dest_repo_pk, tar_path
+    importer_pk,
+    src_repo_name,
+    src_repo_type,
+    dest_repo_name,
+    dest_repo_pk,
+    tar_path,
+    resources_pk=None,
 ):
     """
     Import a repository version from a Pulp export.
@@ -197,6 +378,9 @@ def import_repository_version(
         dest_repo_name (str): The name of a repository where the content will be imported.
         dest_repo_pk (str): The primary key of a destination repository if any
         tar_path (str): The path of an exported tarball.
+        resources_pk (str): The primary key of a PulpTemporaryFile holding an uncompressed tarball
+            of the resource files of the repository version, collected by `pulp_import`. The
+            exported tarball is read if not given.
     """
     importer = PulpImporter.objects.get(pk=importer_pk)
 
@@ -208,18 +392,16 @@ def import_repository_version(
     pb.save()
 
     with tempfile.TemporaryDirectory(dir=".") as temp_dir:
-        # Extract the repo file for the repo info
-        with tarfile.open(tar_path, "r:gz") as tar:
-            tar.extract(REPO_FILE, path=temp_dir)
-
-        rv_name = ""
         # Extract the repo version files
-        with tarfile.open(tar_path, "r:gz") as tar:
-            for mem in tar.getmembers():
-                match = re.search(rf"(^repository-{src_repo_name}_[0-9]+)/.+", mem.name)
-                if match:
-                    rv_name = match.group(1)
-                    tar.extract(mem, path=temp_dir)
+        if resources_pk:
+            resources = PulpTemporaryFile.objects.get(pk=resources_pk)
+            with resources.file.open("rb") as resources_file:
+                with tarfile.open(fileobj=resources_file, mode="r|") as tar:
+                    rv_name = _extract_repo_version_resources(tar, src_repo_name, temp_dir)
+            resources.delete()
+        else:
+            with tarfile.open(tar_path, "r:gz") as tar:
+                rv_name = _extract_repo_version_resources(tar, src_repo_name, temp_dir)
 
         if not rv_name:
             raise ValidationError(_("No RepositoryVersion found for {}").format(rv_name))
@@ -254,14 +436,12 @@ def import_repository_version(
         for a_batch in _import_file(ca_path, ContentArtifactResource, retry=True):
             pass
 
-        # see if we have a content mapping
-        mapping_path = f"{rv_name}/{CONTENT_MAPPING_FILE}"
+        # see if we have a content mapping, it was extracted along with the other files
+        mapping_path = os.path.join(rv_path, CONTENT_MAPPING_FILE)
         mapping = {}
-        with tarfile.open(tar_path, "r:gz") as tar:
-            if mapping_path in tar.getnames():
-                tar.extract(mapping_path, path=temp_dir)
-                with open(os.path.join(temp_dir, mapping_path), "r") as mapping_file:
-                    mapping = json.load(mapping_file)
+        if os.path.exists(mapping_path):
+            with open(mapping_path, "r") as mapping_file:
+                mapping = json.load(mapping_file)
 
         content_count = 0
         if mapping:
@@ -290,6 +470,27 @@ def import_repository_version(
     gpr.update(done=F("done") + 1)
 
 
+def _store_repo_version_resources(temp_dir, rv_names, src_repo_name):
+    """
+    Store the extracted resource files of a repository version for its import task.
+
+    Returns:
+        str: The primary key of a PulpTemporaryFile holding an uncompressed tarball of the files,
+            or `None` if the export has no version of the repository.
+    """
+    pattern = re.compile(rf"^repository-{re.escape(src_repo_name)}_[0-9]+$")
+    rv_names = [name for name in rv_names if pattern.match(name)]
+    if not rv_names:
+        return None
+    tar_path = os.path.join(temp_dir, "{}.tar".format(rv_names[0]))
+    with tarfile.open(tar_path, "w") as tar:
+        for rv_name in rv_names:
+            tar.add(os.path.join(temp_dir, rv_name), arcname=rv_name)
+    resources = PulpTemporaryFile.init_and_validate(tar_path)
+    resources.save()
+    return str(resources.pk)
+
+
 def pulp_import(importer_pk, path, toc, create_repositories):
     """
     Import a Pulp export into Pulp.
@@ -464,48 +665,76 @@ def pulp_import(importer_pk, path, toc, create_repositories):
     CreatedResource.objects.create(content_object=the_import)
 
     with tempfile.TemporaryDirectory(dir=".") as temp_dir:
-        with tarfile.open(path, "r:gz") as tar:
-
-            def is_within_directory(directory, target):
-                abs_directory = os.path.abspath(directory)
-                abs_target = os.path.abspath(target)
-
-                prefix = os.path.commonprefix([abs_directory, abs_target])
-
-                return prefix == abs_directory
-
-            def safe_extract(tar, path=".", members=None, *, numeric_owner=False):
-                for member in tar.getmembers():
-                    member_path = os.path.join(path, member.name)
-                    if not is_within_directory(path, member_path):
-                        raise Exception("Attempted Path Traversal in Tar File")
-
-                tar.extractall(path, members, numeric_owner=numeric_owner)
-
-            safe_extract(tar, path=temp_dir)
-
-        # Check version info
-        with open(os.path.join(temp_dir, VERSIONS_FILE)) as version_file:
-            version_json = json.load(version_file)
-            _check_versions(version_json)
+        # Artifact files
+        data = dict(
+            message="Importing Artifact files",
+            code="import.artifacts.files",
+        )
+        with ProgressReport(**data) as pb, ThreadPoolExecutor(ARTIFACT_FILE_WORKERS) as executor:
+            # Read the tarball once, in order: the version info comes first and is checked before
+            # anything is imported, the artifact files are placed into the storage as they come,
+            # and only the resource files are extracted.
+            versions_checked = False
+            artifact_count = 0
+            written = 0
+            batch = {}
+            batch_bytes = 0
+            with tarfile.open(path, "r:gz") as tar:
+                for member in tar:
+                    match = ARTIFACT_MEMBER_RE.match(member.name)
+                    if match and member.isfile():
+                        if not versions_checked:
+                            raise ValidationError(_("Export is missing {}.").format(VERSIONS_FILE))
+                        artifact_count += 1
+                        sha256 = match.group(1) + match.group(2)
+                        if member.size > ARTIFACT_BUFFER_MAX_SIZE:
+                            written += _import_artifact_file(tar, member, sha256, temp_dir)
+                            pb.increment()
+                            continue
+                        batch[sha256] = tar.extractfile(member).read()
+                        batch_bytes += member.size
+                        if len(batch) >= ARTIFACT_BATCH_SIZE or (
+                            batch_bytes >= ARTIFACT_BATCH_MAX_BYTES
+                        ):
+                            count = len(batch)
+                            written += _place_artifact_files(batch, executor)
+                            pb.increase_by(count)
+                            batch = {}
+                            batch_bytes = 0
+                        continue
+                    _safe_extract_member(tar, member, temp_dir)
+                    if member.name == VERSIONS_FILE:
+                        # Check version info
+                        with open(os.path.join(temp_dir, VERSIONS_FILE)) as version_file:
+                            version_json = json.load(version_file)
+                            _check_versions(version_json)
+                        versions_checked = True
+            if not versions_checked:
+                raise ValidationError(_("Export is missing {}.").format(VERSIONS_FILE))
+            if batch:
+                count = len(batch)
+                written += _place_artifact_files(batch, executor)
+                pb.increase_by(count)
+            pb.total = artifact_count
+            log.info(
+                "Placed {} artifact files into the storage, {} of them were there already.".format(
+                    written, artifact_count - written
+                )
+            )
 
-        # Artifacts
+        # Artifacts, their files are in the storage already.
         data = dict(
             message="Importing Artifacts",
             code="import.artifacts",
+            total=artifact_count,
         )
         with ProgressReport(**data) as pb:
-            # Import artifacts, and place their binary blobs, one batch at a time.
-            # Skip artifacts that already exist in storage.
-            for ar_result in _import_file(os.path.join(temp_dir, ARTIFACT_FILE), ArtifactResource):
-                for row in pb.iter(ar_result.rows):
-                    artifact = Artifact.objects.get(pk=row.object_id)
-                    base_path = os.path.join("artifact", artifact.sha256[0:2], artifact.sha256[2:])
-                    src = os.path.join(temp_dir, base_path)
-
-                    if not default_storage.exists(base_path):
-                        with open(src, "rb") as f:
-                            default_storage.save(base_path, f)
+            created = _import_artifacts(os.path.join(temp_dir, ARTIFACT_FILE), pb)
+            log.info(
+                "Imported {} artifacts, {} of them already existed.".format(
+                    pb.done, pb.done - created
+                )
+            )
 
         # Now import repositories, in parallel.
 
@@ -531,6 +760,11 @@ def pulp_import(importer_pk, path, toc, create_repositories):
             )
             gpr.save()
 
+            rv_names = [
+                name
+                for name in os.listdir(temp_dir)
+                if os.path.isdir(os.path.join(temp_dir, name)) and name.startswith("repository-")
+            ]
             for index, src_repo in enumerate(data):
                 # Lock the repo we're importing-into
                 dest_repo_name = _get_destination_repo_name(importer, src_repo["name"])
@@ -553,6 +787,7 @@ def pulp_import(importer_pk, path, toc, create_repositories):
                     exclusive_resources.append(dest_repo)
                     dest_repo_pk = dest_repo.pk
 
+                resources_pk = _store_repo_version_resources(temp_dir, rv_names, src_repo["name"])
                 dispatch(
                     import_repository_version,
                     exclusive_resources=exclusive_resources,
@@ -564,6 +799,7 @@ def pulp_import(importer_pk, path, toc, create_repositories):
                         dest_repo_pk,
                         path,
                     ),
+                    kwargs={"resources_pk": resources_pk},
                     task_group=task_group,
                 )
 
@@ -1,5 +1,6 @@
 import gc
 
+from concurrent.futures import ThreadPoolExecutor
 from logging import getLogger
 
 from django.conf import settings
@@ -14,9 +15,15 @@ from pulpcore.app.models import (
     PulpTemporaryFile,
     Upload,
 )
+from pulpcore.app.util import get_domain
 
 log = getLogger(__name__)
 
+# Number of threads deleting artifact files from storages without a bulk deletion API
+FILE_DELETION_WORKERS = 16
+# The maximum number of keys of an S3 DeleteObjects request
+S3_DELETE_OBJECTS_MAX_KEYS = 1000
+
 
 def queryset_iterator(qs, batchsize=2000, gc_collect=True):
     """
@@ -39,6 +46,92 @@ def queryset_iterator(qs, batchsize=2000, gc_collect=True):
             gc.collect()
 
 
+def _delete_files(domain, storage, names, executor):
+    """
+    Delete files from the storage of a domain.
+
+    S3 objects are deleted with `DeleteObjects` requests, other files in parallel in `executor`.
+
+    Returns:
+        int: The number of files that could not be deleted.
+    """
+    if domain.storage_class == "storages.backends.s3boto3.S3Boto3Storage":
+        from storages.utils import clean_name
+
+        failed = 0
+        for i in range(0, len(names), S3_DELETE_OBJECTS_MAX_KEYS):
+            objects = [
+                # Keys are computed the way S3Boto3Storage.delete() does it
+                {"Key": storage._normalize_name(clean_name(name))}
+                for name in names[i : i + S3_DELETE_OBJECTS_MAX_KEYS]
+            ]
+            response = storage.bucket.delete_objects(Delete={"Objects": objects, "Quiet": True})
+            for error in response.get("Errors", []):
+                log.warning(
+                    "Could not delete {key}: {message}".format(
+                        key=error.get("Key"), message=error.get("Message")
+                    )
+                )
+                failed += 1
+        return failed
+
+    def delete(name):
+        try:
+            storage.delete(name)
+        except Exception as e:
+            log.warning("Could not delete {name}: {error}".format(name=name, error=e))
+            return 1
+        return 0
+
+    return sum(executor.map(delete, names))
+
+
+def delete_artifacts(artifacts, progress_bar, batch_size=1000):
+    """
+    Delete artifacts along with their files, in batches.
+
+    Each batch of artifacts is deleted from the database with one query, then their files are
+    deleted from the storage in bulk. Artifacts that got referenced by content in the meantime,
+    e.g. by a sync running in parallel, are skipped.
+
+    Args:
+        artifacts (django.db.models.QuerySet): The artifacts to delete.
+        progress_bar (ProgressReport): Increased by the number of deleted artifacts.
+        batch_size (int): The number of artifacts to delete at once.
+
+    Returns:
+        int: The number of skipped artifacts.
+    """
+    domain = get_domain()
+    storage = domain.get_storage()
+    skipped = 0
+    failed = 0
+    with ThreadPoolExecutor(max_workers=FILE_DELETION_WORKERS) as executor:
+        for batch in queryset_iterator(artifacts, batchsize=batch_size):
+            files = dict(batch.values_list("pk", "file"))
+            if not files:
+                continue
+            try:
+                # Deleting by pk makes sure the files deleted are those of the deleted artifacts
+                Artifact.objects.filter(pk__in=list(files)).delete()
+            except ProtectedError:
+                # some orphaned artifact might have been picked by another task running in
+                # parallel i.e. sync
+                for pk in list(files):
+                    try:
+                        Artifact.objects.filter(pk=pk).delete()
+                    except ProtectedError as e:
+                        log.debug(e)
+                        del files[pk]
+                        skipped += 1
+            failed += _delete_files(domain, storage, list(files.values()), executor)
+            progress_bar.increase_by(len(files))
+
+    if failed:
+        log.warning("{} artifact file(s) could not be deleted from the storage.".format(failed))
+    return skipped
+
+
 def orphan_cleanup(content_pks=None, orphan_protection_time=settings.ORPHAN_PROTECTION_TIME):
     """
     Delete all orphan Content and Artifact records.
@@ -86,23 +179,12 @@ def orphan_cleanup(content_pks=None, orphan_protection_time=settings.ORPHAN_PROT
     # delete the artifacts that don't belong to any content
     artifacts = Artifact.objects.orphaned(orphan_protection_time)
 
-    skipped_artifact = 0
     with ProgressReport(
         message="Clean up orphan Artifacts",
         total=artifacts.count(),
         code="clean-up.artifacts",
     ) as progress_bar:
-        for artifact in artifacts.iterator():
-            try:
-                # we need to manually call delete() because it cleans up the file on the filesystem
-                artifact.delete()
-            except ProtectedError as e:
-                # some orphaned artifact might have been picked by another task running in parallel
-                # i.e. sync
-                log.debug(e)
-                skipped_artifact += 1
-            else:
-                progress_bar.increment()
+        skipped_artifact = delete_artifacts(artifacts, progress_bar)
 
     if skipped_artifact:
         msg = (
@@ -1,7 +1,5 @@
 from logging import getLogger
 
-from django.db.models.deletion import ProtectedError
-
 from pulpcore.app.models import (
     Artifact,
     Content,
@@ -11,6 +9,7 @@ from pulpcore.app.models import (
     Repository,
     RepositoryVersion,
 )
+from pulpcore.app.tasks.orphan import delete_artifacts
 from pulpcore.app.util import get_domain
 
 log = getLogger(__name__)
@@ -30,10 +29,6 @@ def reclaim_space(repo_pks, keeplist_rv_pks=None, force=False):
         force (bool): If True, uploaded content will be taken into account.
 
     """
-    reclaimed_repos = Repository.objects.filter(pk__in=repo_pks)
-    for repo in reclaimed_repos:
-        repo.invalidate_cache(everything=True)
-
     domain = get_domain()
     rest_of_repos = Repository.objects.filter(pulp_domain=domain).exclude(pk__in=repo_pks)
     c_keep_qs = Content.objects.filter(repositories__in=rest_of_repos)
@@ -69,6 +64,11 @@ def reclaim_space(repo_pks, keeplist_rv_pks=None, force=False):
             ca_to_update.append(ca)
 
     ContentArtifact.objects.bulk_update(objs=ca_to_update, fields=["artifact"], batch_size=1000)
+
+    reclaimed_content = c_reclaim_qs.filter(pulp_type__in=unprotected)
+    for repo in Repository.objects.filter(pk__in=repo_pks):
+        repo.invalidate_cache(everything=True, content=reclaimed_content)
+
     artifacts_to_delete = Artifact.objects.filter(pk__in=artifact_pks)
     progress_bar = ProgressReport(
         message="Reclaim disk space",
@@ -79,23 +79,8 @@ def reclaim_space(repo_pks, keeplist_rv_pks=None, force=False):
     )
     progress_bar.save()
 
-    counter = 0
-    interval = 100
-    for artifact in artifacts_to_delete.iterator():
-        try:
-            # we need to manually call delete() because it cleans up the file on the filesystem
-            artifact.delete()
-        except ProtectedError as e:
-            # Rarely artifact could be shared between two different content units.
-            # Just log and skip the artifact deletion in this case
-            log.debug(e)
-        else:
-            progress_bar.done += 1
-            counter += 1
-
-        if counter >= interval:
-            progress_bar.save()
-            counter = 0
+    # Rarely artifact could be shared between two different content units, these are skipped
+    delete_artifacts(artifacts_to_delete, progress_bar)
 
     progress_bar.state = "completed"
     progress_bar.save()
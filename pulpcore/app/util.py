@@ -12,6 +12,7 @@ import gnupg
 
 from django.conf import settings
 from django.apps import apps
+from django.db import connection
 from django.urls import Resolver404, resolve, reverse
 from django.contrib.contenttypes.models import ContentType
 from pkg_resources import get_distribution
@@ -450,3 +451,91 @@ def cache_key(base_path):
             base_path = [f"{domain.name}:{path}" for path in base_path]
 
     return base_path
+
+
+def cache_entry_keys(base_path, relative_paths):
+    """
+    Returns the keys the content app caches the responses for some paths of a distribution under.
+
+    The keys of the directory listings the paths appear in are included.
+
+    Args:
+        base_path (str): The base_path of the distribution.
+        relative_paths (iterable): The paths relative to the base_path.
+
+    Returns:
+        list: The keys, to be used under the base-key of the distribution, see `cache_key`.
+    """
+    prefix = settings.CONTENT_PATH_PREFIX
+    if settings.DOMAIN_ENABLED:
+        prefix += f"{get_domain().name}/"
+    prefix += base_path
+    paths = {prefix, f"{prefix}/"}
+    for relative_path in relative_paths:
+        paths.add(f"{prefix}/{relative_path}")
+        directory = os.path.dirname(relative_path)
+        while directory:
+            paths.add(f"{prefix}/{directory}/")
+            directory = os.path.dirname(directory)
+    return [f"{path}:{method}" for path in sorted(paths) for method in ("GET", "HEAD")]
+
+
+def collect_cache_paths(querysets, max_paths):
+    """
+    Collects the relative paths whose cached responses have to be invalidated.
+
+    Args:
+        querysets (list): Querysets of relative paths, see `values_list`.
+        max_paths (int): How many paths to collect at most.
+
+    Returns:
+        set: The relative paths, or `None` if there are more than `max_paths` of them.
+    """
+    paths = set()
+    for queryset in querysets:
+        paths.update(queryset[: max_paths + 1 - len(paths)])
+        if len(paths) > max_paths:
+            return None
+    return paths
+
+
+def invalidate_cache_paths(base_paths, relative_paths=None):
+    """
+    Invalidates the cached responses of some distributions.
+
+    Args:
+        base_paths (iterable): The base_paths of the distributions.
+        relative_paths (iterable): The paths relative to the base_paths to invalidate, along with
+            the directory listings they appear in. If `None`, every cached response is invalidated.
+    """
+    from pulpcore.cache import Cache
+
+    cache = Cache()
+    if relative_paths is None:
+        cache.delete(base_key=cache_key(list(base_paths)))
+        return
+    for base_path in base_paths:
+        keys = cache_entry_keys(base_path, relative_paths)
+        for i in range(0, len(keys), 1000):
+            cache.delete(key=keys[i : i + 1000], base_key=cache_key(base_path))
+
+
+def notify_distribution_cache(keys=None):
+    """
+    Tell the content apps to drop their cached copies of some distributions.
+
+    The notification is only delivered once the current transaction commits.
+
+    Args:
+        keys (iterable): (domain pk, base_path) tuples of the distributions to drop. If `None`, the
+            content apps drop every cached distribution.
+    """
+    if not settings.DISTRIBUTION_CACHE_ENABLED:
+        return
+    if keys is None:
+        payloads = {""}
+    else:
+        payloads = {f"{domain_pk}:{base_path}" for domain_pk, base_path in keys}
+    with connection.cursor() as cursor:
+        for payload in payloads:
+            cursor.execute("SELECT pg_notify('pulp_distribution_invalidate', %s)", (payload,))
@@ -4,6 +4,7 @@ from urllib.parse import urlparse
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
 from django.db.models.expressions import RawSQL
 from django.core.exceptions import FieldError, ValidationError
 from django.urls import Resolver404, resolve
@@ -352,14 +353,14 @@ class NamedModelViewSet(viewsets.GenericViewSet):
                     user = self.request.user
                     qs = get_objects_for_user(user, permission_name, qs)
             else:
-                # master view so loop through each subclass to find scoped objects
-                pks = []
+                # master view so combine the scoped querysets of each subclass into one query
+                scope_q = Q()
                 for model in self.queryset.model.__subclasses__():
                     if viewset_model := get_viewset_for_model(model, ignore_error=True):
                         viewset = viewset_model()
                         setattr(viewset, "request", self.request)
-                        pks.extend(viewset.get_queryset().values_list("pk", flat=True))
-                qs = qs.filter(pk__in=pks)
+                        scope_q |= Q(pk__in=viewset.get_queryset().values("pk"))
+                qs = qs.filter(scope_q) if scope_q else qs.none()
         return qs
 
     @classmethod
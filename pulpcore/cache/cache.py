@@ -1,6 +1,13 @@
+import asyncio
 import enum
 import json
+import logging
+import struct
+import time
+import zlib
 
+from collections import OrderedDict, defaultdict
+from contextvars import ContextVar
 from functools import wraps
 
 from django.http import HttpResponseRedirect, HttpResponse, FileResponse as ApiFileResponse
@@ -20,8 +27,30 @@ from pulpcore.app.redis_connection import (
 )
 from pulpcore.responses import ArtifactResponse
 
+log = logging.getLogger(__name__)
+
 DEFAULT_EXPIRES_TTL = settings.CACHE_SETTINGS["EXPIRES_TTL"]
 
+# Redis channel announcing the base keys deleted from the cache to the local caches
+CACHE_INVALIDATION_CHANNEL = "pulp_cache_invalidate"
+RECONNECT_INTERVAL = 5
+
+# Entries of the AsyncContentCache start with their format and the length of their metadata,
+# followed by the JSON metadata and the raw body of the response; entries in the legacy format
+# are JSON objects, which start with "{"
+ENTRY_HEADER = struct.Struct("!BI")
+ENTRY_FORMAT = 1
+ENTRY_FORMAT_COMPRESSED = 2
+# Entries at least this large are compressed, if that makes them smaller
+ENTRY_COMPRESS_MIN_SIZE = 1024
+# The AsyncContentCache stores its entries under base keys prefixed with this, so that content apps
+# reading only the legacy format never share them, e.g. during a rolling upgrade. Base paths are
+# relative and domain names are slugs, so no other base key starts with a "/".
+ENTRY_NAMESPACE = "/v2/"
+
+# Entries prefetched for the request being handled, by (base_key, key)
+_prefetched = ContextVar("prefetched", default=None)
+
 
 class CacheKeys(enum.Enum):
     """Available keys to construct the index key for cache entry."""
@@ -61,6 +90,200 @@ def aconnection_error_wrapper(func):
     return wrapper
 
 
+def dump_entry(entry, body=None):
+    """
+    Serialize a cache entry of the AsyncContentCache into its compact binary format.
+
+    Args:
+        entry (dict): The JSON serializable metadata of the response.
+        body (bytes): The raw body of the response, if any.
+
+    Returns:
+        bytes: The serialized entry.
+    """
+    metadata = json.dumps(entry, separators=(",", ":")).encode()
+    payload = metadata + body if body else metadata
+    entry_format = ENTRY_FORMAT
+    if len(payload) >= ENTRY_COMPRESS_MIN_SIZE:
+        compressed = zlib.compress(payload, 1)
+        if len(compressed) < len(payload):
+            payload = compressed
+            entry_format = ENTRY_FORMAT_COMPRESSED
+    return ENTRY_HEADER.pack(entry_format, len(metadata)) + payload
+
+
+def load_entry(data):
+    """
+    Deserialize a cache entry of the AsyncContentCache.
+
+    Args:
+        data (bytes): The serialized entry, in the binary or the legacy JSON format.
+
+    Returns:
+        dict: The metadata of the response, with its raw body under "body" if it has one.
+
+    Raises:
+        ValueError: When the entry is malformed.
+    """
+    if data[:1] == b"{":
+        entry = json.loads(data)
+        if binary := entry.pop("body", None):
+            # raw binary data were translated to their hexadecimal representation and saved in
+            # the cache as a regular string; now, it is necessary to translate the data back
+            # to its original representation that will be returned in the HTTP response BODY:
+            # https://docs.aiohttp.org/en/stable/web_reference.html#response
+            entry["body"] = bytes.fromhex(binary)
+        return entry
+    try:
+        entry_format, length = ENTRY_HEADER.unpack_from(data)
+        payload = data[ENTRY_HEADER.size :]
+        if entry_format == ENTRY_FORMAT_COMPRESSED:
+            payload = zlib.decompress(payload)
+        elif entry_format != ENTRY_FORMAT:
+            raise ValueError("Unknown cache entry format {}".format(entry_format))
+    except (struct.error, zlib.error) as e:
+        raise ValueError(str(e))
+    entry = json.loads(payload[:length])
+    if body := payload[length:]:
+        entry["body"] = bytes(body)
+    return entry
+
+
+class LocalCache:
+    """
+    A size-bounded in-process tier in front of Redis for the entries of the AsyncContentCache.
+
+    Entries are kept for a few seconds at most. The cache only answers lookups while it is
+    subscribed to the invalidation channel the base keys deleted from Redis are announced on;
+    entries are dropped whenever that subscription is (re-)established.
+    """
+
+    def __init__(self, max_size, ttl):
+        """
+        Args:
+            max_size (int): Number of bytes of entries the cache may hold.
+            ttl (int): Number of seconds an entry may be served before it is read from Redis again.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.listening = False
+        # (value, expires) by (base_key, key), least recently used first
+        self._entries = OrderedDict()
+        self._keys = defaultdict(set)
+
+    def get(self, base_key, key):
+        """Return the cached value of key under base_key, or `None`."""
+        if not self.listening:
+            return None
+        item = self._entries.get((base_key, key))
+        if item is None:
+            self.misses += 1
+            return None
+        value, expires = item
+        if expires <= time.monotonic():
+            self._pop((base_key, key))
+            self.misses += 1
+            return None
+        self._entries.move_to_end((base_key, key))
+        self.hits += 1
+        return value
+
+    def set(self, base_key, key, value):
+        """Cache the value of key under base_key, as read from or written to Redis."""
+        if not self.listening or len(value) > self.max_size:
+            return
+        self._pop((base_key, key))
+        self._entries[(base_key, key)] = (value, time.monotonic() + self.ttl)
+        self._keys[base_key].add(key)
+        self.size += len(value)
+        while self.size > self.max_size:
+            self._pop(next(iter(self._entries)))
+
+    def _pop(self, entry_key):
+        item = self._entries.pop(entry_key, None)
+        if item is not None:
+            self.size -= len(item[0])
+            base_key, key = entry_key
+            self._keys[base_key].discard(key)
+            if not self._keys[base_key]:
+                del self._keys[base_key]
+
+    def invalidate(self, base_keys=None):
+        """Drop the entries under some base keys, or every entry if `base_keys` is not given."""
+        if base_keys is None:
+            self._entries.clear()
+            self._keys.clear()
+            self.size = 0
+            return
+        for base_key in base_keys:
+            for key in list(self._keys.get(base_key, ())):
+                self._pop((base_key, key))
+
+    def handle_message(self, data):
+        """Invalidate the base keys listed in a message of the invalidation channel."""
+        try:
+            base_keys = json.loads(data)
+        except ValueError:
+            base_keys = None
+        self.invalidate(base_keys if isinstance(base_keys, list) else None)
+
+    def stats(self):
+        """Return the hit and miss counters together with the number of cached bytes."""
+        return {"hits": self.hits, "misses": self.misses, "size": self.size}
+
+    async def listen(self):
+        """Invalidate cached entries on the messages of the invalidation channel."""
+        while True:
+            pubsub = None
+            try:
+                pubsub = get_async_redis_connection().pubsub()
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                # Anything cached before might have been deleted while we were not listening
+                self.invalidate()
+                self.listening = True
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.handle_message(message["data"])
+            except (AConnectionError, TypeError) as e:
+                log.warning(
+                    "Local cache lost its invalidation subscription, retrying in {} seconds: "
+                    "{}".format(RECONNECT_INTERVAL, str(e))
+                )
+            finally:
+                self.listening = False
+                self.invalidate()
+                if pubsub is not None:
+                    await pubsub.reset()
+            await asyncio.sleep(RECONNECT_INTERVAL)
+
+
+_local_cache = None
+
+
+def get_local_cache():
+    """Return the process' LocalCache, or `None` if CACHE_LOCAL_SIZE disables it."""
+    global _local_cache
+
+    if _local_cache is None and settings.CACHE_ENABLED and settings.CACHE_LOCAL_SIZE:
+        _local_cache = LocalCache(settings.CACHE_LOCAL_SIZE, settings.CACHE_LOCAL_TTL)
+
+    return _local_cache
+
+
+def _as_list(value):
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _namespaced(base_key):
+    """Return the Redis key(s) the AsyncContentCache stores the entries of base_key(s) at."""
+    if isinstance(base_key, str):
+        return ENTRY_NAMESPACE + base_key
+    return [ENTRY_NAMESPACE + key for key in base_key]
+
+
 class Cache:
     """Base class for Pulp's cache"""
 
@@ -110,13 +333,19 @@ class Cache:
         key can be a list to delete multiple entries under a base_key
         base_key can be a list to delete multiple sets of entries
         key and base_key should not both be lists
+
+        The entries of the AsyncContentCache under the base_key are deleted too.
         """
         base_key = base_key or self.default_base_key
         if key:
-            return self.redis.hdel(base_key, key)
-        if isinstance(base_key, str):
-            base_key = [base_key]
-        return self.redis.delete(*base_key)
+            keys = _as_list(key)
+            ret = self.redis.hdel(base_key, *keys) + self.redis.hdel(_namespaced(base_key), *keys)
+        else:
+            if isinstance(base_key, str):
+                base_key = [base_key]
+            ret = self.redis.delete(*base_key, *_namespaced(base_key))
+        self.redis.publish(CACHE_INVALIDATION_CHANNEL, json.dumps(_as_list(base_key)))
+        return ret
 
 
 class SyncContentCache(Cache):
@@ -239,10 +468,14 @@ class AsyncCache:
         """Creates asynchronous cache instance"""
         self.redis = get_async_redis_connection()
 
+    def _redis_key(self, base_key):
+        """Return the Redis key(s) the entries under base_key(s) are stored at."""
+        return base_key
+
     @aconnection_error_wrapper
     async def get(self, key, base_key=None):
         """Gets cached entry of key"""
-        base_key = base_key or self.default_base_key
+        base_key = self._redis_key(base_key or self.default_base_key)
         if key is None:
             return await self.redis.hgetall(base_key)
         return await self.redis.hget(base_key, key)
@@ -250,7 +483,7 @@ class AsyncCache:
     @aconnection_error_wrapper
     async def set(self, key, value, expires=None, base_key=None):
         """Sets the cached entry at key"""
-        base_key = base_key or self.default_base_key
+        base_key = self._redis_key(base_key or self.default_base_key)
         ret = await self.redis.hset(base_key, key, value)
         if expires:
             await self.redis.expire(base_key, expires)
@@ -261,7 +494,7 @@ class AsyncCache:
         """Checks if cached entries exist"""
         if not base_key and base_key is not None:
             return False  # Failsafe for passing empty list/str
-        base_key = base_key or self.default_base_key
+        base_key = self._redis_key(base_key or self.default_base_key)
         if key:
             return await self.redis.hexists(base_key, key)
         else:
@@ -281,10 +514,13 @@ class AsyncCache:
         """
         base_key = base_key or self.default_base_key
         if key:
-            return await self.redis.hdel(base_key, key)
-        if isinstance(base_key, str):
-            base_key = [base_key]
-        return await self.redis.delete(*base_key)
+            ret = await self.redis.hdel(self._redis_key(base_key), *_as_list(key))
+        else:
+            if isinstance(base_key, str):
+                base_key = [base_key]
+            ret = await self.redis.delete(*self._redis_key(base_key))
+        await self.redis.publish(CACHE_INVALIDATION_CHANNEL, json.dumps(_as_list(base_key)))
+        return ret
 
 
 class AsyncContentCache(AsyncCache):
@@ -297,7 +533,7 @@ class AsyncContentCache(AsyncCache):
         "Redirect": HTTPFound,
     }
 
-    def __init__(self, base_key=None, expires_ttl=None, keys=None, auth=None):
+    def __init__(self, base_key=None, expires_ttl=None, keys=None, auth=None, auth_keys=None):
         """
         Initiates a cache instance to be used for dealing with an aiohttp server
 
@@ -309,6 +545,8 @@ class AsyncContentCache(AsyncCache):
                 (path, method) is default
             auth: a callable to check authorization of the request; takes the request, cache
                   instance, and base_key as arguments.
+            auth_keys: a list of the keys under the base_key the auth callable reads; they are
+                  fetched from Redis together with the entry of the request, in one round trip.
         """
         super().__init__()
         self.default_base_key = base_key or self.default_base_key
@@ -318,6 +556,64 @@ class AsyncContentCache(AsyncCache):
         )
         self.default_expires_ttl = expires_ttl or self.default_expires_ttl
         self.auth = auth
+        self.auth_keys = auth_keys or ()
+        self.local = get_local_cache()
+
+    def _redis_key(self, base_key):
+        """Return the Redis key(s) of the entries under base_key(s), in the ENTRY_NAMESPACE."""
+        return _namespaced(base_key)
+
+    async def get(self, key, base_key=None):
+        """Gets cached entry of key, from the entries prefetched or the local cache if possible"""
+        base_key = base_key or self.default_base_key
+        if key is None:
+            return await super().get(key, base_key)
+        prefetched = _prefetched.get()
+        if prefetched and (base_key, key) in prefetched:
+            return prefetched[(base_key, key)]
+        if self.local and (value := self.local.get(base_key, key)) is not None:
+            return value
+        value = await super().get(key, base_key)
+        if self.local and value is not None:
+            self.local.set(base_key, key, value)
+        return value
+
+    @aconnection_error_wrapper
+    async def get_many(self, keys, base_key=None):
+        """Gets the cached entries of several keys under one base_key in one round trip"""
+        base_key = base_key or self.default_base_key
+        values = {}
+        missing = []
+        for key in keys:
+            if self.local and (value := self.local.get(base_key, key)) is not None:
+                values[key] = value
+            else:
+                missing.append(key)
+        if missing:
+            redis_key = self._redis_key(base_key)
+            for key, value in zip(missing, await self.redis.hmget(redis_key, missing)):
+                values[key] = value
+                if self.local and value is not None:
+                    self.local.set(base_key, key, value)
+        return values
+
+    async def set(self, key, value, expires=None, base_key=None):
+        """Sets the cached entry at key"""
+        base_key = base_key or self.default_base_key
+        if prefetched := _prefetched.get():
+            prefetched.pop((base_key, key), None)
+        ret = await super().set(key, value, expires, base_key)
+        if self.local and ret is not None:
+            self.local.set(base_key, key, value.encode() if isinstance(value, str) else value)
+        return ret
+
+    async def delete(self, key=None, base_key=None):
+        """Deletes the cached entry at base_key: key, see AsyncCache.delete"""
+        if prefetched := _prefetched.get():
+            prefetched.clear()
+        if self.local:
+            self.local.invalidate(_as_list(base_key or self.default_base_key))
+        return await super().delete(key, base_key)
 
     def __call__(self, func):
         """Decorator magic call to make the handler cached"""
@@ -329,11 +625,17 @@ class AsyncContentCache(AsyncCache):
             bk = self.default_base_key
             if callable(self.default_base_key):
                 bk = await self.default_base_key(request, self)
-            if self.auth:
-                await self.auth(request, self, bk)
             key = self.make_key(request)
-            # Check cache
-            response = await self.make_response(key, bk)
+            # Fetch the entries the auth callable reads together with the entry of the request
+            prefetched = await self.get_many([key, *self.auth_keys], bk)
+            token = _prefetched.set({(bk, k): v for k, v in (prefetched or {}).items()})
+            try:
+                if self.auth:
+                    await self.auth(request, self, bk)
+                # Check cache
+                response = await self.make_response(key, bk)
+            finally:
+                _prefetched.reset(token)
             if response is None:
                 # Cache miss, create new entry
                 response = await self.make_entry(
@@ -354,19 +656,15 @@ class AsyncContentCache(AsyncCache):
         entry = await self.get(key, base_key)
         if not entry:
             return None
-        entry = json.loads(entry)
-
-        if binary := entry.pop("body", None):
-            # raw binary data were translated to their hexadecimal representation and saved in
-            # the cache as a regular string; now, it is necessary to translate the data back
-            # to its original representation that will be returned in the HTTP response BODY:
-            # https://docs.aiohttp.org/en/stable/web_reference.html#response
-            entry["body"] = bytes.fromhex(binary)
+        try:
+            entry = load_entry(entry)
+        except ValueError:
+            entry = {}
 
         response_type = entry.pop("type", None)
         if not response_type or response_type not in self.RESPONSE_TYPES:
             # Bad entry, delete from cache
-            self.delete(key, base_key)
+            await self.delete(key, base_key)
             return None
         response = self.RESPONSE_TYPES[response_type](**entry)
         response.headers.update({"X-PULP-CACHE": "HIT"})
@@ -380,6 +678,7 @@ class AsyncContentCache(AsyncCache):
             response = e
 
         entry = {"headers": dict(response.headers), "status": response.status}
+        body = None
         response.headers.update({"X-PULP-CACHE": "MISS"})
         if isinstance(response, FileResponse):
             entry["path"] = str(response._path)
@@ -388,12 +687,11 @@ class AsyncContentCache(AsyncCache):
             entry["artifact_pk"] = str(response._artifact.pk)
             entry["type"] = "ArtifactResponse"
         elif isinstance(response, (Response, HTTPSuccessful)):
-            body = response.body
-            if isinstance(body, bytes):
-                # convert bytes into a json dump-able string
-                entry["body"] = body.hex()
+            if isinstance(response.body, bytes):
+                # stored raw, after the metadata of the entry
+                body = response.body
             else:
-                entry["text"] = getattr(body, "_value", body).decode("utf-8")
+                entry["text"] = getattr(response.body, "_value", response.body).decode("utf-8")
             entry["type"] = "Response"
         elif isinstance(response, HTTPFound):
             entry["location"] = str(response.location)
@@ -402,8 +700,7 @@ class AsyncContentCache(AsyncCache):
             # We don't cache StreamResponses or errors
             return response
 
-        # TODO look into smaller format, maybe some compression on the text
-        await self.set(key, json.dumps(entry), expires, base_key=base_key)
+        await self.set(key, dump_entry(entry, body), expires, base_key=base_key)
         return response
 
     def make_key(self, request):
@@ -22,6 +22,7 @@ from django.db.utils import (  # noqa: E402: module level not at top of file
 
 from pulpcore.app.apps import pulp_plugin_configs  # noqa: E402: module level not at top of file
 from pulpcore.app.models import ContentAppStatus  # noqa: E402: module level not at top of file
+from pulpcore.cache.cache import get_local_cache  # noqa: E402: module level not at top of file
 
 from .handler import Handler  # noqa: E402: module level not at top of file
 from .authentication import authenticate  # noqa: E402: module level not at top of file
@@ -62,6 +63,18 @@ async def _heartbeat():
                         await content_app_status.asave(update_fields=["versions"])
 
                 log.debug(msg)
+                if settings.DISTRIBUTION_CACHE_ENABLED:
+                    log.debug(
+                        "Content App '{name}' distribution cache: {stats}".format(
+                            name=name, stats=Handler.distribution_cache.stats()
+                        )
+                    )
+                if Handler.artifact_cache:
+                    log.debug(
+                        "Content App '{name}' artifact cache: {stats}".format(
+                            name=name, stats=Handler.artifact_cache.stats()
+                        )
+                    )
             except (InterfaceError, OperationalError):
                 await sync_to_async(Handler._reset_db_connection)()
                 log.info(fail_msg)
@@ -81,6 +94,31 @@ async def _heartbeat_ctx(app):
         pass
 
 
+async def _distribution_cache_ctx(app):
+    listen_task = asyncio.create_task(Handler.distribution_cache.listen())
+    yield
+    listen_task.cancel()
+    try:
+        await listen_task
+    except asyncio.CancelledError:
+        pass
+
+
+async def _local_cache_ctx(app):
+    listen_task = asyncio.create_task(get_local_cache().listen())
+    yield
+    listen_task.cancel()
+    try:
+        await listen_task
+    except asyncio.CancelledError:
+        pass
+
+
+async def _range_cache_ctx(app):
+    yield
+    Handler.range_cache.clear()
+
+
 async def server(*args, **kwargs):
     os.chdir(settings.WORKING_DIRECTORY)
 
@@ -97,4 +135,10 @@ async def server(*args, **kwargs):
     app.add_routes([web.get(path_prefix, Handler().list_distributions)])
     app.add_routes([web.get(path_prefix + "{path:.+}", Handler().stream_content)])
     app.cleanup_ctx.append(_heartbeat_ctx)
+    if settings.DISTRIBUTION_CACHE_ENABLED:
+        app.cleanup_ctx.append(_distribution_cache_ctx)
+    if get_local_cache():
+        app.cleanup_ctx.append(_local_cache_ctx)
+    if Handler.range_cache:
+        app.cleanup_ctx.append(_range_cache_ctx)
     return app
@@ -0,0 +1,174 @@
+import asyncio
+import contextvars
+import logging
+import os
+import tempfile
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+TEMPORARY_FILE_PREFIX = ".tmp-"
+
+
+class ArtifactDiskCache:
+    """
+    A local read-through disk cache of artifacts kept in object storage.
+
+    Artifacts are copied from the storage on their first read, and stored by sha256 with the
+    layout of :func:`~pulpcore.app.util.get_artifact_path`, so that the following reads can be
+    served from the local file with `sendfile`. When the cache holds more than `max_size` bytes,
+    the least recently read artifacts are removed.
+
+    The directory can be shared by several content app processes; each of them accounts for the
+    files it reads, and the files it finds in the directory when it starts.
+    """
+
+    def __init__(self, directory, max_size):
+        """
+        Args:
+            directory (str): The directory to keep the cached artifacts in.
+            max_size (int): Number of bytes the cache may hold.
+        """
+        self.directory = str(directory)
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._fills = {}
+        self._scanned = False
+        self._scanning = None
+
+    def _path(self, sha256):
+        return os.path.join(self.directory, sha256[0:2], sha256[2:])
+
+    def _find_files(self):
+        """List the artifacts cached before, least recently read first."""
+        found = []
+        for dirpath, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if filename.startswith(TEMPORARY_FILE_PREFIX):
+                    # Left behind by a process that stopped while filling the cache
+                    os.unlink(path)
+                    continue
+                stat = os.stat(path)
+                sha256 = os.path.basename(dirpath) + filename
+                found.append((stat.st_mtime, sha256, stat.st_size))
+        return sorted(found)
+
+    def _scan(self, found=None):
+        """Account for the artifacts cached before."""
+        self._scanned = True
+        for _, sha256, size in self._find_files() if found is None else found:
+            self._add(sha256, size)
+
+    async def _ascan(self):
+        """Like `_scan`, walking the directory in a thread rather than on the event loop."""
+        if self._scanning is None:
+            loop = asyncio.get_event_loop()
+            self._scanning = asyncio.ensure_future(loop.run_in_executor(None, self._find_files))
+        found = await asyncio.shield(self._scanning)
+        if not self._scanned:
+            self._scan(found)
+
+    def _add(self, sha256, size):
+        if sha256 not in self._entries:
+            self.size += size
+        self._entries[sha256] = size
+        self._entries.move_to_end(sha256)
+        while self.size > self.max_size:
+            evicted, evicted_size = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            try:
+                os.unlink(self._path(evicted))
+            except FileNotFoundError:
+                pass
+
+    def get(self, sha256):
+        """
+        Find a cached artifact.
+
+        Args:
+            sha256 (str): The sha256 digest of the artifact.
+
+        Returns:
+            The path of the cached artifact, or `None` if it is not cached.
+        """
+        if not self._scanned:
+            self._scan()
+        path = self._path(sha256)
+        try:
+            # The modification time orders the files by last read for `_scan`
+            os.utime(path)
+            size = os.stat(path).st_size
+        except FileNotFoundError:
+            if sha256 in self._entries:
+                self.size -= self._entries.pop(sha256)
+            self.misses += 1
+            return None
+        self._add(sha256, size)
+        self.hits += 1
+        return path
+
+    def _copy(self, artifact):
+        path = self._path(artifact.sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(path), prefix=TEMPORARY_FILE_PREFIX, delete=False
+        ) as temp_file:
+            try:
+                with artifact.file.open("rb") as f:
+                    for chunk in f.chunks():
+                        temp_file.write(chunk)
+            except BaseException:
+                os.unlink(temp_file.name)
+                raise
+        os.replace(temp_file.name, path)
+        return path
+
+    async def _fill(self, artifact):
+        loop = asyncio.get_event_loop()
+        # The storage of the artifact is resolved from the current domain, carry it to the thread
+        context = contextvars.copy_context()
+        try:
+            path = await loop.run_in_executor(None, context.run, self._copy, artifact)
+        finally:
+            del self._fills[artifact.sha256]
+        self._add(artifact.sha256, artifact.size)
+        return path
+
+    async def get_or_fill(self, artifact):
+        """
+        Find a cached artifact, copying it from the storage if it is not cached yet.
+
+        Concurrent requests for an artifact that is not cached wait for the same copy.
+
+        Args:
+            artifact (:class:`~pulpcore.plugin.models.Artifact`): The artifact to read.
+
+        Returns:
+            The path of the cached artifact, or `None` if it cannot be cached.
+        """
+        if not artifact.sha256 or artifact.size > self.max_size:
+            return None
+        if not self._scanned:
+            await self._ascan()
+        path = self.get(artifact.sha256)
+        if path:
+            return path
+        fill = self._fills.get(artifact.sha256)
+        if fill is None:
+            fill = self._fills[artifact.sha256] = asyncio.ensure_future(self._fill(artifact))
+            fill.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            return await asyncio.shield(fill)
+        except Exception as e:
+            log.warning(
+                "Could not copy artifact {} into the local cache: {}".format(artifact.sha256, e)
+            )
+            return None
+
+    def stats(self):
+        """Return the hit and miss counters together with the number of cached bytes."""
+        return {"hits": self.hits, "misses": self.misses, "size": self.size}
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+
+import psycopg
+from asgiref.sync import sync_to_async
+from django.db import connection
+from pygtrie import StringTrie
+
+log = logging.getLogger(__name__)
+
+DISTRIBUTION_CACHE_CHANNEL = "pulp_distribution_invalidate"
+RECONNECT_INTERVAL = 5
+
+
+class DistributionCache:
+    """
+    A per-process cache of detail distributions, keyed by domain and base_path.
+
+    The distributions are kept in a trie, so the longest base_path matching a requested path is
+    found without querying the database. The cache only answers lookups while it is listening for
+    invalidation notifications (see :func:`pulpcore.app.util.notify_distribution_cache`); entries
+    are dropped whenever that connection is (re-)established.
+    """
+
+    def __init__(self, ttl=None):
+        """
+        Args:
+            ttl (int): Number of seconds an entry may be served before it is looked up again.
+                `None` keeps entries until they are invalidated.
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.listening = False
+        self._trie = StringTrie(separator="/")
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(domain_pk, base_path):
+        return "{}/{}".format(domain_pk, base_path.strip("/"))
+
+    def get(self, domain_pk, path):
+        """
+        Find the distribution serving `path`.
+
+        Args:
+            domain_pk: The pk of the domain the request is made in.
+            path (str): The path component of the URL.
+
+        Returns:
+            The cached detail distribution with the longest base_path matching `path`, or `None`.
+        """
+        if not self.listening:
+            return None
+        base = os.path.split(path)[0].strip("/")
+        with self._lock:
+            step = self._trie.longest_prefix(self._key(domain_pk, base)) if base else None
+            if step:
+                distribution, expires = step.value
+                if expires is None or expires > time.monotonic():
+                    self.hits += 1
+                    return distribution
+                del self._trie[step.key]
+            self.misses += 1
+        return None
+
+    def add(self, distribution):
+        """
+        Cache a detail distribution that was matched in the database.
+
+        Args:
+            distribution (:class:`~pulpcore.plugin.models.Distribution`): The detail distribution.
+        """
+        if not self.listening:
+            return
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        key = self._key(distribution.pulp_domain_id, distribution.base_path)
+        with self._lock:
+            self._trie[key] = (distribution, expires)
+
+    def invalidate(self, domain_pk=None, base_path=None):
+        """
+        Drop a cached distribution, or every cached distribution if `base_path` is not given.
+        """
+        with self._lock:
+            if base_path is None:
+                self._trie.clear()
+            else:
+                self._trie.pop(self._key(domain_pk, base_path), None)
+
+    def handle_notification(self, payload):
+        """Invalidate the entry described by a `domain_pk:base_path` notification payload."""
+        if payload:
+            domain_pk, _, base_path = payload.partition(":")
+            self.invalidate(domain_pk, base_path)
+        else:
+            self.invalidate()
+
+    def stats(self):
+        """Return the hit and miss counters together with the number of cached distributions."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._trie)}
+
+    async def listen(self):
+        """Invalidate cached distributions on notifications sent by the API and the workers."""
+        while True:
+            try:
+                params = await sync_to_async(connection.get_connection_params)()
+                # Those are specific to the synchronous connection Django is using
+                params.pop("cursor_factory", None)
+                params.pop("context", None)
+                aconn = await psycopg.AsyncConnection.connect(autocommit=True, **params)
+                async with aconn:
+                    await aconn.execute(f"LISTEN {DISTRIBUTION_CACHE_CHANNEL}")
+                    # Anything cached before might have been changed while we were not listening
+                    self.invalidate()
+                    self.listening = True
+                    async for notification in aconn.notifies():
+                        self.handle_notification(notification.payload)
+            except psycopg.Error as e:
+                log.warning(
+                    "Distribution cache lost its notification connection, retrying in {} seconds: "
+                    "{}".format(RECONNECT_INTERVAL, str(e))
+                )
+            finally:
+                self.listening = False
+                self.invalidate()
+            await asyncio.sleep(RECONNECT_INTERVAL)
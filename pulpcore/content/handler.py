@@ -2,12 +2,12 @@ import asyncio
 import logging
 from multidict import CIMultiDict
 import os
-import re
 from gettext import gettext as _
 
 from aiohttp.client_exceptions import ClientResponseError
 from aiohttp.web import FileResponse, StreamResponse, HTTPOk
 from aiohttp.web_exceptions import (
+    HTTPBadRequest,
     HTTPError,
     HTTPForbidden,
     HTTPFound,
@@ -38,6 +38,12 @@ from django.db import (  # noqa: E402: module level not at top of file
     models,
     transaction,
 )
+from django.db.models.functions import (  # noqa: E402: module level not at top of file
+    Coalesce,
+    Collate,
+    Concat,
+    Substr,
+)
 from pulpcore.app.models import (  # noqa: E402: module level not at top of file
     Artifact,
     ArtifactDistribution,
@@ -46,6 +52,7 @@ from pulpcore.app.models import (  # noqa: E402: module level not at top of file
     Publication,
     Remote,
     RemoteArtifact,
+    RepositoryVersionPath,
 )
 from pulpcore.app import mime_types  # noqa: E402: module level not at top of file
 from pulpcore.app.util import get_domain, cache_key  # noqa: E402: module level not at top of file
@@ -54,9 +61,44 @@ from pulpcore.exceptions import UnsupportedDigestValidationError  # noqa: E402
 
 from jinja2 import Template  # noqa: E402: module level not at top of file
 from pulpcore.cache import AsyncContentCache  # noqa: E402
+from pulpcore.content.artifact_cache import ArtifactDiskCache  # noqa: E402
+from pulpcore.content.distribution_cache import DistributionCache  # noqa: E402
+from pulpcore.content.range_cache import RangeCache  # noqa: E402
 
 log = logging.getLogger(__name__)
 
+# Key of the cached result of a distribution's content guard check, see `Handler.auth_cached`
+CACHE_GUARD_KEY = "DISTRO#GUARD#PRESENT"
+
+DIRECTORY_LISTING_TEMPLATE = (
+    """
+<html>
+<head><title>Index of {{ path }}</title></head>
+<body bgcolor="white">
+<h1>Index of {{ path }}</h1>
+<hr><pre>
+{%- if not root %}<a href="../">../</a>{% endif %}
+{% for name, date, size in entries -%}
+{% if date -%}
+{% set date = date.strftime("%d-%b-%Y %H:%M") -%}
+{% else -%}
+{% set date = "" -%}
+{% endif -%}
+{% if size -%}
+{% set size = size|filesizeformat -%}
+{% else -%}
+{% set size = "" -%}
+{% endif -%}
+<a href="{{ name|e }}">{{ name|e }}</a>{% for number in range(100 - name|e|length) %} """
+    """{% endfor %}{{ date }}  {{ size }}
+{% endfor -%}
+{% if pagination.next_page %}<a href="{{ pagination.next_page|e }}">next page</a>
+{% endif -%}
+</pre><hr></body>
+</html>
+"""
+)
+
 
 class PathNotResolved(HTTPNotFound):
     """
@@ -114,6 +156,93 @@ class ArtifactNotFound(Exception):
     pass
 
 
+class _RangeComplete(Exception):
+    """Raised to stop a download once it delivered the requested byte range."""
+
+    pass
+
+
+class SharedDownload:
+    """
+    An on-demand download shared by all the requests for the same remote artifact.
+
+    The download is written to a temporary file, that the requests read from while it is still
+    being downloaded. The file is read with `os.pread`, so it can be moved into the storage or
+    removed as soon as the download is done without disturbing the requests still reading it.
+    """
+
+    def __init__(self):
+        """Create a SharedDownload that has not received any data yet."""
+        self.headers = None
+        self.size = 0
+        self.finished = False
+        self.error = None
+        self.readers = 0
+        self._path = None
+        self._fd = None
+        self._changed = asyncio.Condition()
+
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def set_headers(self, headers):
+        """Publish the headers of the upstream response."""
+        self.headers = headers
+        await self._notify()
+
+    async def append(self, path, length):
+        """Publish `length` more bytes that were written and flushed to the file at `path`."""
+        if path != self._path:
+            # The downloader starts over in a fresh file when it retries, the data it already
+            # wrote is downloaded again, and the readers that got it wait until it is past them.
+            self._close()
+            self._fd = os.open(path, os.O_RDONLY)
+            self._path = path
+            self.size = 0
+        self.size += length
+        await self._notify()
+
+    async def finish(self, error=None):
+        """Mark the download as done, or failed if `error` is given."""
+        self.finished = True
+        self.error = error
+        if not self.readers:
+            self._close()
+        await self._notify()
+
+    async def wait(self, predicate):
+        """
+        Wait until `predicate` is true or the download is done.
+
+        Raises:
+            Exception: The error the download failed with.
+        """
+        async with self._changed:
+            await self._changed.wait_for(lambda: predicate() or self.finished)
+        if self.error:
+            raise self.error
+
+    def read(self, offset, length):
+        """Read up to `length` bytes of the downloaded data, starting at `offset`."""
+        return os.pread(self._fd, length, offset)
+
+    def attach(self):
+        """Register a request reading the download."""
+        self.readers += 1
+
+    def release(self):
+        """Unregister a request that is done reading the download."""
+        self.readers -= 1
+        if self.finished and not self.readers:
+            self._close()
+
+    def _close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
 class Handler:
     """
     A default Handler for the Content App that also can be subclassed to create custom handlers.
@@ -153,6 +282,30 @@ class Handler:
 
     distribution_model = None
 
+    distribution_cache = DistributionCache(ttl=settings.DISTRIBUTION_CACHE_TTL)
+
+    # On-demand downloads in progress in this process, see `_stream_shared_download`
+    shared_downloads = {}
+
+    # Local copies of artifacts kept in object storage, see `_serve_content_artifact`
+    artifact_cache = (
+        ArtifactDiskCache(settings.OBJECT_STORAGE_CACHE_DIR, settings.OBJECT_STORAGE_CACHE_SIZE)
+        if settings.OBJECT_STORAGE_CACHE_DIR
+        else None
+    )
+
+    # Byte ranges of remote artifacts fetched in this process, see `_stream_remote_range`
+    range_cache = (
+        RangeCache(settings.ON_DEMAND_RANGE_CACHE_SIZE)
+        if settings.ON_DEMAND_RANGE_REQUESTS and settings.ON_DEMAND_RANGE_CACHE_SIZE
+        else None
+    )
+
+    listing_template = Template(DIRECTORY_LISTING_TEMPLATE)
+    listing_template_async = Template(DIRECTORY_LISTING_TEMPLATE, enable_async=True)
+    # Directory listings with more entries are streamed to the client instead of being cached
+    listing_stream_threshold = 1000
+
     @staticmethod
     def _reset_db_connection():
         """
@@ -203,7 +356,7 @@ class Handler:
         if index_p1:
             return cache_key(base_paths[index_p1 - 1])
         else:
-            distro = await sync_to_async(cls._match_distribution)(path)
+            distro = await cls._amatch_distribution(path)
             return cache_key(distro.base_path)
 
     @classmethod
@@ -216,11 +369,11 @@ class Handler:
             cached (:class:`CacheAiohttp`): The Pulp cache
             base_key (str): The base_key associated with this response
         """
-        guard_key = "DISTRO#GUARD#PRESENT"
+        guard_key = CACHE_GUARD_KEY
         present = await cached.get(guard_key, base_key=base_key)
         if present == b"True" or present is None:
             path = request.match_info["path"]
-            distro = await sync_to_async(cls._match_distribution)(path)
+            distro = await cls._amatch_distribution(path)
             try:
                 guard = await sync_to_async(cls._permit)(request, distro)
             except HTTPForbidden:
@@ -230,13 +383,31 @@ class Handler:
                 if not present:
                     await cached.set(guard_key, str(guard), base_key=base_key)
 
+    async def stream_content(self, request):
+        """
+        The request handler for the Content app.
+
+        Args:
+            request (:class:`aiohttp.web.request`): The request from the client.
+
+        Returns:
+            :class:`aiohttp.web.StreamResponse` or :class:`aiohttp.web.FileResponse`: The response
+                back to the client.
+        """
+        if "limit" in request.query or "offset" in request.query:
+            # Pages of a directory listing share the cache key of the whole listing
+            path = request.match_info["path"]
+            return await self._match_and_stream(path, request)
+        return await self._stream_content_cached(request)
+
     @AsyncContentCache(
         base_key=lambda req, cac: Handler.find_base_path_cached(req, cac),
         auth=lambda req, cac, bk: Handler.auth_cached(req, cac, bk),
+        auth_keys=[CACHE_GUARD_KEY],
     )
-    async def stream_content(self, request):
+    async def _stream_content_cached(self, request):
         """
-        The request handler for the Content app.
+        The cached request handler for the Content app.
 
         Args:
             request (:class:`aiohttp.web.request`): The request from the client.
@@ -269,11 +440,56 @@ class Handler:
             path = base
         return tree
 
+    @classmethod
+    def _cached_distribution(cls, path):
+        """
+        Look up the distribution serving `path` in the distribution cache.
+
+        Args:
+            path (str): The path component of the URL.
+
+        Returns:
+            The cached detail object of the distribution, or `None`.
+        """
+        distro = cls.distribution_cache.get(get_domain().pk, path)
+        if isinstance(distro, cls.distribution_model or Distribution):
+            return distro
+        return None
+
+    @classmethod
+    async def _amatch_distribution(cls, path):
+        """
+        Match a distribution like :meth:`_match_distribution` from a coroutine.
+
+        Distributions found in the distribution cache are returned without leaving the event loop.
+        """
+        distro = cls._cached_distribution(path)
+        if distro is None:
+            distro = await sync_to_async(cls._query_distribution)(path)
+        return distro
+
     @classmethod
     def _match_distribution(cls, path):
         """
         Match a distribution using a list of base paths and return its detail object.
 
+        Args:
+            path (str): The path component of the URL.
+
+        Returns:
+            The detail object of the matched distribution.
+
+        Raises:
+            DistroListings: when multiple matches are possible.
+            PathNotResolved: when not matched.
+        """
+        return cls._cached_distribution(path) or cls._query_distribution(path)
+
+    @classmethod
+    def _query_distribution(cls, path):
+        """
+        Match a distribution in the database, and add it to the distribution cache.
+
         Args:
             path (str): The path component of the URL.
 
@@ -288,7 +504,7 @@ class Handler:
         distro_model = cls.distribution_model or Distribution
         domain = get_domain()
         try:
-            return (
+            distro = (
                 distro_model.objects.filter(pulp_domain=domain)
                 .select_related(
                     "repository",
@@ -302,6 +518,8 @@ class Handler:
                 .get(base_path__in=base_paths)
                 .cast()
             )
+            cls.distribution_cache.add(distro)
+            return distro
         except ObjectDoesNotExist:
             if path.rstrip("/") in base_paths:
                 distros = distro_model.objects.filter(
@@ -385,42 +603,161 @@ class Handler:
         """
         dates = dates or {}
         sizes = sizes or {}
-        template = Template(
-            """
-<html>
-<head><title>Index of {{ path }}</title></head>
-<body bgcolor="white">
-<h1>Index of {{ path }}</h1>
-<hr><pre>
-{%- if not root %}<a href="../">../</a>{% endif %}
-{% for name in dir_list -%}
-{% if dates.get(name, "") -%}
-{% set date = dates.get(name).strftime("%d-%b-%Y %H:%M") -%}
-{% else -%}
-{% set date = "" -%}
-{% endif -%}
-{% if sizes.get(name, "") -%}
-{% set size | filesizeformat -%}
-{{ sizes.get(name) }}
-{% endset -%}
-{% else -%}
-{% set size = "" -%}
-{% endif -%}
-<a href="{{ name|e }}">{{ name|e }}</a>{% for number in range(100 - name|e|length) %} """
-            """{% endfor %}{{ date }}  {{ size }}
-{% endfor -%}
-</pre><hr></body>
-</html>
-"""
-        )
-        return template.render(
-            dir_list=sorted(directory_list),
-            dates=dates,
+        entries = ((name, dates.get(name), sizes.get(name)) for name in sorted(directory_list))
+        return Handler.listing_template.render(
+            entries=entries,
             path=path,
             root=path == settings.CONTENT_PATH_PREFIX,
-            sizes=sizes,
+            pagination={},
         )
 
+    @staticmethod
+    def _directory_entries(queryset, path, repo_version, prefix=""):
+        """
+        Compute the immediate children of a directory in the database.
+
+        Args:
+            queryset (django.db.models.QuerySet): ContentArtifacts, or models referencing them
+                through a `content_artifact` relation, that have a `relative_path`.
+            path (str): relative path of the directory.
+            repo_version (:class:`~pulpcore.app.models.RepositoryVersion`): The repository version
+                used to find the dates the content got added.
+            prefix (str): The lookup prefix from `queryset` to the ContentArtifact.
+
+        Returns:
+            django.db.models.QuerySet: Dictionaries of `name`, `date` and `size` ordered by name.
+        """
+        added = (
+            repo_version._content_relationships()
+            .filter(content_id=models.OuterRef(f"{prefix}content_id"))
+            .values("pulp_created")[:1]
+        )
+        remote_size = RemoteArtifact.objects.filter(
+            content_artifact_id=models.OuterRef(f"{prefix}pk")
+        ).values("size")[:1]
+        child = models.Case(
+            models.When(
+                rest__contains="/",
+                then=Concat(
+                    models.Func(
+                        models.F("rest"),
+                        models.Value("/"),
+                        models.Value(1),
+                        function="SPLIT_PART",
+                        output_field=models.TextField(),
+                    ),
+                    models.Value("/"),
+                    output_field=models.TextField(),
+                ),
+            ),
+            default=models.F("rest"),
+            output_field=models.TextField(),
+        )
+        return (
+            queryset.filter(relative_path__startswith=path)
+            .annotate(rest=Substr("relative_path", len(path) + 1))
+            # Sort like python does, so the entries can be merged with the ones of plugins
+            .annotate(name=Collate(child, "C"))
+            .values("name")
+            .annotate(
+                date=models.Max(Coalesce(models.Subquery(added), f"{prefix}pulp_created")),
+                size=models.Max(Coalesce(f"{prefix}artifact__size", models.Subquery(remote_size))),
+            )
+            .order_by("name")
+        )
+
+    @staticmethod
+    async def _merge_directory_entries(*sources):
+        """
+        Merge sorted iterators of (name, date, size) into one, combining entries of the same name.
+        """
+        heads = {}
+
+        async def advance(source):
+            try:
+                heads[source] = await source.__anext__()
+            except StopAsyncIteration:
+                heads.pop(source, None)
+
+        for source in sources:
+            await advance(source)
+        while heads:
+            name = min(entry[0] for entry in heads.values())
+            dates, sizes = [], []
+            for source, (entry_name, date, size) in list(heads.items()):
+                if entry_name == name:
+                    dates.append(date)
+                    sizes.append(size)
+                    await advance(source)
+            dates = [date for date in dates if date]
+            sizes = [size for size in sizes if size]
+            yield name, max(dates) if dates else None, sizes[0] if sizes else None
+
+    async def iter_directory(self, repo_version, publication, path):
+        """
+        Generate the directory listing of the path.
+
+        This method expects either a repo_version or a publication in addition to a path. The
+        immediate children of the path are computed in the database and streamed from a
+        server-side cursor, so the memory used does not depend on the size of the directory.
+
+        Args:
+            repo_version (:class:`~pulpcore.app.models.RepositoryVersion`): The repository version
+            publication (:class:`~pulpcore.app.models.Publication`): Publication
+            path (str): relative path inside the repo version of publication.
+
+        Yields:
+            Tuples of the name, date and size of the files and directories in the directory,
+            sorted by name.
+
+        Raises:
+            PathNotResolved: when there are no files in the directory.
+        """
+        if not publication and not repo_version:
+            raise Exception("Either a repo_version or publication is required.")
+        if publication and repo_version:
+            raise Exception("Either a repo_version or publication can be specified.")
+        content_repo_ver = repo_version or publication.repository_version
+        sources = []
+
+        if publication:
+            pas = self._directory_entries(
+                publication.published_artifact.all(),
+                path,
+                content_repo_ver,
+                prefix="content_artifact__",
+            )
+            sources.append(pas)
+
+        if repo_version or publication.pass_through:
+            if await content_repo_ver.paths.aexists():
+                cas = self._directory_entries(
+                    content_repo_ver.paths.all(),
+                    path,
+                    content_repo_ver,
+                    prefix="content_artifact__",
+                )
+            else:
+                cas = self._directory_entries(
+                    ContentArtifact.objects.filter(content__in=content_repo_ver.content),
+                    path,
+                    content_repo_ver,
+                )
+            sources.append(cas)
+
+        async def rows(qs):
+            async for entry in qs.aiterator(chunk_size=1000):
+                yield entry["name"], entry["date"], entry["size"]
+
+        entries = self._merge_directory_entries(*(rows(qs) for qs in sources))
+        try:
+            first = await entries.__anext__()
+        except StopAsyncIteration:
+            raise PathNotResolved(path)
+        yield first
+        async for entry in entries:
+            yield entry
+
     async def list_directory(self, repo_version, publication, path):
         """
         Generate a set with directory listing of the path.
@@ -437,71 +774,120 @@ class Handler:
         Returns:
             Set of strings representing the files and directories in the directory listing.
         """
+        directory_list = set()
+        dates = {}
+        sizes = {}
+        async for name, date, size in self.iter_directory(repo_version, publication, path):
+            directory_list.add(name)
+            if date:
+                dates[name] = date
+            if size:
+                sizes[name] = size
+        return directory_list, dates, sizes
 
-        def file_or_directory_name(directory_path, relative_path):
-            result = re.match(r"({})([^\/]*)(\/*)".format(re.escape(directory_path)), relative_path)
-            return "{}{}".format(result.groups()[1], result.groups()[2])
-
-        def list_directory_blocking():
-            if not publication and not repo_version:
-                raise Exception("Either a repo_version or publication is required.")
-            if publication and repo_version:
-                raise Exception("Either a repo_version or publication can be specified.")
-            content_repo_ver = repo_version or publication.repository_version
-            directory_list = set()
-            dates = {}
-            content_to_find = {}
-            sizes = {}
-            artifacts_to_find = {}
-
-            if publication:
-                pas = publication.published_artifact.select_related(
-                    "content_artifact__artifact"
-                ).filter(relative_path__startswith=path)
-                for pa in pas:
-                    name = file_or_directory_name(path, pa.relative_path)
-                    directory_list.add(name)
-                    dates[name] = pa.pulp_created
-                    content_to_find[pa.content_artifact.content_id] = name
-                    if pa.content_artifact.artifact:
-                        sizes[name] = pa.content_artifact.artifact.size
-                    else:
-                        artifacts_to_find[pa.content_artifact.pk] = name
+    @staticmethod
+    def _listing_pagination(request):
+        """
+        Parse the `limit` and `offset` query parameters of a directory listing request.
 
-            if repo_version or publication.pass_through:
-                cas = ContentArtifact.objects.select_related("artifact").filter(
-                    content__in=content_repo_ver.content, relative_path__startswith=path
-                )
-                for ca in cas:
-                    name = file_or_directory_name(path, ca.relative_path)
-                    directory_list.add(name)
-                    dates[name] = ca.pulp_created
-                    content_to_find[ca.content_id] = name
-                    if ca.artifact:
-                        sizes[name] = ca.artifact.size
-                    else:
-                        artifacts_to_find[ca.pk] = name
-
-            if directory_list:
-                # Find the dates the content got added to the repository
-                dates.update(
-                    {
-                        content_to_find[rc.content_id]: rc.pulp_created
-                        for rc in content_repo_ver._content_relationships()
-                        if rc.content_id in content_to_find
-                    }
-                )
-                # Find the sizes for on_demand artifacts
-                r_artifacts = RemoteArtifact.objects.filter(
-                    content_artifact__in=artifacts_to_find.keys()
-                ).values_list("content_artifact_id", "size")
-                sizes.update({artifacts_to_find[ra_ca_id]: size for ra_ca_id, size in r_artifacts})
+        Raises:
+            :class:`aiohttp.web_exceptions.HTTPBadRequest`: When they are not positive integers.
+        """
+        try:
+            limit = int(request.query["limit"]) if "limit" in request.query else None
+            offset = int(request.query.get("offset", 0))
+        except ValueError:
+            raise HTTPBadRequest(reason=_("limit and offset must be integers."))
+        if (limit is not None and limit < 1) or offset < 0:
+            raise HTTPBadRequest(reason=_("limit must be positive and offset not negative."))
+        return limit, offset
 
-                return directory_list, dates, sizes
-            else:
-                raise PathNotResolved(path)
+    async def _list_directory_response(self, request, distro, repo_version, publication, path):
+        """
+        Respond with the HTML directory listing of the path.
+
+        Listings shorter than `listing_stream_threshold` entries are returned as a regular
+        (cacheable) response. Longer listings are streamed to the client while they are read
+        from the database.
+
+        The `limit` and `offset` query parameters can be used to page through the listing.
 
-        return await sync_to_async(list_directory_blocking)()
+        Args:
+            request(:class:`~aiohttp.web.Request`): The request to prepare a response for.
+            distro (:class:`~pulpcore.plugin.models.Distribution`): The matched distribution.
+            repo_version (:class:`~pulpcore.app.models.RepositoryVersion`): The repository version
+            publication (:class:`~pulpcore.app.models.Publication`): Publication
+            path (str): relative path inside the repo version of publication.
+
+        Returns:
+            :class:`aiohttp.web.HTTPOk` or :class:`aiohttp.web.StreamResponse`: The listing.
+        """
+        limit, offset = self._listing_pagination(request)
+        extra = await sync_to_async(distro.content_handler_list_directory)(path)
+
+        async def extra_entries():
+            for name in sorted(extra):
+                yield name, None, None
+
+        entries = self._merge_directory_entries(
+            self.iter_directory(repo_version, publication, path), extra_entries()
+        )
+        pagination = {}
+
+        async def page():
+            index = 0
+            async for entry in entries:
+                if index >= offset:
+                    if limit is not None and index >= offset + limit:
+                        next_query = request.query.copy()
+                        next_query.update(limit=str(limit), offset=str(offset + limit))
+                        pagination["next_page"] = str(request.rel_url.with_query(next_query))
+                        break
+                    yield entry
+                index += 1
+
+        entries_iterator = page()
+        head = []
+        async for entry in entries_iterator:
+            head.append(entry)
+            if len(head) > self.listing_stream_threshold:
+                break
+        else:
+            return HTTPOk(
+                headers={"Content-Type": "text/html"},
+                body=self.listing_template.render(
+                    entries=head,
+                    path=request.path,
+                    root=request.path == settings.CONTENT_PATH_PREFIX,
+                    pagination=pagination,
+                ),
+            )
+
+        async def all_entries():
+            for entry in head:
+                yield entry
+            async for entry in entries_iterator:
+                yield entry
+
+        response = StreamResponse(headers={"Content-Type": "text/html"})
+        await response.prepare(request)
+        chunks = []
+        chunks_size = 0
+        async for chunk in self.listing_template_async.generate_async(
+            entries=all_entries(),
+            path=request.path,
+            root=request.path == settings.CONTENT_PATH_PREFIX,
+            pagination=pagination,
+        ):
+            chunks.append(chunk)
+            chunks_size += len(chunk)
+            if chunks_size >= 65536:
+                await response.write("".join(chunks).encode())
+                chunks = []
+                chunks_size = 0
+        await response.write("".join(chunks).encode())
+        await response.write_eof()
+        return response
 
     async def _match_and_stream(self, path, request):
         """
@@ -536,7 +922,7 @@ class Handler:
             :class:`aiohttp.web.StreamResponse` or :class:`aiohttp.web.FileResponse`: The response
                 streamed back to the client.
         """
-        distro = await sync_to_async(self._match_distribution)(path)
+        distro = await self._amatch_distribution(path)
 
         await sync_to_async(self._permit)(request, distro)
 
@@ -582,15 +968,8 @@ class Handler:
                     rel_path = index_path
                     headers = self.response_headers(rel_path, distro)
                 except ObjectDoesNotExist:
-                    dir_list, dates, sizes = await self.list_directory(None, publication, rel_path)
-                    dir_list.update(
-                        await sync_to_async(distro.content_handler_list_directory)(rel_path)
-                    )
-                    return HTTPOk(
-                        headers={"Content-Type": "text/html"},
-                        body=self.render_html(
-                            dir_list, path=request.path, dates=dates, sizes=sizes
-                        ),
+                    return await self._list_directory_response(
+                        request, distro, None, publication, rel_path
                     )
 
             # published artifact
@@ -616,15 +995,7 @@ class Handler:
             # pass-through
             if publication.pass_through:
                 try:
-                    ca = (
-                        await ContentArtifact.objects.select_related(
-                            "artifact", "artifact__pulp_domain"
-                        )
-                        .filter(
-                            content__in=publication.repository_version.content,
-                        )
-                        .aget(relative_path=rel_path)
-                    )
+                    ca = await self._get_content_artifact(publication.repository_version, rel_path)
 
                 except MultipleObjectsReturned:
                     log.error(
@@ -646,27 +1017,19 @@ class Handler:
             if rel_path == "" or rel_path[-1] == "/":
                 index_path = "{}index.html".format(rel_path)
 
-                contentartifact_exists = await ContentArtifact.objects.filter(
-                    content__in=repo_version.content, relative_path=index_path
-                ).aexists()
-                if contentartifact_exists:
-                    rel_path = index_path
-                else:
-                    dir_list, dates, sizes = await self.list_directory(repo_version, None, rel_path)
-                    dir_list.update(
-                        await sync_to_async(distro.content_handler_list_directory)(rel_path)
-                    )
-                    return HTTPOk(
-                        headers={"Content-Type": "text/html"},
-                        body=self.render_html(
-                            dir_list, path=request.path, dates=dates, sizes=sizes
-                        ),
+                try:
+                    await self._get_content_artifact(repo_version, index_path)
+                except ObjectDoesNotExist:
+                    return await self._list_directory_response(
+                        request, distro, repo_version, None, rel_path
                     )
+                except MultipleObjectsReturned:
+                    # Reported when the index path is served below
+                    pass
+                rel_path = index_path
 
             try:
-                ca = await ContentArtifact.objects.select_related(
-                    "artifact", "artifact__pulp_domain"
-                ).aget(content__in=repo_version.content, relative_path=rel_path)
+                ca = await self._get_content_artifact(repo_version, rel_path)
 
             except MultipleObjectsReturned:
                 log.error(
@@ -734,6 +1097,39 @@ class Handler:
             reason = None
         raise PathNotResolved(path, reason=reason)
 
+    @staticmethod
+    async def _get_content_artifact(repo_version, rel_path):
+        """
+        Find the ContentArtifact of a repository version at a relative path.
+
+        The relative path index of the repository version is used if it has been built. Versions
+        completed before the index existed are searched through their content instead.
+
+        Args:
+            repo_version (:class:`~pulpcore.app.models.RepositoryVersion`): The repository version
+            rel_path (str): The relative path of the ContentArtifact.
+
+        Raises:
+            ObjectDoesNotExist: When there is no ContentArtifact at rel_path.
+            MultipleObjectsReturned: When there are several ContentArtifacts at rel_path.
+
+        Returns:
+            The :class:`~pulpcore.app.models.ContentArtifact` with its artifact selected.
+        """
+        try:
+            version_path = await RepositoryVersionPath.objects.select_related(
+                "content_artifact__artifact__pulp_domain"
+            ).aget(repository_version=repo_version, relative_path=rel_path)
+        except ObjectDoesNotExist:
+            if await repo_version.paths.aexists():
+                raise
+        else:
+            return version_path.content_artifact
+
+        return await ContentArtifact.objects.select_related(
+            "artifact", "artifact__pulp_domain"
+        ).aget(content__in=repo_version.content, relative_path=rel_path)
+
     async def _stream_content_artifact(self, request, response, content_artifact):
         """
         Stream and optionally save a ContentArtifact by requesting it using the associated remote.
@@ -918,6 +1314,10 @@ class Handler:
                 raise Exception(_("Expected path '{}' is not found").format(path))
             return FileResponse(path, headers=headers)
         elif not domain.redirect_to_object_storage:
+            if self.artifact_cache:
+                path = await self.artifact_cache.get_or_fill(content_artifact.artifact)
+                if path:
+                    return FileResponse(path, headers=headers)
             return ArtifactResponse(content_artifact.artifact, headers=headers)
         elif domain.storage_class == "storages.backends.s3boto3.S3Boto3Storage":
             headers["Content-Disposition"] = content_disposition
@@ -980,6 +1380,23 @@ class Handler:
             size = remote_artifact.size or "*"
             raise HTTPRequestRangeNotSatisfiable(headers={"Content-Range": f"bytes */{size}"})
 
+        if settings.ON_DEMAND_RANGE_REQUESTS and (
+            remote.policy == Remote.STREAMED or not save_artifact
+        ):
+            byte_range = self._upstream_range(remote_artifact, range_start, range_stop)
+            if byte_range:
+                return await self._stream_remote_range(
+                    request, response, remote, remote_artifact, *byte_range
+                )
+
+        if range_start is not None and range_start < 0:
+            # A suffix range, e.g. "bytes=-500", can only be served knowing the size, the whole
+            # artifact is sent otherwise
+            if size:
+                range_start = max(0, size + range_start)
+            else:
+                range_start = range_stop = None
+
         actual_content_length = None
 
         if range_start or range_stop:
@@ -1018,6 +1435,18 @@ class Handler:
 
         data_size_handled = 0
 
+        if remote.policy != Remote.STREAMED:
+            return await self._stream_shared_download(
+                request,
+                response,
+                remote,
+                remote_artifact,
+                save_artifact,
+                handle_response_headers,
+                range_start,
+                range_stop,
+            )
+
         async def handle_data(data):
             nonlocal data_size_handled
             # If we got here, and the response hasn't had "prepare()" called on it, it's due to
@@ -1040,28 +1469,279 @@ class Handler:
                 data_size_handled = data_size_handled + len(data)
             else:
                 await response.write(data)
-            if remote.policy != Remote.STREAMED:
-                await original_handle_data(data)
 
         async def finalize():
-            if save_artifact and remote.policy != Remote.STREAMED:
-                await original_finalize()
+            pass
 
         downloader = remote.get_downloader(
             remote_artifact=remote_artifact, headers_ready_callback=handle_response_headers
         )
-        original_handle_data = downloader.handle_data
         downloader.handle_data = handle_data
-        original_finalize = downloader.finalize
         downloader.finalize = finalize
-        download_result = await downloader.run()
+        await downloader.run()
+        await response.write_eof()
+
+        if response.status == 404:
+            raise HTTPNotFound()
+        return response
+
+    def _upstream_range(self, remote_artifact, range_start, range_stop):
+        """
+        Translate the range of a request into the range to request from the remote.
+
+        Returns:
+            A `(start, stop)` tuple of the first byte and the byte after the last one, `stop` is
+            None if the end of the remote artifact is not known. None if the whole remote artifact
+            is requested, or the range cannot be resolved without knowing its size.
+        """
+        size = remote_artifact.size
+        if not size and self.range_cache:
+            size = self.range_cache.total(remote_artifact.url)
+        if range_start is None:
+            return None
+        if range_start < 0:
+            # A suffix range, e.g. "bytes=-500"
+            if not size:
+                return None
+            range_start = max(0, size + range_start)
+        if size and (range_stop is None or range_stop > size):
+            range_stop = size
+        if not range_start and (range_stop is None or range_stop == size):
+            return None
+        return range_start, range_stop
+
+    @staticmethod
+    def _set_range_headers(response, start, stop, total):
+        response.set_status(206)
+        response.headers["Content-Length"] = str(stop - start)
+        response.headers["Content-Range"] = "bytes {0}-{1}/{2}".format(
+            start, stop - 1, total or "*"
+        )
+
+    async def _stream_remote_range(self, request, response, remote, remote_artifact, start, stop):
+        """
+        Stream a byte range of a RemoteArtifact, fetching only that range from the remote.
+
+        The fetched bytes are kept in the `range_cache`, so requests for ranges that were already
+        fetched are served without contacting the remote. The RemoteArtifact is not saved.
+
+        Args:
+            request(:class:`~aiohttp.web.Request`): The request to prepare a response for.
+            response (:class:`~aiohttp.web.StreamResponse`): The response to stream data to.
+            remote (:class:`~pulpcore.plugin.models.Remote`): The detail remote.
+            remote_artifact (:class:`~pulpcore.plugin.models.RemoteArtifact`): The RemoteArtifact
+                to fetch the range of.
+            start (int): The first byte to stream.
+            stop (int): The byte after the last byte to stream, or None to stream up to the end.
+        """
+        key = remote_artifact.url
+        cached = self.range_cache.lookup(key, start, stop) if self.range_cache and stop else None
+        if cached:
+            path, headers = cached
+            fd = os.open(path, os.O_RDONLY)
+            try:
+                response.headers.update(headers)
+                self._set_range_headers(response, start, stop, self.range_cache.total(key))
+                await response.prepare(request)
+                offset = start
+                while offset < stop:
+                    data = os.pread(fd, min(stop - offset, 1048576), offset)
+                    if not data:
+                        break
+                    await response.write(data)
+                    offset += len(data)
+            finally:
+                os.close(fd)
+            await response.write_eof()
+            return response
+
+        total = None
+        position = 0  # Offset of the data received from the remote in the remote artifact
+        sent = start  # Offset of the data to send to the client next
+        response_headers = {}
+
+        async def handle_response_headers(headers):
+            nonlocal total, position, stop
+            content_range = headers.get("Content-Range")
+            if content_range:
+                # e.g. "bytes 0-499/1234", the remote honoured the range
+                first_last, _, length = content_range.partition(" ")[2].partition("/")
+                position = int(first_last.partition("-")[0])
+                total = None if length == "*" else int(length)
+                if stop is None:
+                    stop = int(first_last.partition("-")[2]) + 1
+            else:
+                position = 0
+                if "Content-Length" in headers:
+                    total = int(headers["Content-Length"])
+            if total and (stop is None or stop > total):
+                stop = total
+            for name, value in headers.items():
+                lower_name = name.lower()
+                if lower_name not in self.hop_by_hop_headers and lower_name != "content-range":
+                    response.headers[name] = value
+                    response_headers[name] = value
+            if stop is not None:
+                self._set_range_headers(response, start, stop, total)
+            await response.prepare(request)
+
+        async def handle_data(data):
+            nonlocal position, sent
+            # FileDownloader doesn't call headers_ready_callback, see `_stream_remote_artifact`
+            if not response.prepared:
+                await response.prepare(request)
+            begin = max(sent - position, 0)
+            end = len(data) if stop is None else min(len(data), stop - position)
+            if begin < end:
+                await response.write(data[begin:end])
+                if self.range_cache:
+                    self.range_cache.store(
+                        key, position + begin, data[begin:end], total, response_headers
+                    )
+                sent = position + end
+            position += len(data)
+            if stop is not None and position >= stop:
+                raise _RangeComplete()
+
+        async def finalize():
+            pass
+
+        downloader = remote.get_downloader(
+            remote_artifact=remote_artifact,
+            headers_ready_callback=handle_response_headers,
+            byte_range=(start, stop),
+        )
+        downloader.handle_data = handle_data
+        downloader.finalize = finalize
+        try:
+            await downloader.run()
+        except _RangeComplete:
+            pass
+        await response.write_eof()
+        return response
 
-        if save_artifact and remote.policy != Remote.STREAMED:
-            await asyncio.shield(
-                sync_to_async(self._save_artifact)(download_result, remote_artifact, request)
+    async def _stream_shared_download(
+        self,
+        request,
+        response,
+        remote,
+        remote_artifact,
+        save_artifact,
+        handle_response_headers,
+        range_start,
+        range_stop,
+    ):
+        """
+        Stream a RemoteArtifact from a download shared by all the requests for it.
+
+        The first request for a RemoteArtifact starts a download of it into a temporary file.
+        Requests arriving while it is in progress attach to it and read the temporary file behind
+        the download, instead of downloading the RemoteArtifact from the remote once more.
+
+        Args:
+            request(:class:`~aiohttp.web.Request`): The request to prepare a response for.
+            response (:class:`~aiohttp.web.StreamResponse`): The response to stream data to.
+            remote (:class:`~pulpcore.plugin.models.Remote`): The detail remote.
+            remote_artifact (:class:`~pulpcore.plugin.models.RemoteArtifact`): The RemoteArtifact
+                to fetch and then stream back to the client
+            save_artifact (bool): Override the save behavior on the streamed RemoteArtifact
+            handle_response_headers (callable): Coroutine preparing the response from the
+                upstream response headers.
+            range_start (int): The first byte requested, or None.
+            range_stop (int): The byte after the last byte requested, or None.
+        """
+        key = (remote.pk, remote_artifact.url, save_artifact)
+        shared = self.shared_downloads.get(key)
+        if shared is None:
+            shared = SharedDownload()
+            self.shared_downloads[key] = shared
+            task = asyncio.create_task(
+                self._run_shared_download(
+                    key, shared, remote, remote_artifact, save_artifact, request
+                )
             )
+            task.add_done_callback(self._log_shared_download_error)
+
+        shared.attach()
+        try:
+            await shared.wait(lambda: shared.headers is not None or shared.size)
+            if shared.headers is not None:
+                await handle_response_headers(shared.headers)
+            elif not response.prepared:
+                # Some downloaders (i.e., FileDownloader) don't provide any headers.
+                await response.prepare(request)
+
+            offset = range_start or 0
+            while range_stop is None or offset < range_stop:
+                await shared.wait(lambda: shared.size > offset)
+                if shared.size > offset:
+                    stop = shared.size if range_stop is None else min(shared.size, range_stop)
+                    data = shared.read(offset, min(stop - offset, 1048576))
+                    await response.write(data)
+                    offset += len(data)
+                else:
+                    break
+        finally:
+            shared.release()
         await response.write_eof()
 
         if response.status == 404:
             raise HTTPNotFound()
         return response
+
+    async def _run_shared_download(
+        self, key, shared, remote, remote_artifact, save_artifact, request
+    ):
+        """
+        Download a RemoteArtifact into a temporary file for a SharedDownload, and save it.
+
+        The download does not depend on any request, so it is completed and saved even if the
+        client that started it goes away.
+        """
+        downloader = remote.get_downloader(
+            remote_artifact=remote_artifact, headers_ready_callback=shared.set_headers
+        )
+        original_handle_data = downloader.handle_data
+        original_finalize = downloader.finalize
+
+        async def handle_data(data):
+            await original_handle_data(data)
+            downloader._writer.flush()
+            await shared.append(downloader.path, len(data))
+
+        async def finalize():
+            if save_artifact:
+                await original_finalize()
+
+        downloader.handle_data = handle_data
+        downloader.finalize = finalize
+        # Keep the file open for the requests attaching until the artifact is saved
+        shared.attach()
+        try:
+            try:
+                download_result = await downloader.run()
+            except BaseException as e:
+                if not isinstance(e, Exception):
+                    # The readers must not be cancelled themselves
+                    e = RuntimeError("Download of {} cancelled.".format(remote_artifact.url))
+                await shared.finish(error=e)
+                raise
+            await shared.finish()
+
+            if save_artifact:
+                await sync_to_async(self._save_artifact)(download_result, remote_artifact, request)
+            elif downloader.path:
+                downloader._writer.close()
+                os.unlink(downloader.path)
+        finally:
+            # Requests arriving from now on start a new download, or find the saved artifact
+            del self.shared_downloads[key]
+            shared.release()
+
+    @staticmethod
+    def _log_shared_download_error(task):
+        if not task.cancelled() and task.exception():
+            log.error(
+                "On-demand download failed: {}".format(task.exception()),
+                exc_info=task.exception(),
+            )
@@ -0,0 +1,132 @@
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+
+from django.conf import settings
+
+
+class _Entry:
+    def __init__(self, path):
+        self.path = path
+        self.total = None
+        self.headers = {}
+        # Sorted, non-overlapping [start, stop) byte intervals stored in the file
+        self.intervals = []
+
+    @property
+    def size(self):
+        return sum(stop - start for start, stop in self.intervals)
+
+    def covers(self, start, stop):
+        return any(s <= start and stop <= e for s, e in self.intervals)
+
+    def add(self, start, stop):
+        merged = []
+        for s, e in self.intervals:
+            if e < start or stop < s:
+                merged.append((s, e))
+            else:
+                start, stop = min(s, start), max(e, stop)
+        merged.append((start, stop))
+        self.intervals = sorted(merged)
+
+
+class RangeCache:
+    """
+    A per-process cache of byte ranges of streamed remote artifacts.
+
+    Every remote artifact gets a sparse file the fetched ranges are written into at their offsets,
+    so serving a part of a large file costs disk space proportional to the bytes requested. When
+    the cache holds more than `max_size` bytes, the least recently used files are removed.
+    """
+
+    def __init__(self, max_size, directory=None):
+        """
+        Args:
+            max_size (int): Number of bytes the cache may hold.
+            directory (str): Directory to keep the files in. A new directory in the
+                `WORKING_DIRECTORY` is created when it is first needed if not given.
+        """
+        self.max_size = max_size
+        self.directory = directory
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def _entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            if self.directory is None:
+                os.makedirs(settings.WORKING_DIRECTORY, exist_ok=True)
+                self.directory = tempfile.mkdtemp(
+                    dir=settings.WORKING_DIRECTORY, prefix="range-cache-"
+                )
+            fd, path = tempfile.mkstemp(dir=self.directory)
+            os.close(fd)
+            entry = self._entries[key] = _Entry(path)
+        self._entries.move_to_end(key)
+        return entry
+
+    def total(self, key):
+        """Return the size of the whole remote artifact, if a fetched range revealed it."""
+        entry = self._entries.get(key)
+        return entry.total if entry else None
+
+    def lookup(self, key, start, stop):
+        """
+        Find a cached byte range.
+
+        Args:
+            key (str): The key of the remote artifact, e.g. its URL.
+            start (int): The first byte of the range.
+            stop (int): The byte after the last byte of the range.
+
+        Returns:
+            A tuple of the path of the file the range is stored in at offset `start` and the
+            headers of the response it was fetched with, or `None` if it is not cached.
+        """
+        entry = self._entries.get(key)
+        if entry is None or not entry.covers(start, stop):
+            return None
+        self._entries.move_to_end(key)
+        return entry.path, entry.headers
+
+    def store(self, key, offset, data, total=None, headers=None):
+        """
+        Store fetched bytes of a remote artifact.
+
+        Args:
+            key (str): The key of the remote artifact, e.g. its URL.
+            offset (int): The position of `data` in the remote artifact.
+            data (bytes): The fetched bytes.
+            total (int): The size of the whole remote artifact, if known.
+            headers (dict): The headers to serve the cached bytes with.
+        """
+        if not data or len(data) > self.max_size:
+            return
+        entry = self._entry(key)
+        if total is not None:
+            entry.total = total
+        if headers is not None:
+            entry.headers = headers
+        with open(entry.path, "r+b") as f:
+            f.seek(offset)
+            f.write(data)
+        self.size -= entry.size
+        entry.add(offset, offset + len(data))
+        self.size += entry.size
+        while self.size > self.max_size:
+            self._evict()
+
+    def _evict(self):
+        _, entry = self._entries.popitem(last=False)
+        self.size -= entry.size
+        os.unlink(entry.path)
+
+    def clear(self):
+        """Remove all the cached ranges, and the directory they are kept in."""
+        self._entries.clear()
+        self.size = 0
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
@@ -99,6 +99,7 @@ class BaseDownloader:
             self.semaphore = asyncio.Semaphore()  # This will always be acquired
         self._digests = {}
         self._size = 0
+        self._pending_data = None
         if self.expected_digests:
             if not set(self.expected_digests).intersection(set(Artifact.DIGEST_FIELDS)):
                 raise UnsupportedDigestValidationError(
@@ -129,7 +130,7 @@ class BaseDownloader:
             # the same filename from two different URLs, and the files may not be the same.
             self._writer = tempfile.NamedTemporaryFile(dir=".", suffix=suffix, delete=False)
             self.path = self._writer.name
-            self._digests = {n: pulp_hashlib.new(n) for n in Artifact.DIGEST_FIELDS}
+            self._digests = pulp_hashlib.Hashers(Artifact.DIGEST_FIELDS)
             self._size = 0
 
     async def handle_data(self, data):
@@ -146,7 +147,28 @@ class BaseDownloader:
         """
         self._ensure_writer_has_open_file()
         self._writer.write(data)
-        self._record_size_and_digests_for_data(data)
+        if len(data) >= pulp_hashlib.PARALLEL_HASHING_THRESHOLD:
+            # Keep the event loop serving other downloads while this chunk is hashed. The hashing
+            # goes on if this is cancelled, see `_wait_for_pending_data`.
+            self._pending_data = asyncio.get_event_loop().run_in_executor(
+                None, self._record_size_and_digests_for_data, data
+            )
+            await asyncio.shield(self._pending_data)
+            self._pending_data = None
+        else:
+            self._record_size_and_digests_for_data(data)
+
+    async def _wait_for_pending_data(self):
+        """
+        Wait until the chunk of a cancelled :meth:`handle_data` call is recorded.
+
+        Afterwards, the size and the digests match the data written to the file again.
+        """
+        if self._pending_data is not None:
+            try:
+                await self._pending_data
+            finally:
+                self._pending_data = None
 
     async def finalize(self):
         """
@@ -192,8 +214,7 @@ class BaseDownloader:
         Args:
             data (bytes): The data to have its size and digest values recorded.
         """
-        for algorithm in self._digests.values():
-            algorithm.update(data)
+        self._digests.update(data)
         self._size += len(data)
 
     @property
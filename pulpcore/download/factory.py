@@ -3,6 +3,7 @@ import asyncio
 import atexit
 import copy
 from gettext import gettext as _
+import logging
 from multidict import MultiDict
 import platform
 from pkg_resources import get_distribution
@@ -12,17 +13,31 @@ from tempfile import NamedTemporaryFile
 from urllib.parse import urlparse
 
 import aiohttp
+from django.conf import settings
 
 from .http import HttpDownloader
 from .file import FileDownloader
 
 
+log = logging.getLogger(__name__)
+
+
 PROTOCOL_MAP = {
     "http": HttpDownloader,
     "https": HttpDownloader,
     "file": FileDownloader,
 }
 
+# Seconds to cache DNS lookups for when connections are pooled
+DNS_CACHE_TTL = 300
+# Errors on reused connections after which connections to the remote are not pooled anymore
+KEEPALIVE_FAILURE_THRESHOLD = 3
+KEEPALIVE_ERRORS = (
+    aiohttp.ClientOSError,
+    aiohttp.ClientPayloadError,
+    aiohttp.ServerDisconnectedError,
+)
+
 
 class DownloaderFactory:
     """
@@ -51,7 +66,12 @@ class DownloaderFactory:
 
     Also for http and https urls, even though HTTP 1.1 is used, the TCP connection is setup and
     closed with each request. This is done for compatibility reasons due to various issues related
-    to session continuation implementation in various servers.
+    to session continuation implementation in various servers. With the
+    `DOWNLOAD_CONNECTION_POOLING` setting enabled, connections are kept alive and reused instead,
+    up to `download_concurrency` connections per host. If requests on reused connections fail
+    `KEEPALIVE_FAILURE_THRESHOLD` times, the factory falls back to closing the connections.
+
+    The number of connections created and reused is counted in `connection_stats`.
     """
 
     def __init__(self, remote, downloader_overrides=None):
@@ -75,7 +95,12 @@ class DownloaderFactory:
             "http": self._http_or_https,
             "file": self._generic,
         }
+        self._download_concurrency = download_concurrency
+        self._pooled = settings.DOWNLOAD_CONNECTION_POOLING
+        self.connection_stats = {"created": 0, "reused": 0, "keepalive_failures": 0}
+        self._sessions = []
         self._session = self._make_aiohttp_session_from_remote()
+        self._sessions.append(self._session)
         self._semaphore = asyncio.Semaphore(value=download_concurrency)
         atexit.register(self._session_cleanup)
 
@@ -91,18 +116,69 @@ class DownloaderFactory:
         return f"pulpcore/{pulp_version} ({python}, {system}) (aiohttp {aiohttp_version})"
 
     def _session_cleanup(self):
-        asyncio.get_event_loop().run_until_complete(self._session.close())
+        log.debug("Connections to remote '{}': {}".format(self._remote.name, self.connection_stats))
+        for session in self._sessions:
+            asyncio.get_event_loop().run_until_complete(session.close())
+
+    def _make_trace_config(self):
+        """
+        Build a :class:`aiohttp.TraceConfig` counting the connections created and reused.
+
+        Requests failing on a reused connection are counted as keep-alive failures, and make the
+        factory stop pooling connections once there are `KEEPALIVE_FAILURE_THRESHOLD` of them.
+        """
+
+        async def on_connection_create_end(session, context, params):
+            self.connection_stats["created"] += 1
+
+        async def on_connection_reuseconn(session, context, params):
+            self.connection_stats["reused"] += 1
+            context.reused = True
+
+        async def on_request_exception(session, context, params):
+            if getattr(context, "reused", False) and isinstance(params.exception, KEEPALIVE_ERRORS):
+                self.connection_stats["keepalive_failures"] += 1
+                if self._pooled and (
+                    self.connection_stats["keepalive_failures"] >= KEEPALIVE_FAILURE_THRESHOLD
+                ):
+                    self._stop_pooling()
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def _stop_pooling(self):
+        """Close the connections after each request from now on, for misbehaving remotes."""
+        log.warning(
+            _("Reused connections to remote '{}' keep failing, they won't be kept alive.").format(
+                self._remote.name
+            )
+        )
+        self._pooled = False
+        # Downloaders built before keep using the pooled session until they are done
+        self._session = self._make_aiohttp_session_from_remote()
+        self._sessions.append(self._session)
 
     def _make_aiohttp_session_from_remote(self):
         """
         Build a :class:`aiohttp.ClientSession` from the remote's settings and timing settings.
 
-        This method is what provides the force_close of the TCP connection with each request.
+        This method is what provides the force_close of the TCP connection with each request, or
+        the pooling of the connections if `DOWNLOAD_CONNECTION_POOLING` is enabled.
 
         Returns:
             :class:`aiohttp.ClientSession`
         """
-        tcp_conn_opts = {"force_close": True}
+        if self._pooled:
+            tcp_conn_opts = {
+                "limit": self._download_concurrency,
+                "limit_per_host": self._download_concurrency,
+                "ttl_dns_cache": DNS_CACHE_TTL,
+            }
+        else:
+            tcp_conn_opts = {"force_close": True}
 
         sslcontext = None
         if self._remote.ca_cert:
@@ -143,7 +219,11 @@ class DownloaderFactory:
             total=total, sock_connect=sock_connect, sock_read=sock_read, connect=connect
         )
         return aiohttp.ClientSession(
-            connector=conn, timeout=timeout, headers=headers, requote_redirect_url=False
+            connector=conn,
+            timeout=timeout,
+            headers=headers,
+            requote_redirect_url=False,
+            trace_configs=[self._make_trace_config()],
         )
 
     def build(self, url, **kwargs):
@@ -113,6 +113,12 @@ class HttpDownloader(BaseDownloader):
     The coroutine will automatically retry 10 times with exponential backoff before allowing a
     final exception to be raised.
 
+    When a download is retried after it wrote some data, and the server advertised support for
+    byte ranges with `Accept-Ranges: bytes`, the download is resumed where it stopped with a
+    `Range` request. The data downloaded so far and the state of the digests computed on it are
+    kept. `If-Range` makes the server send the whole file again if it changed in the meantime, in
+    which case the download starts over.
+
     Attributes:
         session (aiohttp.ClientSession): The session to be used by the downloader.
         auth (aiohttp.BasicAuth): An object that represents HTTP Basic Authorization or None
@@ -123,6 +129,11 @@ class HttpDownloader(BaseDownloader):
             as its argument. The callback will be called when the response headers are
             available. The dictionary passed has the header names as the keys and header values
             as its values. e.g. `{'Transfer-Encoding': 'chunked'}`. This can also be None.
+        byte_range (tuple): An optional `(start, stop)` tuple of the first byte to download and
+            the byte after the last one, `stop` can be None to download up to the end. The range
+            is requested with a `Range` header; servers ignoring it respond with all the data, so
+            callers need to check the `Content-Range` response header. Downloads of a range are
+            not validated against the expected digests and size.
 
     This downloader also has all of the attributes of
     :class:`~pulpcore.plugin.download.BaseDownloader`
@@ -139,6 +150,7 @@ class HttpDownloader(BaseDownloader):
         headers=None,
         throttler=None,
         max_retries=0,
+        byte_range=None,
         **kwargs,
     ):
         """
@@ -157,6 +169,7 @@ class HttpDownloader(BaseDownloader):
             headers (dict): Headers to be submitted with the request.
             throttler (asyncio_throttle.Throttler): Throttler for asyncio.
             max_retries (int): The maximum number of times to retry a download upon failure.
+            byte_range (tuple): The `(start, stop)` byte range to download. (optional)
             kwargs (dict): This accepts the parameters of
                 :class:`~pulpcore.plugin.download.BaseDownloader`.
         """
@@ -176,6 +189,14 @@ class HttpDownloader(BaseDownloader):
         self.headers_ready_callback = headers_ready_callback
         self.download_throttler = throttler
         self.max_retries = max_retries
+        self.byte_range = byte_range
+        self._resumable = False
+        self._resume_from = 0
+        self._range_validator = None
+        self._response_headers = None
+        if byte_range:
+            kwargs.pop("expected_digests", None)
+            kwargs.pop("expected_size", None)
         super().__init__(url, **kwargs)
 
     def raise_for_status(self, response):
@@ -201,7 +222,7 @@ class HttpDownloader(BaseDownloader):
              DownloadResult: Contains information about the result. See the DownloadResult docs for
                  more information.
         """
-        if self.headers_ready_callback:
+        if self.headers_ready_callback and not self._resume_from:
             await self.headers_ready_callback(response.headers)
         while True:
             chunk = await response.content.read(1048576)  # 1 megabyte
@@ -213,7 +234,7 @@ class HttpDownloader(BaseDownloader):
             path=self.path,
             artifact_attributes=self.artifact_attributes,
             url=self.url,
-            headers=response.headers,
+            headers=self._response_headers or response.headers,
         )
 
     async def run(self, extra_data=None):
@@ -253,7 +274,7 @@ class HttpDownloader(BaseDownloader):
                 giveup=http_giveup_handler,
             )
             async def download_wrapper():
-                self._ensure_no_broken_file()
+                await self._prepare_attempt()
                 try:
                     return await self._run(extra_data=extra_data)
                 except asyncio.TimeoutError:
@@ -288,16 +309,89 @@ class HttpDownloader(BaseDownloader):
         """
         if self.download_throttler:
             await self.download_throttler.acquire()
+        headers = None
+        if self.byte_range:
+            start, stop = self.byte_range
+            headers = {"Range": "bytes={}-{}".format(start, "" if stop is None else stop - 1)}
+        elif self._resume_from:
+            headers = {"Range": "bytes={}-".format(self._resume_from)}
+            if self._range_validator:
+                headers["If-Range"] = self._range_validator
         async with self.session.get(
-            self.url, proxy=self.proxy, proxy_auth=self.proxy_auth, auth=self.auth
+            self.url, proxy=self.proxy, proxy_auth=self.proxy_auth, auth=self.auth, headers=headers
         ) as response:
+            if self._resume_from:
+                self._check_resumed(response)
             self.raise_for_status(response)
+            if not self._resume_from:
+                self._record_resumable(response)
             to_return = await self._handle_response(response)
             await response.release()
         if self._close_session_on_finalize:
             await self.session.close()
         return to_return
 
+    async def _prepare_attempt(self):
+        """
+        Upon retry, keep the data written so far if the download can be resumed from it.
+
+        Otherwise, reset the writer back to None to get a fresh file.
+        """
+        # An attempt that timed out can leave a chunk being hashed
+        await self._wait_for_pending_data()
+        if self._writer is not None and self._resumable and self._size:
+            # Drop anything written beyond the data recorded in the size and the digests
+            self._writer.flush()
+            self._writer.seek(self._size)
+            self._writer.truncate()
+            self._resume_from = self._size
+        else:
+            self._resume_from = 0
+            self._ensure_no_broken_file()
+
+    def _record_resumable(self, response):
+        """Record whether the download can be resumed from the headers of a full response."""
+        self._response_headers = response.headers
+        self._resumable = (
+            not self.byte_range
+            and response.status == 200
+            and response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        )
+        # Weak entity tags are not allowed in If-Range
+        etag = response.headers.get("ETag")
+        if etag and not etag.startswith("W/"):
+            self._range_validator = etag
+        else:
+            self._range_validator = response.headers.get("Last-Modified")
+
+    def _check_resumed(self, response):
+        """
+        Check the response to a resumed download continues the data written so far.
+
+        If the server sent the whole file again instead, start over with a fresh file.
+
+        Raises:
+            aiohttp.ClientPayloadError: When the server sent some other part of the file, or
+                cannot send the requested one. The retry starts over.
+        """
+        resume_from = self._resume_from
+        if response.status == 206 and response.headers.get("Content-Range", "").startswith(
+            "bytes {}-".format(resume_from)
+        ):
+            return
+        if response.status not in (200, 206, 416):
+            # Errors are handled as for any other attempt, the next one may resume again
+            return
+        self._resume_from = 0
+        self._ensure_no_broken_file()
+        if response.status == 200:
+            self._record_resumable(response)
+        else:
+            self._resumable = False
+            raise aiohttp.ClientPayloadError(
+                "Could not resume the download of {} at byte {}.".format(self.url, resume_from)
+            )
+
     def _ensure_no_broken_file(self):
         """Upon retry reset writer back to None to get a fresh file."""
         if self._writer is not None:
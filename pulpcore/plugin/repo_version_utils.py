@@ -1,11 +1,12 @@
 from gettext import gettext as _
 import logging
 
-from django.db.models import Q
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.lookups import IsNull
 
 from pulpcore.app.files import validate_file_paths
 from pulpcore.app.models import Content, ContentArtifact
-from pulpcore.app.util import batch_qs
 
 
 _logger = logging.getLogger(__name__)
@@ -13,6 +14,23 @@ _logger = logging.getLogger(__name__)
 __all__ = ["remove_duplicates"]
 
 
+def _same_value(model, field):
+    """
+    Return a condition matching the value of `field` with the one of the outer query.
+
+    NULLs are considered equal, like `distinct()` in `validate_duplicate_content` does.
+    """
+    condition = Q(**{field: OuterRef(field)})
+    try:
+        nullable = model._meta.get_field(field).null
+    except FieldDoesNotExist:
+        # A lookup spanning relations, which may be NULL
+        nullable = True
+    if nullable:
+        condition |= Q(IsNull(OuterRef(field), True), **{f"{field}__isnull": True})
+    return condition
+
+
 def remove_duplicates(repository_version):
     """
     Inspect content additions in the `RepositoryVersion` and remove existing repository duplicates.
@@ -48,27 +66,28 @@ def remove_duplicates(repository_version):
 
     for pulp_type, type_obj in content_types.items():
         repo_key_fields = type_obj.repo_key_fields
-        new_content_qs = type_obj.objects.filter(
-            pk__in=added_content.filter(pulp_type=pulp_type)
-        ).values(*repo_key_fields)
+        new_content_qs = type_obj.objects.filter(pk__in=added_content.filter(pulp_type=pulp_type))
 
         if type_obj.repo_key_fields == ():
             continue
 
-        if new_content_qs.count() and existing_content.count():
+        if new_content_qs.exists() and existing_content.exists():
             _logger.debug(_("Removing duplicates for type: {}".format(type_obj.get_pulp_type())))
 
-            for batch in batch_qs(new_content_qs):
-                find_dup_qs = Q()
-
-                for content_dict in batch:
-                    item_query = Q(**content_dict)
-                    find_dup_qs |= item_query
-
-                duplicates_qs = (
-                    type_obj.objects.filter(pk__in=existing_content).filter(find_dup_qs).only("pk")
+            # A semi-join of the existing content against the added content on the repository
+            # key fields keeps the statement size constant, however much content was added.
+            duplicates_qs = (
+                type_obj.objects.filter(pk__in=existing_content)
+                .filter(
+                    Exists(
+                        new_content_qs.filter(
+                            *(_same_value(type_obj, field) for field in repo_key_fields)
+                        )
+                    )
                 )
-                repository_version.remove_content(duplicates_qs)
+                .only("pk")
+            )
+            repository_version.remove_content(duplicates_qs)
 
 
 def validate_duplicate_content(version):
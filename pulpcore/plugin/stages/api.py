@@ -1,12 +1,75 @@
 import asyncio
+import contextvars
+import functools
 import logging
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 from gettext import gettext as _
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
 from pulpcore.app.util import get_domain
 
 log = logging.getLogger(__name__)
 
+DEFAULT_BATCH_SIZE = 500
+
+
+class StageMetrics:
+    """
+    Counters of the items handled by a stage, and of the time it spent waiting on its queues.
+
+    Time blocked on `get` is time the stage waited for the previous stage, time blocked on `put`
+    is time it waited for the next one. A stage that is rarely blocked on either is the one
+    bottlenecking the pipeline.
+    """
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.items = 0
+        self.batches = 0
+        self.get_blocked = 0.0
+        self.put_blocked = 0.0
+        self._queued = 0
+        self._samples = 0
+
+    def sample_queue(self, queue):
+        """Record the occupancy of the input queue of the stage."""
+        self._queued += queue.qsize()
+        self._samples += 1
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def throughput(self):
+        """Items handled per second."""
+        return self.items / max(self.elapsed, 1e-9)
+
+    @property
+    def occupancy(self):
+        """Average number of items found in the input queue of the stage."""
+        return self._queued / self._samples if self._samples else 0.0
+
+    def __str__(self):
+        return _(
+            "{items} items in {batches} batches, {throughput:.1f} items/s, "
+            "{occupancy:.1f} items queued on average, "
+            "blocked {get_blocked:.1f}s on get and {put_blocked:.1f}s on put"
+        ).format(
+            items=self.items,
+            batches=self.batches,
+            throughput=self.throughput,
+            occupancy=self.occupancy,
+            get_blocked=self.get_blocked,
+            put_blocked=self.put_blocked,
+        )
+
 
 class Stage:
     """
@@ -19,6 +82,12 @@ class Stage:
         self._in_q = None
         self._out_q = None
         self.domain = get_domain()
+        self.metrics = StageMetrics()
+        # Set by an adaptive pipeline, see :func:`create_pipeline`
+        self._batch_size = None
+        self._throughput = None
+        # Set by a :class:`ShardedStage` running this stage as one of its replicas
+        self._executor = None
 
     def _connect(self, in_q, out_q):
         """
@@ -30,6 +99,7 @@ class Stage:
         """
         self._in_q = in_q
         self._out_q = out_q
+        self.metrics = StageMetrics()
 
     async def __call__(self):
         """
@@ -42,6 +112,24 @@ class Stage:
         await self._out_q.put(None)
         log.debug(_("%(name)s - put end-marker."), {"name": self})
 
+    async def run_sync(self, func, *args, **kwargs):
+        """
+        Coroutine calling the synchronous function `func`, e.g. to access the database.
+
+        Stages should use this instead of `sync_to_async` for their database writes, so that the
+        replicas of a :class:`ShardedStage` each run them in their own thread, with their own
+        database connection.
+
+        Returns:
+            The return value of `func`.
+        """
+        if self._executor is None:
+            return await sync_to_async(func)(*args, **kwargs)
+        context = contextvars.copy_context()
+        return await asyncio.get_event_loop().run_in_executor(
+            self._executor, functools.partial(context.run, func, *args, **kwargs)
+        )
+
     async def run(self):
         """
         The coroutine that is run as part of this stage.
@@ -73,13 +161,34 @@ class Stage:
 
         """
         while True:
+            self.metrics.sample_queue(self._in_q)
+            start = time.monotonic()
             content = await self._in_q.get()
+            self.metrics.get_blocked += time.monotonic() - start
             if content is None:
                 break
+            self.metrics.items += 1
             log.debug("%(name)s - next: %(content)s.", {"name": self, "content": content})
             yield content
 
-    async def batches(self, minsize=500):
+    def _tune_batch_size(self, size, duration):
+        """
+        Compute the size of the next batch from the time it took to handle the last one.
+
+        The size aims at batches taking `STAGES_BATCH_DURATION` seconds to handle, at the
+        throughput observed over the last batches. It at most doubles or halves from one batch to
+        the next, within `STAGES_MIN_BATCH_SIZE` and `STAGES_MAX_BATCH_SIZE`.
+        """
+        throughput = size / max(duration, 1e-3)
+        if self._throughput is None:
+            self._throughput = throughput
+        else:
+            self._throughput = 0.7 * self._throughput + 0.3 * throughput
+        target = int(self._throughput * settings.STAGES_BATCH_DURATION)
+        target = max(size // 2, min(target, size * 2))
+        return max(settings.STAGES_MIN_BATCH_SIZE, min(target, settings.STAGES_MAX_BATCH_SIZE))
+
+    async def batches(self, minsize=None):
         """
         Asynchronous iterator yielding batches of :class:`DeclarativeContent` from `self._in_q`.
 
@@ -88,7 +197,9 @@ class Stage:
         at least `minsize` instances.
 
         Args:
-            minsize (int): The minimum batch size to yield (unless it is the final batch)
+            minsize (int): The minimum batch size to yield (unless it is the final batch).
+                Defaults to 500, or to a size tuned from the time batches take to handle when
+                the pipeline is adaptive.
 
         Yields:
             A list of :class:`DeclarativeContent` instances
@@ -104,6 +215,9 @@ class Stage:
                                 await self.put(d_content)
 
         """
+        adaptive = minsize is None and self._batch_size is not None
+        if minsize is None:
+            minsize = self._batch_size or DEFAULT_BATCH_SIZE
         batch = []
         shutdown = False
         no_block = False
@@ -123,13 +237,17 @@ class Stage:
                     no_block = True
                 content._thaw_queue_event = thaw_queue_event
                 batch.append(content)
+                self.metrics.items += 1
 
         get_listener = asyncio.ensure_future(self._in_q.get())
         thaw_event_listener = asyncio.ensure_future(thaw_queue_event.wait())
         while not shutdown:
+            self.metrics.sample_queue(self._in_q)
+            start = time.monotonic()
             done, pending = await asyncio.wait(
                 [thaw_event_listener, get_listener], return_when=asyncio.FIRST_COMPLETED
             )
+            self.metrics.get_blocked += time.monotonic() - start
             if thaw_event_listener in done:
                 thaw_event_listener = asyncio.ensure_future(thaw_queue_event.wait())
                 no_block = True
@@ -152,7 +270,14 @@ class Stage:
                 for content in batch:
                     content._thaw_queue_event = None
                 thaw_queue_event.clear()
+                self.metrics.batches += 1
+                start = time.monotonic()
+                put_blocked = self.metrics.put_blocked
                 yield batch
+                if adaptive and len(batch) >= minsize:
+                    # Waiting for the next stage is not part of handling the batch
+                    duration = time.monotonic() - start - (self.metrics.put_blocked - put_blocked)
+                    minsize = self._batch_size = self._tune_batch_size(len(batch), duration)
                 batch = []
                 no_block = False
         thaw_event_listener.cancel()
@@ -170,13 +295,176 @@ class Stage:
         """
         if item is None:
             raise ValueError(_("(None) not permitted."))
+        start = time.monotonic()
         await self._out_q.put(item)
+        self.metrics.put_blocked += time.monotonic() - start
         log.debug("{name} - put: {content}".format(name=self, content=item))
 
     def __str__(self):
         return "[{id}] {name}".format(id=id(self), name=self.__class__.__name__)
 
 
+def _natural_key_shard_key(d_content):
+    return d_content.content.natural_key()
+
+
+class ShardedStage(Stage):
+    """
+    A Stages API stage running several replicas of a stage in parallel.
+
+    Each replica runs the database code it calls with :meth:`Stage.run_sync` in its own thread,
+    with its own database connection, so the replicas of a stage saving content can use several
+    database cores. Items are dispatched to the replicas by a key, the natural key of the content
+    by default: content units with the same key are always handled by the same replica, so
+    concurrent replicas never insert the same content. Rows shared by content units with different
+    keys, like their artifacts, can still be inserted by several replicas at once. The replicated
+    stages insert those in a consistent order, so they wait for each other rather than deadlock,
+    and fall back to the existing rows on conflicts, like
+    :class:`~pulpcore.plugin.stages.ArtifactSaver` does.
+
+    The order of the items is not preserved: they are passed on to the next stage in the order the
+    replicas are done with them, so the stages after it must not rely on it. Holding finished items
+    back until the ones before them are done could stall the pipeline, when the first stage waits
+    for the resolution of a held item while an earlier one waits for a replica to fill its batch.
+
+    Example:
+        Saving content with four replicas of `ContentSaver`::
+
+            ShardedStage([ContentSaver() for _ in range(4)])
+    """
+
+    def __init__(self, replicas, key=_natural_key_shard_key):
+        """
+        Args:
+            replicas (list): The instances of :class:`Stage` to run in parallel.
+            key (callable): Returns the key of a
+                :class:`~pulpcore.plugin.stages.DeclarativeContent` to dispatch it by.
+        """
+        super().__init__()
+        if not replicas:
+            raise ValueError(_("A sharded stage needs at least one replica."))
+        self.replicas = replicas
+        self.key = key
+
+    def _shard(self, d_content):
+        # The built-in hash() is not stable for all keys, e.g. lists, and crc32 is cheap
+        return zlib.crc32(repr(self.key(d_content)).encode()) % len(self.replicas)
+
+    async def run(self):
+        """
+        The coroutine for this stage.
+
+        Returns:
+            The coroutine for this stage.
+        """
+        loop = asyncio.get_event_loop()
+        shard_queues = [asyncio.Queue(maxsize=1) for _i in self.replicas]
+        merge_queue = asyncio.Queue(maxsize=len(self.replicas))
+        for i, (replica, shard_queue) in enumerate(zip(self.replicas, shard_queues)):
+            replica._connect(shard_queue, merge_queue)
+            replica._batch_size = self._batch_size
+            replica._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="{}-{}".format(type(replica).__name__, i)
+            )
+
+        async def dispatch():
+            async for d_content in self.items():
+                await shard_queues[self._shard(d_content)].put(d_content)
+            for shard_queue in shard_queues:
+                await shard_queue.put(None)
+
+        async def merge():
+            running = len(self.replicas)
+            while running:
+                d_content = await merge_queue.get()
+                if d_content is None:
+                    running -= 1
+                else:
+                    await self.put(d_content)
+
+        futures = [asyncio.ensure_future(replica()) for replica in self.replicas]
+        futures.extend([asyncio.ensure_future(dispatch()), asyncio.ensure_future(merge())])
+        try:
+            await asyncio.gather(*futures)
+        finally:
+            for future in futures:
+                future.cancel()
+            for replica in self.replicas:
+                log.debug("%(name)s - %(metrics)s.", {"name": replica, "metrics": replica.metrics})
+                # Close the connection of the replica thread once it is done, the connection
+                # proxy is resolved in the thread calling it
+                await loop.run_in_executor(replica._executor, lambda: connection.close())
+                replica._executor.shutdown(wait=False)
+                replica._executor = None
+
+
+class _ResizableQueue(asyncio.Queue):
+    """A queue whose maximum size can be changed while it is used."""
+
+    def resize(self, maxsize):
+        self._maxsize = maxsize
+        # Let the producers waiting for room in the queue put their items
+        for _i in range(max(0, maxsize - self.qsize())):
+            self._wakeup_next(self._putters)
+
+
+class PipelineController:
+    """
+    Tunes the depth of the queues of a pipeline, and periodically logs the metrics of its stages.
+
+    A queue is deepened when both the stage before and the stage after it spend time blocked on
+    it, which means the items come in bursts the queue cannot absorb. It is made shallower again
+    when the stage after it is never starved, in which case queued items only take up memory.
+    """
+
+    INTERVAL = 5
+
+    def __init__(self, stages, queues, min_queue_size):
+        """
+        Args:
+            stages (list): The stages of the pipeline.
+            queues (list): The :class:`_ResizableQueue` between each stage and the next one.
+            min_queue_size (int): The smallest depth of the queues.
+        """
+        self.stages = stages
+        self.queues = queues
+        self.min_queue_size = min_queue_size
+        self.max_queue_size = max(min_queue_size, settings.STAGES_MAX_QUEUE_SIZE)
+        self._blocked = self._snapshot()
+
+    def _snapshot(self):
+        return [(stage.metrics.get_blocked, stage.metrics.put_blocked) for stage in self.stages]
+
+    def tune(self, interval):
+        """Resize the queues from the time the stages were blocked on them during `interval`."""
+        blocked = self._snapshot()
+        for i, queue in enumerate(self.queues):
+            put_blocked = (blocked[i][1] - self._blocked[i][1]) / interval
+            get_blocked = (blocked[i + 1][0] - self._blocked[i + 1][0]) / interval
+            size = queue.maxsize
+            if put_blocked > 0.1 and get_blocked > 0.1:
+                size = min(size * 2, self.max_queue_size)
+            elif get_blocked < 0.01:
+                size = max(size // 2, self.min_queue_size)
+            if size != queue.maxsize:
+                log.debug(
+                    "Resizing the queue after %(name)s to %(size)d.",
+                    {"name": self.stages[i], "size": size},
+                )
+                queue.resize(size)
+        self._blocked = blocked
+
+    def report(self):
+        for stage in self.stages:
+            log.debug("%(name)s - %(metrics)s.", {"name": stage, "metrics": stage.metrics})
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.INTERVAL)
+            self.tune(self.INTERVAL)
+            self.report()
+
+
 async def create_pipeline(stages, maxsize=1):
     """
     A coroutine that builds a Stages API linear pipeline from the list `stages` and runs it.
@@ -191,10 +479,16 @@ async def create_pipeline(stages, maxsize=1):
                 async for d_content in self.items():  # Fetch items from the previous stage
                     await self.put(d_content)  # Hand them over to the next stage
 
+    When the `STAGES_ADAPTIVE_PIPELINE` setting is enabled, the batch size of each stage calling
+    `batches()` without a `minsize` is tuned from the time its batches take to handle, and the
+    queues are deepened up to `STAGES_MAX_QUEUE_SIZE` items where bursts of items stall the
+    stages around them (see :class:`PipelineController`). The metrics of each stage are logged
+    at the end of the pipeline in any case.
+
     Args:
         stages (list of coroutines): A list of Stages API compatible coroutines.
         maxsize (int): The maximum amount of items a queue between two stages should hold. Optional
-            and defaults to 1.
+            and defaults to 1. With an adaptive pipeline, this is the smallest depth of the queues.
 
     Returns:
         A single coroutine that can be used to run, wait, or cancel the entire pipeline with.
@@ -203,19 +497,29 @@ async def create_pipeline(stages, maxsize=1):
     """
     futures = []
     history = set()
+    queues = []
     in_q = None
+    adaptive = settings.STAGES_ADAPTIVE_PIPELINE and maxsize > 0
     for i, stage in enumerate(stages):
         if stage in history:
             raise ValueError(_("Each stage instance must be unique."))
         history.add(stage)
         if i < len(stages) - 1:
-            out_q = asyncio.Queue(maxsize=maxsize)
+            out_q = _ResizableQueue(maxsize=maxsize)
+            queues.append(out_q)
         else:
             out_q = None
         stage._connect(in_q, out_q)
+        if adaptive:
+            stage._batch_size = max(
+                settings.STAGES_MIN_BATCH_SIZE,
+                min(DEFAULT_BATCH_SIZE, settings.STAGES_MAX_BATCH_SIZE),
+            )
         futures.append(asyncio.ensure_future(stage()))
         in_q = out_q
 
+    controller = PipelineController(stages, queues, maxsize)
+    controller_future = asyncio.ensure_future(controller.run()) if adaptive else None
     try:
         await asyncio.gather(*futures)
     except Exception:
@@ -229,6 +533,10 @@ async def create_pipeline(stages, maxsize=1):
         if pending:
             await asyncio.wait(pending, timeout=60)
         raise
+    finally:
+        if controller_future:
+            controller_future.cancel()
+        controller.report()
 
 
 class EndStage(Stage):
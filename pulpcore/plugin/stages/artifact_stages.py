@@ -62,6 +62,21 @@ class QueryExistingArtifacts(Stage):
     call to the db for efficiency.
     """
 
+    def _existing_artifacts(self, digest_type, digests):
+        """
+        Return the existing Artifacts with one of the `digests` of type `digest_type`.
+
+        Their ``timestamp_of_interest`` is updated first, so that they cannot be cleaned up as
+        orphans while they are being associated with the content of the sync.
+        """
+        query_params = {
+            "{attr}__in".format(attr=digest_type): digests,
+            "pulp_domain": self.domain,
+        }
+        existing_artifacts_qs = Artifact.objects.filter(**query_params)
+        existing_artifacts_qs.touch()
+        return {getattr(artifact, digest_type): artifact for artifact in existing_artifacts_qs}
+
     async def run(self):
         """
         The coroutine for this stage.
@@ -88,26 +103,20 @@ class QueryExistingArtifacts(Stage):
                                 break
 
             # For each type of digest, fetch all the existing Artifacts where digest "in"
-            # the list we built earlier. Walk over all the artifacts again compare the
-            # digest of the new artifact to those of the existing ones - if one matches,
-            # swap it out with the existing one.
+            # the list we built earlier, keyed by that digest. Walk over all the artifacts again
+            # and look up the digest of the new artifact - if one matches, swap it out with the
+            # existing one.
             for digest_type, digests in artifact_digests_by_type.items():
-                query_params = {
-                    "{attr}__in".format(attr=digest_type): digests,
-                    "pulp_domain": self.domain,
-                }
-                existing_artifacts_qs = Artifact.objects.filter(**query_params)
-                existing_artifacts = sync_to_async_iterable(existing_artifacts_qs)
-                await sync_to_async(existing_artifacts_qs.touch)()
+                existing_artifacts = await sync_to_async(self._existing_artifacts)(
+                    digest_type, digests
+                )
+                if not existing_artifacts:
+                    continue
                 for d_content in batch:
                     for d_artifact in d_content.d_artifacts:
                         artifact_digest = getattr(d_artifact.artifact, digest_type)
-                        if artifact_digest:
-                            async for result in existing_artifacts:
-                                result_digest = getattr(result, digest_type)
-                                if result_digest == artifact_digest:
-                                    d_artifact.artifact = result
-                                    break
+                        if artifact_digest in existing_artifacts:
+                            d_artifact.artifact = existing_artifacts[artifact_digest]
             for d_content in batch:
                 await self.put(d_content)
 
@@ -273,13 +282,16 @@ class ArtifactSaver(Stage):
                     if d_artifact.artifact._state.adding and not d_artifact.deferred_download:
                         d_artifact.artifact.file = str(d_artifact.artifact.file)
                         da_to_save.append(d_artifact)
+            # Replicas of this stage can save the same artifacts concurrently, inserting them in
+            # the same order prevents deadlocks
             da_to_save_ordered = sorted(da_to_save, key=lambda x: x.artifact.sha256)
 
             if da_to_save:
                 for d_artifact, artifact in zip(
                     da_to_save_ordered,
-                    await sync_to_async(Artifact.objects.bulk_get_or_create)(
-                        d_artifact.artifact for d_artifact in da_to_save_ordered
+                    await self.run_sync(
+                        Artifact.objects.bulk_get_or_create,
+                        [d_artifact.artifact for d_artifact in da_to_save_ordered],
                     ),
                 ):
                     d_artifact.artifact = artifact
@@ -433,11 +445,11 @@ class RemoteArtifactSaver(Stage):
         # Artifact sha256 for our ordering.
         if ras_to_create:
             ras_to_create_ordered = sorted(list(ras_to_create.values()), key=lambda x: x.sha256)
-            await sync_to_async(RemoteArtifact.objects.bulk_create)(ras_to_create_ordered)
+            await self.run_sync(RemoteArtifact.objects.bulk_create, ras_to_create_ordered)
         if ras_to_update:
             ras_to_update_ordered = sorted(list(ras_to_update.values()), key=lambda x: x.sha256)
-            await sync_to_async(RemoteArtifact.objects.bulk_update)(
-                ras_to_update_ordered, fields=["url"]
+            await self.run_sync(
+                RemoteArtifact.objects.bulk_update, ras_to_update_ordered, fields=["url"]
             )
 
     @staticmethod
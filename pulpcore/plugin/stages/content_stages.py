@@ -2,8 +2,9 @@ from collections import defaultdict
 
 from asgiref.sync import sync_to_async
 from django.core.exceptions import ObjectDoesNotExist
-from django.db import IntegrityError, transaction
+from django.db import IntegrityError, connection, transaction
 from django.db.models import Q
+from django.db.models.signals import post_save, pre_save
 
 from pulpcore.plugin.sync import sync_to_async_iterable
 
@@ -86,8 +87,158 @@ class ContentSaver(Stage):
 
     This stage drains all available items from `self._in_q` and batches everything into one large
     call to the db for efficiency.
+
+    New content units whose saving does not involve any code, i.e. whose model does not override
+    `save()` and has no lifecycle hooks or save signals, are inserted with one statement per
+    content type. The units that exist already are looked up by their natural key afterwards,
+    comparing the values in the database.
+    Other content units are saved one by one.
     """
 
+    @staticmethod
+    def _can_bulk_create(model_type):
+        """Whether instances of `model_type` can be saved without calling their `save()`."""
+        if model_type.save is not Content.save or model_type._meta.get_parent_list() != [Content]:
+            return False
+        if pre_save.has_listeners(model_type) or post_save.has_listeners(model_type):
+            return False
+        # Methods decorated with django-lifecycle's @hook
+        return not any(
+            hasattr(attribute, "_hooked")
+            for klass in model_type.__mro__
+            for attribute in vars(klass).values()
+        )
+
+    @staticmethod
+    def _insert(model, fields, objs, returning=None):
+        """
+        Insert rows for `objs` into the table of `model`, skipping those conflicting with others.
+
+        Returns:
+            list: The values of the `returning` field of the inserted rows, if it is given.
+        """
+        columns = ", ".join(connection.ops.quote_name(field.column) for field in fields)
+        # Stay within the maximum number of parameters of a statement
+        chunk_size = max(1, 65535 // len(fields))
+        returned = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(objs), chunk_size):
+                chunk = objs[start : start + chunk_size]
+                placeholders = "({})".format(", ".join(["%s"] * len(fields)))
+                sql = "INSERT INTO {table} ({columns}) VALUES {rows} ON CONFLICT DO NOTHING".format(
+                    table=connection.ops.quote_name(model._meta.db_table),
+                    columns=columns,
+                    rows=", ".join([placeholders] * len(chunk)),
+                )
+                if returning:
+                    sql += " RETURNING {}".format(connection.ops.quote_name(returning.column))
+                params = [
+                    field.get_db_prep_save(field.pre_save(obj, True), connection)
+                    for obj in chunk
+                    for field in fields
+                ]
+                cursor.execute(sql, params)
+                if returning:
+                    returned.extend(row[0] for row in cursor.fetchall())
+        return returned
+
+    @staticmethod
+    def _select_existing(model, fields, objs):
+        """
+        Look up the rows of `model` having the same values of `fields` as each of `objs`.
+
+        The values are converted to the types of the columns and compared by the database, so they
+        match the stored rows whatever their Python types are. NULL values of nullable fields match
+        NULL values, like they do when looking up a content unit by its natural key.
+
+        Returns:
+            list: The pk of the matching row for each of `objs`, or None if there is none.
+        """
+        qn = connection.ops.quote_name
+        aliases = ["f{}".format(i) for i in range(len(fields))]
+        placeholders = "(%s::integer, {})".format(
+            ", ".join("%s::{}".format(field.cast_db_type(connection)) for field in fields)
+        )
+        # Stay within the maximum number of parameters of a statement
+        chunk_size = max(1, 65535 // (len(fields) + 1))
+        pks = [None] * len(objs)
+        with connection.cursor() as cursor:
+            for start in range(0, len(objs), chunk_size):
+                chunk = objs[start : start + chunk_size]
+                sql = (
+                    "SELECT v.idx, t.{pk} FROM (VALUES {rows}) AS v (idx, {aliases}) "
+                    "INNER JOIN {table} AS t ON {condition}"
+                ).format(
+                    pk=qn(model._meta.pk.column),
+                    rows=", ".join([placeholders] * len(chunk)),
+                    aliases=", ".join(aliases),
+                    table=qn(model._meta.db_table),
+                    condition=" AND ".join(
+                        "t.{} {} v.{}".format(
+                            qn(field.column), "IS NOT DISTINCT FROM" if field.null else "=", alias
+                        )
+                        for field, alias in zip(fields, aliases)
+                    ),
+                )
+                params = []
+                for idx, obj in enumerate(chunk, start):
+                    params.append(idx)
+                    params.extend(
+                        field.get_db_prep_save(field.pre_save(obj, True), connection)
+                        for field in fields
+                    )
+                cursor.execute(sql, params)
+                for idx, pk in cursor.fetchall():
+                    pks[idx] = pk
+        return pks
+
+    def _bulk_create(self, model_type, d_contents):
+        """
+        Save new content units of one type, or replace them with the existing ones.
+
+        Args:
+            model_type (type): The detail model of the content units.
+            d_contents (list): The :class:`~pulpcore.plugin.stages.DeclarativeContent` objects of
+                the content units, in the order to insert them.
+
+        Returns:
+            list: The :class:`~pulpcore.plugin.stages.DeclarativeContent` objects whose content
+                unit was created.
+        """
+        contents = [d_content.content for d_content in d_contents]
+        for content in contents:
+            if not content.pulp_type:
+                content.pulp_type = content.get_pulp_type()
+            setattr(content, model_type._meta.pk.attname, content.pulp_id)
+        # The foreign key from the detail to the master table is only checked at commit, so the
+        # master rows are inserted for the detail rows that did not conflict only.
+        created_pks = set(
+            self._insert(
+                model_type,
+                model_type._meta.local_concrete_fields,
+                contents,
+                returning=model_type._meta.pk,
+            )
+        )
+        created = [content for content in contents if content.pk in created_pks]
+        self._insert(Content, Content._meta.local_concrete_fields, created)
+        for content in created:
+            content._state.adding = False
+            content._state.db = connection.alias
+
+        existing = [d_c for d_c in d_contents if d_c.content.pk not in created_pks]
+        if existing:
+            fields = [model_type._meta.get_field(name) for name in model_type.natural_key_fields()]
+            pks = self._select_existing(model_type, fields, [d_c.content for d_c in existing])
+            results = model_type.objects.in_bulk({pk for pk in pks if pk is not None})
+            for d_content, pk in zip(existing, pks):
+                if pk is None:
+                    raise IntegrityError(
+                        "Could not create content {}.".format(d_content.content.natural_key())
+                    )
+                d_content.content = results[pk]
+        return [d_content for d_content in d_contents if d_content.content.pk in created_pks]
+
     async def run(self):
         """
         The coroutine for this stage.
@@ -99,7 +250,6 @@ class ContentSaver(Stage):
 
             def process_batch():
                 content_artifact_bulk = []
-                to_update_ca_query = ContentArtifact.objects.none()
                 to_update_ca_bulk = []
                 to_update_ca_artifact = {}
                 with transaction.atomic():
@@ -108,7 +258,34 @@ class ContentSaver(Stage):
                     # This prevents deadlocks when we're processing the same/similar content
                     # in concurrent workers.
                     batch.sort(key=lambda x: "".join(map(str, x.content.natural_key())))
+
+                    def add_content_artifacts(d_content):
+                        for d_artifact in d_content.d_artifacts:
+                            if not d_artifact.artifact._state.adding:
+                                artifact = d_artifact.artifact
+                            else:
+                                # set to None for on-demand synced artifacts
+                                artifact = None
+                            content_artifact = ContentArtifact(
+                                content=d_content.content,
+                                artifact=artifact,
+                                relative_path=d_artifact.relative_path,
+                            )
+                            content_artifact_bulk.append(content_artifact)
+
+                    to_bulk_create = defaultdict(list)
                     for d_content in batch:
+                        model_type = type(d_content.content)
+                        if d_content.content._state.adding and self._can_bulk_create(model_type):
+                            to_bulk_create[model_type].append(d_content)
+                    bulk_created = set()
+                    for model_type, d_contents in to_bulk_create.items():
+                        bulk_created.update(map(id, self._bulk_create(model_type, d_contents)))
+
+                    for d_content in batch:
+                        if id(d_content) in bulk_created:
+                            add_content_artifacts(d_content)
+                            continue
                         # Are we saving to the database for the first time?
                         content_already_saved = not d_content.content._state.adding
                         if not content_already_saved:
@@ -123,35 +300,27 @@ class ContentSaver(Stage):
                                 except ObjectDoesNotExist:
                                     raise e
                             else:
-                                for d_artifact in d_content.d_artifacts:
-                                    if not d_artifact.artifact._state.adding:
-                                        artifact = d_artifact.artifact
-                                    else:
-                                        # set to None for on-demand synced artifacts
-                                        artifact = None
-                                    content_artifact = ContentArtifact(
-                                        content=d_content.content,
-                                        artifact=artifact,
-                                        relative_path=d_artifact.relative_path,
-                                    )
-                                    content_artifact_bulk.append(content_artifact)
+                                add_content_artifacts(d_content)
                                 continue
                         # When the Content already exists, check if ContentArtifacts need to be
                         # updated
                         for d_artifact in d_content.d_artifacts:
                             if not d_artifact.artifact._state.adding:
                                 # the artifact is already present in the database; update references
-                                # Creating one large query and one large dictionary
-                                to_update_ca_query |= ContentArtifact.objects.filter(
-                                    content=d_content.content,
-                                    relative_path=d_artifact.relative_path,
-                                )
                                 key = (d_content.content.pk, d_artifact.relative_path)
                                 to_update_ca_artifact[key] = d_artifact.artifact
 
-                    # Query db once and update each object in memory for bulk_update call
+                    # Query db once and update each object in memory for bulk_update call.
+                    # The content artifacts are looked up by content only, and the other relative
+                    # paths of the same content are filtered out here. That keeps the statement
+                    # size and its planning time independent of the number of content artifacts.
+                    to_update_ca_query = ContentArtifact.objects.filter(
+                        content_id__in={content_pk for content_pk, _ in to_update_ca_artifact}
+                    ).select_related("artifact")
                     for content_artifact in to_update_ca_query.iterator():
                         key = (content_artifact.content_id, content_artifact.relative_path)
+                        if key not in to_update_ca_artifact:
+                            continue
                         # Same content/relpath/artifact-sha means no change to the
                         # contentartifact, ignore. This prevents us from colliding with any
                         # concurrent syncs with overlapping identical content. "Someone" updated
@@ -195,7 +364,7 @@ class ContentSaver(Stage):
 
                     self._post_save(batch)
 
-            await sync_to_async(process_batch)()
+            await self.run_sync(process_batch)
             for declarative_content in batch:
                 await self.put(declarative_content)
 
@@ -1,7 +1,9 @@
 import asyncio
 import tempfile
 
-from .api import create_pipeline, EndStage
+from django.conf import settings
+
+from .api import create_pipeline, EndStage, ShardedStage
 from .artifact_stages import (
     ACSArtifactHandler,
     ArtifactDownloader,
@@ -119,6 +121,9 @@ class DeclarativeVersion:
         can be achieved by returning a list with different stages or by extending
         the list returned by this method.
 
+        The stages saving artifacts and content are run as `STAGES_DATABASE_REPLICAS` parallel
+        replicas, see :class:`~pulpcore.plugin.stages.ShardedStage`.
+
         Args:
             new_version (:class:`~pulpcore.plugin.models.RepositoryVersion`): The
                 new repository version that is going to be built.
@@ -127,6 +132,14 @@ class DeclarativeVersion:
             list: List of :class:`~pulpcore.plugin.stages.Stage` instances
 
         """
+
+        def replicated(stage_class):
+            if settings.STAGES_DATABASE_REPLICAS > 1:
+                return ShardedStage(
+                    [stage_class() for _i in range(settings.STAGES_DATABASE_REPLICAS)]
+                )
+            return stage_class()
+
         pipeline = [
             self.first_stage,
             QueryExistingArtifacts(),
@@ -136,10 +149,10 @@ class DeclarativeVersion:
         pipeline.extend(
             [
                 ArtifactDownloader(),
-                ArtifactSaver(),
+                replicated(ArtifactSaver),
                 QueryExistingContents(),
-                ContentSaver(),
-                RemoteArtifactSaver(),
+                replicated(ContentSaver),
+                replicated(RemoteArtifactSaver),
                 ResolveContentFutures(),
             ]
         )
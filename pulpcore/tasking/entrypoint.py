@@ -18,8 +18,14 @@ _logger = logging.getLogger(__name__)
 @click.option(
     "--burst/--no-burst", help="Run in burst mode; terminate when no more tasks are available."
 )
+@click.option(
+    "--slots",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of tasks to run at once, sharing one heartbeat and database connection.",
+)
 @click.command()
-def worker(pid, burst):
+def worker(pid, burst, slots):
     """A Pulp worker."""
 
     if pid:
@@ -28,4 +34,4 @@ def worker(pid, burst):
 
     _logger.info("Starting distributed type worker")
 
-    PulpcoreWorker().run(burst=burst)
+    PulpcoreWorker(slots=slots).run(burst=burst)
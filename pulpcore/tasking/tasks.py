@@ -13,6 +13,7 @@ from django.utils import timezone
 from django_guid import get_guid, set_guid
 from django_guid.utils import generate_guid
 
+from pulpcore.app import pulp_hashlib
 from pulpcore.app.apps import MODULE_PLUGIN_VERSIONS
 from pulpcore.app.loggers import deprecation_logger
 from pulpcore.app.models import Task, TaskSchedule
@@ -75,6 +76,7 @@ def _execute_task(task):
     else:
         task.set_completed()
         _logger.info(_("Task completed %s"), task.pk)
+    _logger.debug(_("Hashing throughput of task %s: %s"), task.pk, pulp_hashlib.throughput())
 
 
 def dispatch(
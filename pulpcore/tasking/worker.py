@@ -18,6 +18,7 @@ from packaging.version import parse as parse_version
 
 from django.conf import settings
 from django.db import connection
+from django.db.models import Q
 from django.utils import timezone
 from django_guid import set_guid
 
@@ -55,6 +56,8 @@ TASK_KILL_INTERVAL = 1
 WORKER_CLEANUP_INTERVAL = 100
 # Randomly chosen
 TASK_SCHEDULING_LOCK = 42
+# Number of candidate tasks fetched at once while looking for a task to run
+TASK_SELECTION_WINDOW = 100
 
 
 def startup_hook():
@@ -90,14 +93,30 @@ class PGAdvisoryLock:
             raise RuntimeError("Lock not held.")
 
 
+class TaskSlot:
+    """A task process supervised by a worker running several tasks at once."""
+
+    def __init__(self, task, process, working_dir):
+        self.task = task
+        self.process = process
+        self.working_dir = working_dir
+        self.cancel_task = False
+        self.cancel_state = None
+        self.cancel_reason = None
+        self.kill_countdown = 0
+
+
 class PulpcoreWorker:
-    def __init__(self):
+    def __init__(self, slots=1):
         # Notification states from several signal handlers
         self.shutdown_requested = False
         self.wakeup = False
         self.cancel_task = False
 
         self.task = None
+        # Number of tasks to run at once, and the tasks running in pool mode by their pk
+        self.slots = slots
+        self.task_slots = {}
         self.name = f"{os.getpid()}@{socket.getfqdn()}"
         self.heartbeat_period = settings.WORKER_TTL / 3
         self.versions = {app.label: app.version for app in pulp_plugin_configs()}
@@ -137,6 +156,9 @@ class PulpcoreWorker:
         elif self.task and notification.channel == "pulp_worker_cancel":
             if notification.payload == str(self.task.pk):
                 self.cancel_task = True
+        elif notification.channel == "pulp_worker_cancel":
+            if notification.payload in self.task_slots:
+                self.task_slots[notification.payload].cancel_task = True
 
     def handle_worker_heartbeat(self):
         """
@@ -184,6 +206,7 @@ class PulpcoreWorker:
                 qs.delete()
 
     def beat(self):
+        """Write a heartbeat if it is due. Return ``True`` if it was written."""
         if self.worker.last_heartbeat < timezone.now() - timedelta(seconds=self.heartbeat_period):
             self.worker = self.handle_worker_heartbeat()
             if self.task_grace_timeout > 0:
@@ -194,6 +217,10 @@ class PulpcoreWorker:
                 self.worker_cleanup()
             with contextlib.suppress(AdvisoryLockError), PGAdvisoryLock(TASK_SCHEDULING_LOCK):
                 dispatch_scheduled_tasks()
+            # Abandoned tasks would hold back the tasks waiting for their resources
+            self.cancel_abandoned_tasks()
+            return True
+        return False
 
     def notify_workers(self):
         self.cursor.execute("NOTIFY pulp_worker_wakeup")
@@ -243,16 +270,48 @@ class PulpcoreWorker:
             return False
         return True
 
-    def iter_tasks(self):
-        """Iterate over ready tasks and yield each task while holding the lock."""
+    def cancel_abandoned_tasks(self):
+        """Cancel the running and canceling tasks no worker holds the lock of."""
+        for task in Task.objects.filter(
+            state__in=[TASK_STATES.RUNNING, TASK_STATES.CANCELING]
+        ).order_by("pulp_created"):
+            if str(task.pk) in self.task_slots or (self.task and self.task.pk == task.pk):
+                # Our own session holds the lock of the tasks we are running
+                continue
+            with contextlib.suppress(AdvisoryLockError), task:
+                # This code will only be called if we acquired the lock successfully
+                # The lock will be automatically be released at the end of the block
+                # Check if someone else changed the task before we got the lock
+                task.refresh_from_db()
+                if task.state == TASK_STATES.CANCELING and task.worker is None:
+                    # No worker picked this task up before being canceled
+                    self.cancel_abandoned_task(task, TASK_STATES.CANCELED)
+                elif task.state in [TASK_STATES.RUNNING, TASK_STATES.CANCELING]:
+                    # A running task without a lock must be abandoned
+                    self.cancel_abandoned_task(task, TASK_STATES.FAILED, "Worker has gone missing.")
+
+    def iter_runnable_tasks(self):
+        """
+        Iterate over the waiting tasks whose resources are not taken by an earlier task.
 
-        while not self.shutdown_requested:
-            taken_exclusive_resources = set()
-            taken_shared_resources = set()
-            # When batching this query, be sure to use "pulp_created" as a cursor
-            for task in Task.objects.filter(state__in=TASK_INCOMPLETE_STATES).order_by(
-                "pulp_created"
-            ):
+        A task conflicts with the unfinished tasks created before it: exclusive resources conflict
+        with any resource of the other task, shared resources ("shared:" prefixed) only with its
+        exclusive resources. The unfinished tasks are fetched in windows of
+        `TASK_SELECTION_WINDOW` tasks, using ("pulp_created", "pk") as a cursor, and the resources
+        taken so far are carried over from one window to the next, so each task is read once.
+        """
+        taken_exclusive_resources = set()
+        taken_shared_resources = set()
+        cursor = Q()
+        while True:
+            tasks = list(
+                Task.objects.filter(cursor, state__in=TASK_INCOMPLETE_STATES)
+                .order_by("pulp_created", "pk")
+                .only("pk", "pulp_created", "state", "reserved_resources_record")[
+                    :TASK_SELECTION_WINDOW
+                ]
+            )
+            for task in tasks:
                 reserved_resources_record = task.reserved_resources_record or []
                 exclusive_resources = [
                     resource
@@ -264,50 +323,49 @@ class PulpcoreWorker:
                     for resource in reserved_resources_record
                     if resource.startswith("shared:") and resource[7:] not in exclusive_resources
                 ]
+                # This statement is using lazy evaluation
+                if (
+                    task.state == TASK_STATES.WAITING
+                    # No exclusive resource taken?
+                    and not any(
+                        resource in taken_exclusive_resources
+                        or resource in taken_shared_resources
+                        for resource in exclusive_resources
+                    )
+                    # No shared resource exclusively taken?
+                    and not any(
+                        resource in taken_exclusive_resources for resource in shared_resources
+                    )
+                ):
+                    yield task
+                taken_exclusive_resources.update(exclusive_resources)
+                taken_shared_resources.update(shared_resources)
+            if len(tasks) < TASK_SELECTION_WINDOW:
+                break
+            last = tasks[-1]
+            cursor = Q(pulp_created__gt=last.pulp_created) | Q(
+                pulp_created=last.pulp_created, pk__gt=last.pk
+            )
+
+    def iter_tasks(self):
+        """Iterate over ready tasks and yield each task while holding the lock."""
+
+        while not self.shutdown_requested:
+            dispatched = False
+            # Tasks are dispatched for the whole pass, those unblocked meanwhile are found by the
+            # next one
+            for task in self.iter_runnable_tasks():
+                if self.shutdown_requested:
+                    break
+                if str(task.pk) in self.task_slots:
+                    continue
                 with contextlib.suppress(AdvisoryLockError), task:
-                    # This code will only be called if we acquired the lock successfully
-                    # The lock will be automatically be released at the end of the block
                     # Check if someone else changed the task before we got the lock
                     task.refresh_from_db()
-                    if task.state == TASK_STATES.CANCELING and task.worker is None:
-                        # No worker picked this task up before being canceled
-                        if self.cancel_abandoned_task(task, TASK_STATES.CANCELED):
-                            # Continue looking for the next task
-                            # without considering this tasks resources
-                            # as we just released them
-                            continue
-                    if task.state in [TASK_STATES.RUNNING, TASK_STATES.CANCELING]:
-                        # A running task without a lock must be abandoned
-                        if self.cancel_abandoned_task(
-                            task, TASK_STATES.FAILED, "Worker has gone missing."
-                        ):
-                            # Continue looking for the next task
-                            # without considering this tasks resources
-                            # as we just released them
-                            continue
-                    # This statement is using lazy evaluation
-                    if (
-                        task.state == TASK_STATES.WAITING
-                        and self.is_compatible(task)
-                        # No exclusive resource taken?
-                        and not any(
-                            resource in taken_exclusive_resources
-                            or resource in taken_shared_resources
-                            for resource in exclusive_resources
-                        )
-                        # No shared resource exclusively taken?
-                        and not any(
-                            resource in taken_exclusive_resources for resource in shared_resources
-                        )
-                    ):
+                    if task.state == TASK_STATES.WAITING and self.is_compatible(task):
                         yield task
-                        # Start from the top of the Task list
-                        break
-
-                # Record the resources of the pending task we didn't get
-                taken_exclusive_resources.update(exclusive_resources)
-                taken_shared_resources.update(shared_resources)
-            else:
+                        dispatched = True
+            if not dispatched:
                 # If we got here, there is nothing to do
                 break
 
@@ -377,27 +435,123 @@ class PulpcoreWorker:
                         cancel_state = TASK_STATES.FAILED
                         cancel_reason = "Aborted during worker shutdown."
             task_process.join()
-            if not cancel_state and task_process.exitcode != 0:
-                _logger.warning(
-                    "Task process for %s exited with non zero exitcode %i.",
-                    task.pk,
-                    task_process.exitcode,
-                )
-                cancel_state = TASK_STATES.FAILED
-                if task_process.exitcode < 0:
-                    cancel_reason = "Killed by signal {sig_num}.".format(
-                        sig_num=-task_process.exitcode
-                    )
-                else:
-                    cancel_reason = "Task process died unexpectedly with exitcode {code}.".format(
-                        code=task_process.exitcode
-                    )
+            if not cancel_state:
+                cancel_state, cancel_reason = self.check_exitcode(task, task_process)
             if cancel_state:
                 self.cancel_abandoned_task(task, cancel_state, cancel_reason)
         if task.reserved_resources_record:
             self.notify_workers()
         self.task = None
 
+    def check_exitcode(self, task, task_process):
+        """Return the state and reason to cancel a task with, if its process failed."""
+        if task_process.exitcode == 0:
+            return None, None
+        _logger.warning(
+            "Task process for %s exited with non zero exitcode %i.",
+            task.pk,
+            task_process.exitcode,
+        )
+        if task_process.exitcode < 0:
+            cancel_reason = "Killed by signal {sig_num}.".format(sig_num=-task_process.exitcode)
+        else:
+            cancel_reason = "Task process died unexpectedly with exitcode {code}.".format(
+                code=task_process.exitcode
+            )
+        return TASK_STATES.FAILED, cancel_reason
+
+    def start_task(self, task):
+        """Start the process of a task in a free slot.
+
+        This function must only be called while holding the lock for that task. The lock is taken
+        once more, and kept until the task is finished."""
+
+        task.__enter__()
+        task.worker = self.worker
+        task.save(update_fields=["worker"])
+        working_dir = TemporaryDirectory(dir=".")
+        task_process = Process(target=_perform_task, args=(task.pk, working_dir.name))
+        task_process.start()
+        self.task_slots[str(task.pk)] = TaskSlot(task, task_process, working_dir)
+
+    def finish_task(self, slot):
+        """Clean up after the process of a task in a slot ended, and free the slot."""
+        task = slot.task
+        slot.process.join()
+        cancel_state, cancel_reason = slot.cancel_state, slot.cancel_reason
+        if not cancel_state:
+            cancel_state, cancel_reason = self.check_exitcode(task, slot.process)
+        if cancel_state:
+            self.cancel_abandoned_task(task, cancel_state, cancel_reason)
+        slot.working_dir.cleanup()
+        task.__exit__(None, None, None)
+        del self.task_slots[str(task.pk)]
+        if task.reserved_resources_record:
+            self.notify_workers()
+        # Look for the next task, even in burst mode where we are not listening for wakeups
+        self.wakeup = True
+
+    def supervise_task_slots(self, burst=False):
+        """Run up to `slots` tasks at once and supervise their processes while heart beating.
+
+        All the tasks share the heartbeat and the database connection of this worker."""
+
+        self.wakeup = True
+        while True:
+            if self.wakeup and not self.shutdown_requested:
+                self.wakeup = False
+                if len(self.task_slots) < self.slots:
+                    for task in self.iter_tasks():
+                        self.start_task(task)
+                        if len(self.task_slots) >= self.slots:
+                            break
+            if not self.task_slots and (burst or self.shutdown_requested):
+                break
+
+            r, w, x = select.select(
+                [self.sentinel, connection.connection]
+                + [slot.process.sentinel for slot in self.task_slots.values()],
+                [],
+                [],
+                self.heartbeat_period,
+            )
+            if not r:
+                # Tasks can become runnable without a wakeup notification, e.g. when the worker
+                # holding their resources goes missing, or in burst mode.
+                self.wakeup = True
+            heartbeat = self.beat()
+            if connection.connection in r:
+                connection.connection.execute("SELECT 1")
+            if self.sentinel in r:
+                os.read(self.sentinel, 256)
+
+            for slot in list(self.task_slots.values()):
+                task = slot.task
+                if slot.process.sentinel in r and not slot.process.is_alive():
+                    self.finish_task(slot)
+                    continue
+                if slot.cancel_task:
+                    _logger.info(_("Received signal to cancel task %s."), task.pk)
+                    slot.cancel_state = TASK_STATES.CANCELED
+                    slot.cancel_task = False
+                if self.shutdown_requested and not slot.cancel_state:
+                    if self.task_grace_timeout != 0:
+                        if heartbeat:
+                            _logger.info(
+                                "Worker shutdown requested, waiting for task %s to finish.", task.pk
+                            )
+                    else:
+                        _logger.info("Aborting task %s due to worker shutdown.", task.pk)
+                        slot.cancel_state = TASK_STATES.FAILED
+                        slot.cancel_reason = "Aborted during worker shutdown."
+                if slot.cancel_state:
+                    if heartbeat and slot.kill_countdown > 0:
+                        slot.kill_countdown -= 1
+                    if slot.kill_countdown == 0:
+                        _logger.info("Aborting task %s due to cancelation.", task.pk)
+                        os.kill(slot.process.pid, signal.SIGUSR1)
+                        slot.kill_countdown = TASK_KILL_INTERVAL
+
     def run(self, burst=False):
         with WorkerDirectory(self.name):
             signal.signal(signal.SIGINT, self._signal_handler)
@@ -406,7 +560,15 @@ class PulpcoreWorker:
             # Subscribe to pgsql channels
             connection.connection.add_notify_handler(self._pg_notify_handler)
             self.cursor.execute("LISTEN pulp_worker_cancel")
-            if burst:
+            # Later, this is done with every heartbeat
+            self.cancel_abandoned_tasks()
+            if self.slots > 1:
+                if not burst:
+                    self.cursor.execute("LISTEN pulp_worker_wakeup")
+                self.supervise_task_slots(burst=burst)
+                if not burst:
+                    self.cursor.execute("UNLISTEN pulp_worker_wakeup")
+            elif burst:
                 for task in self.iter_tasks():
                     self.supervise_task(task)
             else:
@@ -0,0 +1,64 @@
+import hashlib
+import pytest
+from unittest.mock import Mock
+
+from django.core.files.base import ContentFile
+
+from pulpcore.app.util import current_domain
+from pulpcore.content.artifact_cache import ArtifactDiskCache
+
+
+def _artifact(data):
+    return Mock(sha256=hashlib.sha256(data).hexdigest(), size=len(data), file=ContentFile(data))
+
+
+@pytest.mark.asyncio
+async def test_get_or_fill(tmp_path):
+    cache = ArtifactDiskCache(tmp_path, max_size=10)
+    artifact = _artifact(b"abcd")
+
+    path = await cache.get_or_fill(artifact)
+    with open(path, "rb") as f:
+        assert f.read() == b"abcd"
+    assert path == str(tmp_path / artifact.sha256[:2] / artifact.sha256[2:])
+    assert await cache.get_or_fill(artifact) == path
+    assert cache.stats() == {"hits": 1, "misses": 1, "size": 4}
+
+    assert await cache.get_or_fill(_artifact(b"too large to be cached")) is None
+
+
+@pytest.mark.asyncio
+async def test_least_recently_read_are_evicted(tmp_path):
+    cache = ArtifactDiskCache(tmp_path, max_size=10)
+    a, b, c = _artifact(b"aaaa"), _artifact(b"bbbb"), _artifact(b"cccc")
+    await cache.get_or_fill(a)
+    await cache.get_or_fill(b)
+    await cache.get_or_fill(a)
+    await cache.get_or_fill(c)
+
+    assert cache.get(a.sha256) is not None
+    assert cache.get(b.sha256) is None
+    assert cache.get(c.sha256) is not None
+
+    # Another process finds the cached artifacts
+    assert ArtifactDiskCache(tmp_path, max_size=10).get(c.sha256) is not None
+
+
+@pytest.mark.asyncio
+async def test_fill_in_current_domain(tmp_path):
+    """The artifact is read from the storage of the domain of the request."""
+    cache = ArtifactDiskCache(tmp_path, max_size=10)
+    artifact = _artifact(b"abcd")
+    domains = []
+    open_file = artifact.file.open
+
+    def _open(*args):
+        domains.append(current_domain.get())
+        return open_file(*args)
+
+    artifact.file.open = _open
+    domain = Mock()
+    current_domain.set(domain)
+
+    assert await cache.get_or_fill(artifact) is not None
+    assert domains == [domain]
@@ -0,0 +1,62 @@
+import pytest
+from unittest.mock import Mock
+from uuid import uuid4
+
+from pulpcore.content.distribution_cache import DistributionCache
+
+
+@pytest.fixture
+def distribution_cache():
+    cache = DistributionCache()
+    cache.listening = True
+    return cache
+
+
+def _distribution(domain_pk, base_path):
+    return Mock(pulp_domain_id=domain_pk, base_path=base_path)
+
+
+def test_longest_prefix_match(distribution_cache):
+    domain_pk = uuid4()
+    foo = _distribution(domain_pk, "foo")
+    foo_bar = _distribution(domain_pk, "foo/bar")
+    distribution_cache.add(foo)
+    distribution_cache.add(foo_bar)
+
+    assert distribution_cache.get(domain_pk, "foo/file") is foo
+    assert distribution_cache.get(domain_pk, "foo/bar/baz/file") is foo_bar
+    assert distribution_cache.get(domain_pk, "foo/barbaz/file") is foo
+    assert distribution_cache.get(domain_pk, "foo") is None
+    assert distribution_cache.get(uuid4(), "foo/file") is None
+    assert distribution_cache.stats() == {"hits": 3, "misses": 2, "size": 2}
+
+
+def test_invalidate(distribution_cache):
+    domain_pk = uuid4()
+    distribution_cache.add(_distribution(domain_pk, "foo"))
+    distribution_cache.add(_distribution(domain_pk, "bar"))
+
+    distribution_cache.handle_notification(f"{domain_pk}:foo")
+    assert distribution_cache.get(domain_pk, "foo/file") is None
+    assert distribution_cache.get(domain_pk, "bar/file") is not None
+
+    distribution_cache.handle_notification("")
+    assert distribution_cache.get(domain_pk, "bar/file") is None
+
+
+def test_expired_entries_are_dropped(distribution_cache):
+    domain_pk = uuid4()
+    distribution_cache.ttl = -1
+    distribution_cache.add(_distribution(domain_pk, "foo"))
+
+    assert distribution_cache.get(domain_pk, "foo/file") is None
+    assert distribution_cache.stats()["size"] == 0
+
+
+def test_not_listening(distribution_cache):
+    domain_pk = uuid4()
+    distribution_cache.listening = False
+    distribution_cache.add(_distribution(domain_pk, "foo"))
+
+    assert distribution_cache.get(domain_pk, "foo/file") is None
+    assert distribution_cache.stats()["size"] == 0
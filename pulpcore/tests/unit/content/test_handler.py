@@ -1,9 +1,12 @@
+import asyncio
 import pytest
 import uuid
 
 from unittest.mock import Mock, AsyncMock
 
 from pulpcore.content import Handler
+from pulpcore.content.distribution_cache import DistributionCache
+from pulpcore.content.handler import SharedDownload
 from pulpcore.plugin.models import (
     Artifact,
     Content,
@@ -267,3 +270,145 @@ def test_pull_through_save_multi_artifact_content(
     artifacts = set(ca.content._artifacts.all())
     assert len(artifacts) == 2
     assert {artifact, artifact123} == artifacts
+
+
+@pytest.mark.asyncio
+async def test_merge_directory_entries():
+    """Sorted directory entries of several sources are merged and deduplicated."""
+
+    async def entries(*items):
+        for item in items:
+            yield item
+
+    merged = Handler._merge_directory_entries(
+        entries(("a", 1, None), ("c/", 3, None)),
+        entries(("a", 2, 10), ("b", None, 5)),
+        entries(),
+    )
+    assert [entry async for entry in merged] == [("a", 2, 10), ("b", None, 5), ("c/", 3, None)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures("fake_domain")
+async def test_match_distribution_cached(monkeypatch):
+    """Cached distributions are matched without querying the database."""
+    distribution_cache = DistributionCache()
+    distribution_cache.listening = True
+    monkeypatch.setattr(Handler, "distribution_cache", distribution_cache)
+    query_distribution = Mock(return_value=Mock())
+    monkeypatch.setattr(Handler, "_query_distribution", query_distribution)
+    distro = Distribution(name="foo", base_path="foo")
+    distribution_cache.add(distro)
+
+    assert await Handler._amatch_distribution("foo/bar") is distro
+    query_distribution.assert_not_called()
+
+    assert await Handler._amatch_distribution("baz/bar") is query_distribution.return_value
+    query_distribution.assert_called_once_with("baz/bar")
+
+
+def test_render_html(settings):
+    """The listing has a link per entry, in sorted order, and a link to the parent."""
+    html = Handler.render_html({"b/", "a"}, path="/pulp/content/foo/", sizes={"a": 2048})
+    assert html.index('<a href="../">../</a>') < html.index('<a href="a">a</a>')
+    assert html.index('<a href="a">a</a>') < html.index('<a href="b/">b/</a>')
+    assert "2.0 kB" in html
+
+
+@pytest.mark.asyncio
+async def test_shared_download(tmp_path):
+    """Readers of a shared download get the data written so far, and wait for the rest."""
+    shared = SharedDownload()
+    shared.attach()
+    path = tmp_path / "download"
+    path.write_bytes(b"abc")
+
+    waiter = asyncio.create_task(shared.wait(lambda: shared.size > 3))
+    await shared.append(str(path), 3)
+    assert shared.read(1, 10) == b"bc"
+    assert not waiter.done()
+
+    with path.open("ab") as f:
+        f.write(b"def")
+    await shared.append(str(path), 3)
+    await waiter
+    assert shared.read(3, 10) == b"def"
+
+    await shared.finish()
+    assert shared.read(0, 6) == b"abcdef"
+    shared.release()
+    assert shared._fd is None
+
+
+@pytest.mark.asyncio
+async def test_shared_download_error():
+    """Readers of a failed shared download get its error."""
+    shared = SharedDownload()
+    await shared.finish(error=RuntimeError("boom"))
+    with pytest.raises(RuntimeError):
+        await shared.wait(lambda: shared.size > 0)
+
+
+@pytest.mark.asyncio
+async def test_shared_download_cancelled():
+    """Readers of a cancelled shared download are woken up with an error."""
+    handler = Handler()
+    downloader = Mock(run=AsyncMock(side_effect=asyncio.Event().wait))
+    remote = Mock(get_downloader=Mock(return_value=downloader))
+    shared = SharedDownload()
+    handler.shared_downloads["key"] = shared
+    task = asyncio.create_task(
+        handler._run_shared_download("key", shared, remote, Mock(), False, Mock())
+    )
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    assert "key" not in handler.shared_downloads
+    with pytest.raises(RuntimeError):
+        await shared.wait(lambda: shared.size > 0)
+
+
+class FakeDownloader:
+    """A downloader writing `data` to a file, like the ones of on-demand remotes."""
+
+    def __init__(self, path, data):
+        self.path = str(path)
+        self.data = data
+        self._writer = open(path, "wb")
+
+    async def handle_data(self, data):
+        self._writer.write(data)
+
+    async def finalize(self):
+        pass
+
+    async def run(self):
+        await self.handle_data(self.data)
+        await self.finalize()
+        self._writer.close()
+        return Mock()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size,expected", [(6, b"ef"), (None, b"abcdef")])
+async def test_stream_remote_artifact_suffix_range(tmp_path, settings, size, expected):
+    """A suffix range is resolved with the size of the artifact, the whole one is sent without."""
+    settings.ON_DEMAND_RANGE_REQUESTS = False
+    downloader = FakeDownloader(tmp_path / "download", b"abcdef")
+    remote = Mock(pk=uuid.uuid4(), policy="on_demand", get_downloader=Mock(return_value=downloader))
+    remote_artifact = Mock(size=size, url="http://example.com/a")
+    remote_artifact.remote.acast = AsyncMock(return_value=remote)
+    request = Mock(match_info={"path": "a"}, http_range=slice(-2, None))
+    response = Mock(status=200, prepared=False, prepare=AsyncMock(), write_eof=AsyncMock())
+    written = []
+    response.write = AsyncMock(side_effect=written.append)
+
+    await Handler()._stream_remote_artifact(request, response, remote_artifact, save_artifact=False)
+
+    assert b"".join(written) == expected
+    if size:
+        response.set_status.assert_called_once_with(206)
+    else:
+        response.set_status.assert_not_called()
@@ -0,0 +1,31 @@
+from pulpcore.content.range_cache import RangeCache
+
+
+def test_store_and_lookup(tmp_path):
+    cache = RangeCache(100, directory=str(tmp_path))
+    cache.store("url", 10, b"abcde", total=1000, headers={"ETag": "1"})
+    cache.store("url", 15, b"fghij")
+
+    path, headers = cache.lookup("url", 12, 18)
+    with open(path, "rb") as f:
+        f.seek(10)
+        assert f.read(10) == b"abcdefghij"
+    assert headers == {"ETag": "1"}
+    assert cache.lookup("url", 5, 12) is None
+    assert cache.lookup("other", 10, 15) is None
+    assert cache.total("url") == 1000
+    assert cache.size == 10
+
+
+def test_least_recently_used_are_evicted(tmp_path):
+    cache = RangeCache(10, directory=str(tmp_path))
+    cache.store("a", 0, b"aaaa")
+    cache.store("b", 0, b"bbbb")
+    cache.lookup("a", 0, 4)
+    cache.store("c", 0, b"cccc")
+
+    assert cache.lookup("a", 0, 4) is not None
+    assert cache.lookup("b", 0, 4) is None
+    assert cache.lookup("c", 0, 4) is not None
+    assert cache.size == 8
+    assert len(list(tmp_path.iterdir())) == 2
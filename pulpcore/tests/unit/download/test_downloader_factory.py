@@ -29,3 +29,17 @@ async def test_custom_headers():
     factory = DownloaderFactory(remote)
     downloader = factory.build(remote.url)
     assert downloader.session.headers["Connection"] == "keep-alive"
+
+
+@pytest.mark.asyncio
+async def test_connection_pooling(settings):
+    settings.DOWNLOAD_CONNECTION_POOLING = True
+    remote = Remote(url="http://example.org/", download_concurrency=5, name="foo")
+    factory = DownloaderFactory(remote)
+    downloader = factory.build(remote.url)
+    assert not downloader.session.connector.force_close
+    assert downloader.session.connector.limit_per_host == 5
+
+    factory._stop_pooling()
+    downloader = factory.build(remote.url)
+    assert downloader.session.connector.force_close
@@ -0,0 +1,122 @@
+import aiohttp
+import asyncio
+import hashlib
+import pytest
+import threading
+from multidict import CIMultiDict
+from unittest.mock import AsyncMock, MagicMock
+
+from pulpcore.app import pulp_hashlib
+from pulpcore.app.models import Artifact
+from pulpcore.download import HttpDownloader
+
+
+@pytest.fixture(autouse=True)
+def _patch_digest_fields(monkeypatch):
+    monkeypatch.setattr(Artifact, "DIGEST_FIELDS", {"sha256"})
+
+
+def _response(status, headers, chunks):
+    response = MagicMock(status=status, headers=CIMultiDict(headers))
+    response.content.read = AsyncMock(side_effect=chunks)
+    response.release = AsyncMock()
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=False)
+    return context
+
+
+@pytest.mark.asyncio
+async def test_resume_download(tmp_path, monkeypatch):
+    """A download failing midway is resumed with a Range request on retry."""
+    monkeypatch.chdir(tmp_path)
+    session = MagicMock()
+    session.get.side_effect = [
+        _response(
+            200,
+            {"Accept-Ranges": "bytes", "ETag": '"1"'},
+            [b"abc", aiohttp.ClientPayloadError("connection reset")],
+        ),
+        _response(206, {"Content-Range": "bytes 3-5/6"}, [b"def", b""]),
+    ]
+    downloader = HttpDownloader(
+        "http://example.com/file",
+        session=session,
+        max_retries=1,
+        expected_digests={"sha256": hashlib.sha256(b"abcdef").hexdigest()},
+        expected_size=6,
+    )
+
+    result = await downloader.run()
+
+    with open(result.path, "rb") as f:
+        assert f.read() == b"abcdef"
+    assert session.get.call_args.kwargs["headers"] == {"Range": "bytes=3-", "If-Range": '"1"'}
+
+
+@pytest.mark.asyncio
+async def test_resume_download_restarts(tmp_path, monkeypatch):
+    """A download starts over if the server sends the whole file again on retry."""
+    monkeypatch.chdir(tmp_path)
+    session = MagicMock()
+    session.get.side_effect = [
+        _response(
+            200,
+            {"Accept-Ranges": "bytes"},
+            [b"abc", aiohttp.ClientPayloadError("connection reset")],
+        ),
+        _response(200, {}, [b"abcdef", b""]),
+    ]
+    downloader = HttpDownloader(
+        "http://example.com/file",
+        session=session,
+        max_retries=1,
+        expected_digests={"sha256": hashlib.sha256(b"abcdef").hexdigest()},
+    )
+
+    result = await downloader.run()
+
+    with open(result.path, "rb") as f:
+        assert f.read() == b"abcdef"
+
+
+@pytest.mark.asyncio
+async def test_resume_download_after_timeout_while_hashing(tmp_path, monkeypatch):
+    """A download timing out while a chunk is hashed is resumed after the chunk."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pulp_hashlib, "PARALLEL_HASHING_THRESHOLD", 1)
+    session = MagicMock()
+    session.get.side_effect = [
+        _response(200, {"Accept-Ranges": "bytes", "ETag": '"1"'}, [b"abc", b""]),
+        _response(206, {"Content-Range": "bytes 3-5/6"}, [b"def", b""]),
+    ]
+    downloader = HttpDownloader(
+        "http://example.com/file",
+        session=session,
+        max_retries=1,
+        expected_digests={"sha256": hashlib.sha256(b"abcdef").hexdigest()},
+        expected_size=6,
+    )
+    # The first chunk is hashed until after the first attempt timed out
+    hashed = threading.Event()
+    record = downloader._record_size_and_digests_for_data
+
+    def slow_record(data):
+        hashed.wait()
+        record(data)
+
+    downloader._record_size_and_digests_for_data = slow_record
+    handle_response = downloader._handle_response
+
+    async def handle_response_with_timeout(response):
+        return await asyncio.wait_for(handle_response(response), 0.5)
+
+    downloader._handle_response = handle_response_with_timeout
+    asyncio.get_event_loop().call_later(1, hashed.set)
+
+    result = await downloader.run()
+
+    with open(result.path, "rb") as f:
+        assert f.read() == b"abcdef"
+    assert session.get.call_args.kwargs["headers"] == {"Range": "bytes=3-", "If-Range": '"1"'}
+    assert result.artifact_attributes["size"] == 6
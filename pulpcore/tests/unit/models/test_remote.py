@@ -1,11 +1,12 @@
 import pytest
+from unittest.mock import Mock
 from uuid import uuid4
 from cryptography.fernet import InvalidToken
 
 from django.core.management import call_command
 from django.db import connection
 
-from pulpcore.app.models import Remote, Domain
+from pulpcore.app.models import Distribution, Remote, Domain
 from pulpcore.app.models.fields import _fernet, EncryptedTextField
 
 
@@ -75,3 +76,17 @@ def test_rotate_db_key(fake_fernet):
     del domain.storage_settings
     with pytest.raises(InvalidToken):
         domain.storage_settings
+
+
+@pytest.mark.django_db
+def test_update_invalidates_distribution_cache(monkeypatch):
+    remote = Remote.objects.create(name=uuid4(), url="http://example.com/")
+    distribution = Distribution.objects.create(name=uuid4(), base_path=str(uuid4()), remote=remote)
+    notify = Mock()
+    monkeypatch.setattr("pulpcore.app.models.repository.notify_distribution_cache", notify)
+
+    remote.url = "http://example.org/"
+    remote.save()
+
+    notify.assert_called_once()
+    assert list(notify.call_args.args[0]) == [(distribution.pulp_domain_id, distribution.base_path)]
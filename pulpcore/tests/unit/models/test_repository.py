@@ -1,9 +1,18 @@
 import pytest
+from unittest import mock
 from uuid import uuid4
 
 from itertools import compress
 
-from pulpcore.plugin.models import Content, Repository
+from pulpcore.app.models import repository as repository_module
+from pulpcore.plugin.models import (
+    Content,
+    ContentArtifact,
+    Distribution,
+    Repository,
+    RepositoryContent,
+)
+from pulpcore.plugin.repo_version_utils import remove_duplicates, validate_duplicate_content
 
 
 def pks_of_next_qs(qs_generator):
@@ -212,6 +221,32 @@ def test_content_batch_qs_using_filter(repository, content_pks, add_content):
         pks_of_next_qs(qs_generator)
 
 
+def test_path_index(repository, content_pks, add_content):
+    """Verify the relative path index is built on completion and dropped on deletion."""
+    for i, content_pk in enumerate(content_pks):
+        ContentArtifact.objects.create(content_id=content_pk, relative_path=f"path/{i}")
+
+    with repository.new_version() as version1:
+        add_content(version1, [1, 1, 0, 0, 0])
+        assert not version1.paths.exists()
+
+    with repository.new_version() as version2:
+        add_content(version2, [0, 0, 1, 0, 0])
+
+    assert set(version1.paths.values_list("relative_path", flat=True)) == {"path/0", "path/1"}
+    assert set(version2.paths.values_list("relative_path", flat=True)) == {
+        "path/0",
+        "path/1",
+        "path/2",
+    }
+    path = version2.paths.get(relative_path="path/2")
+    assert path.content_artifact.content_id == content_pks[2]
+
+    version1.delete()
+    assert not version1.paths.exists()
+    assert version2.paths.count() == 3
+
+
 @pytest.mark.django_db
 def test_next_version_with_one_version():
     repository = Repository.objects.create()
@@ -258,3 +293,57 @@ def test_next_version_with_multiple_versions():
 
     assert repository.next_version == 4
     assert repository.latest_version().number == 1
+
+
+def test_add_content_creates_time_ordered_ids(repository, add_content):
+    """Verify the memberships created by the database get the same kind of ids as Python's."""
+    with repository.new_version() as version1:
+        add_content(version1, [1, 1, 1, 1, 1])
+
+    memberships = RepositoryContent.objects.filter(version_added=version1)
+    assert memberships.count() == 5
+    for membership in memberships:
+        assert membership.pulp_id.version == 7
+        milliseconds = membership.pulp_id.int >> 80
+        assert abs(milliseconds - membership.pulp_created.timestamp() * 1000) < 60000
+
+
+def test_remove_duplicates_with_null_repo_key(repository, monkeypatch):
+    """Content with a NULL repository key field is replaced by content with a NULL one."""
+    monkeypatch.setattr(Repository, "CONTENT_TYPES", [Content])
+    monkeypatch.setattr(Content, "repo_key_fields", ("upstream_id",))
+    old, new, other, keyed = (
+        Content.objects.create(pulp_type="core.content", upstream_id=upstream_id)
+        for upstream_id in (None, None, uuid4(), uuid4())
+    )
+    with repository.new_version() as version1:
+        version1.add_content(Content.objects.filter(pk__in=[old.pk, other.pk]))
+    with repository.new_version() as version2:
+        version2.add_content(Content.objects.filter(pk__in=[new.pk, keyed.pk]))
+        remove_duplicates(version2)
+
+    assert set(version2.content.values_list("pk", flat=True)) == {new.pk, other.pk, keyed.pk}
+    validate_duplicate_content(version2)
+
+
+def test_new_version_invalidates_changed_paths(repository, content_pks, monkeypatch, settings):
+    """A new version only invalidates the cached paths of the content it added or removed."""
+    settings.CACHE_ENABLED = True
+    settings.CACHE_DELTA_INVALIDATION_MAX_PATHS = 2
+    invalidate_cache_paths = mock.Mock()
+    monkeypatch.setattr(repository_module, "invalidate_cache_paths", invalidate_cache_paths)
+    Distribution.objects.create(name=uuid4(), base_path="base", repository=repository)
+    for i, content_pk in enumerate(content_pks):
+        ContentArtifact.objects.create(content_id=content_pk, relative_path=f"path/{i}")
+    with repository.new_version() as version1:
+        version1.add_content(Content.objects.filter(pk__in=content_pks[:2]))
+    with repository.new_version() as version2:
+        version2.remove_content(Content.objects.filter(pk=content_pks[0]))
+        version2.add_content(Content.objects.filter(pk__in=content_pks[2:]))
+
+    (base_paths, paths), _ = invalidate_cache_paths.call_args_list[0]
+    assert list(base_paths) == ["base"]
+    assert paths == {"path/0", "path/1"}
+    # More paths changed than CACHE_DELTA_INVALIDATION_MAX_PATHS, everything is invalidated
+    (base_paths, paths), _ = invalidate_cache_paths.call_args_list[1]
+    assert paths is None
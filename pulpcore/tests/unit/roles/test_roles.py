@@ -4,7 +4,7 @@ from uuid import uuid4
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
 
-from pulpcore.app.models import Group, Remote, Repository
+from pulpcore.app.models import Domain, Group, Remote, Repository
 from pulpcore.app.models.role import Role
 from pulpcore.app.role_util import assign_role, remove_role, get_objects_for_user
 
@@ -30,6 +30,16 @@ def role2(db):
     return role2
 
 
+@pytest.fixture
+def role3(db):
+    role3 = Role.objects.create(name="role3")
+    role3.permissions.add(
+        Permission.objects.get(content_type__app_label="core", codename="view_repository"),
+        Permission.objects.get(content_type__app_label="core", codename="view_group"),
+    )
+    return role3
+
+
 @pytest.fixture
 def user(db):
     return User.objects.create(username=uuid4())
@@ -125,3 +135,16 @@ def test_combination_role(user, group, repository, repository2, remote, remote2,
     ) == {remote.pk, remote2.pk}
     remove_role("role2", group)
     remove_role("role1", user, repository)
+
+
+def test_objects_for_user_mixed_roles(user, group, repository, repository2, role1, role3):
+    """Roles on objects of other types, whose ids are not uuids, are not matched."""
+    assign_role("role3", user, group)
+    assign_role("role3", user, repository)
+    qs = Repository.objects.all()
+    assert set(get_objects_for_user(user, "core.view_repository", qs)) == {repository}
+    assign_role("role1", group, domain=Domain.objects.get(name="default"))
+    assert set(get_objects_for_user(user, "core.view_repository", qs)) == set(qs)
+    remove_role("role1", group, domain=Domain.objects.get(name="default"))
+    remove_role("role3", user, repository)
+    remove_role("role3", user, group)
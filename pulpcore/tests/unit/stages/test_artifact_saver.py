@@ -0,0 +1,45 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+
+from pulpcore.plugin.models import Artifact
+from pulpcore.plugin.stages import (
+    ArtifactSaver,
+    DeclarativeArtifact,
+    DeclarativeContent,
+    ShardedStage,
+)
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db(transaction=True)
+async def test_replicas_saving_the_same_artifact(tmp_path):
+    """Replicas saving the same artifact for different content units end up with the same one."""
+    d_contents = []
+    for i in range(2):
+        tmp_file = tmp_path / str(i)
+        tmp_file.write_text("shared")
+        d_artifact = DeclarativeArtifact(
+            artifact=Artifact.init_and_validate(str(tmp_file)),
+            url="http://example.com/",
+            relative_path=str(i),
+            remote=Mock(),
+        )
+        d_contents.append(DeclarativeContent(content=Mock(), d_artifacts=[d_artifact]))
+    stage = ShardedStage([ArtifactSaver(), ArtifactSaver()])
+    # Each content unit is handled by its own replica
+    shards = {id(d_content): i for i, d_content in enumerate(d_contents)}
+    stage._shard = lambda d_content: shards[id(d_content)]
+    in_q, out_q = asyncio.Queue(), asyncio.Queue()
+    stage._connect(in_q, out_q)
+    for d_content in d_contents:
+        in_q.put_nowait(d_content)
+    in_q.put_nowait(None)
+
+    await stage()
+
+    artifacts = [d_content.d_artifacts[0].artifact for d_content in d_contents]
+    assert not artifacts[0]._state.adding
+    assert artifacts[0].pk == artifacts[1].pk
+    assert await Artifact.objects.filter(sha256=artifacts[0].sha256).acount() == 1
@@ -0,0 +1,62 @@
+import pytest
+
+from pulpcore.plugin.models import Content
+from pulpcore.plugin.stages import ContentSaver, DeclarativeContent
+
+
+@pytest.fixture
+def pulp_id_natural_key(monkeypatch):
+    """Use the pk as the natural key of Content, so that inserts can conflict on it."""
+    monkeypatch.setattr(Content, "natural_key_fields", classmethod(lambda cls: ("pulp_id",)))
+
+
+def _d_content(**kwargs):
+    return DeclarativeContent(content=Content(pulp_type="core.content", **kwargs))
+
+
+@pytest.mark.django_db
+def test_bulk_create_new_content(pulp_id_natural_key):
+    d_contents = [_d_content(), _d_content()]
+
+    assert ContentSaver()._bulk_create(Content, d_contents) == d_contents
+
+    for d_content in d_contents:
+        assert not d_content.content._state.adding
+    pks = [d_content.content.pk for d_content in d_contents]
+    assert Content.objects.filter(pk__in=pks).count() == 2
+
+
+@pytest.mark.django_db
+def test_bulk_create_existing_content(pulp_id_natural_key):
+    existing = Content.objects.create(pulp_type="core.content")
+    # The natural key differs in its Python type from the one of the stored row.
+    d_content = _d_content(pulp_id=str(existing.pk))
+
+    assert ContentSaver()._bulk_create(Content, [d_content]) == []
+
+    assert d_content.content.pk == existing.pk
+    assert not d_content.content._state.adding
+
+
+@pytest.mark.django_db
+def test_bulk_create_mixed_content(pulp_id_natural_key):
+    existing = Content.objects.create(pulp_type="core.content")
+    new, conflicting = _d_content(), _d_content(pulp_id=existing.pk)
+
+    assert ContentSaver()._bulk_create(Content, [new, conflicting]) == [new]
+
+    assert conflicting.content.pk == existing.pk
+    assert Content.objects.filter(pk__in=[new.content.pk, existing.pk]).count() == 2
+
+
+@pytest.mark.django_db
+def test_bulk_create_existing_content_null_natural_key(monkeypatch):
+    monkeypatch.setattr(
+        Content, "natural_key_fields", classmethod(lambda cls: ("pulp_id", "upstream_id"))
+    )
+    existing = Content.objects.create(pulp_type="core.content", upstream_id=None)
+    d_content = _d_content(pulp_id=existing.pk, upstream_id=None)
+
+    assert ContentSaver()._bulk_create(Content, [d_content]) == []
+
+    assert d_content.content.pk == existing.pk
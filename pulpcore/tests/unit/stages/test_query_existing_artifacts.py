@@ -0,0 +1,58 @@
+import asyncio
+import uuid
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+from django.utils import timezone
+
+from pulpcore.plugin.models import Artifact
+from pulpcore.plugin.stages import DeclarativeArtifact, DeclarativeContent
+from pulpcore.plugin.stages.artifact_stages import QueryExistingArtifacts
+
+
+def _d_artifact(artifact):
+    return DeclarativeArtifact(
+        artifact=artifact, url="http://example.com/", relative_path="path", remote=Mock()
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.django_db
+async def test_query_existing_artifacts(tmp_path):
+    tmp_file = tmp_path / str(uuid.uuid4())
+    tmp_file.write_text(str(tmp_file))
+    existing = Artifact.init_and_validate(str(tmp_file))
+    await existing.asave()
+    long_ago = timezone.now() - timedelta(days=1)
+    await Artifact.objects.filter(pk=existing.pk).aupdate(timestamp_of_interest=long_ago)
+
+    matching = _d_artifact(Artifact(sha256=existing.sha256, size=existing.size))
+    unknown = _d_artifact(Artifact(sha256=uuid.uuid4().hex * 2, size=1))
+    d_content = DeclarativeContent(content=Mock(), d_artifacts=[matching, unknown])
+
+    timestamps = []
+
+    class OutQueue(asyncio.Queue):
+        async def put(self, item):
+            if item is not None:
+                artifact = await Artifact.objects.aget(pk=existing.pk)
+                timestamps.append(artifact.timestamp_of_interest)
+            await super().put(item)
+
+    in_q, out_q = asyncio.Queue(), OutQueue()
+    stage = QueryExistingArtifacts()
+    stage._connect(in_q, out_q)
+    in_q.put_nowait(d_content)
+    in_q.put_nowait(None)
+
+    try:
+        await stage()
+
+        assert out_q.get_nowait() is d_content
+        assert matching.artifact.pk == existing.pk
+        assert unknown.artifact._state.adding
+        # The existing artifact was touched before the content was passed on
+        assert timestamps[0] > long_ago
+    finally:
+        await existing.adelete()
@@ -1,9 +1,12 @@
 import asyncio
+import threading
+
 import pytest
 
 import mock
 
-from pulpcore.plugin.stages import Stage, EndStage, DeclarativeContent
+from pulpcore.plugin.stages import Stage, EndStage, DeclarativeContent, ShardedStage
+from pulpcore.plugin.stages.api import PipelineController, _ResizableQueue
 
 
 pytestmark = pytest.mark.usefixtures("fake_domain")
@@ -154,3 +157,117 @@ async def test_batch_queue_and_min_sizes():
                 last_stage._connect(queues[1], queues[2])
                 end_stage._connect(queues[2], None)
                 await asyncio.gather(last_stage(), middle_stage(), first_stage(), end_stage())
+
+
+def test_tune_batch_size(stage, settings):
+    settings.STAGES_MIN_BATCH_SIZE = 10
+    settings.STAGES_MAX_BATCH_SIZE = 1000
+    settings.STAGES_BATCH_DURATION = 1.0
+    # Fast batches grow at most twofold
+    assert stage._tune_batch_size(100, 0.01) == 200
+    stage._throughput = None
+    assert stage._tune_batch_size(100, 0.5) == 200
+    stage._throughput = None
+    assert stage._tune_batch_size(100, 2.0) == 50
+    stage._throughput = None
+    assert stage._tune_batch_size(600, 0.01) == 1000
+    stage._throughput = None
+    assert stage._tune_batch_size(15, 100.0) == 10
+
+
+@pytest.mark.asyncio
+async def test_queue_deepened_when_both_stages_block(settings):
+    settings.STAGES_MAX_QUEUE_SIZE = 4
+    producer, consumer = Stage(), Stage()
+    queue = _ResizableQueue(maxsize=1)
+    controller = PipelineController([producer, consumer], [queue], 1)
+
+    await queue.put(1)
+    put = asyncio.ensure_future(queue.put(2))
+    await asyncio.sleep(0)
+    assert not put.done()
+
+    producer.metrics.put_blocked += 1
+    consumer.metrics.get_blocked += 1
+    controller.tune(1)
+    assert queue.maxsize == 2
+    await asyncio.wait_for(put, 1)
+
+    producer.metrics.put_blocked += 10
+    consumer.metrics.get_blocked += 10
+    controller.tune(1)
+    assert queue.maxsize == 4
+
+    # The consumer does not wait for items anymore
+    producer.metrics.put_blocked += 1
+    controller.tune(1)
+    assert queue.maxsize == 2
+
+
+class ThreadRecordingStage(Stage):
+    async def run(self):
+        async for batch in self.batches(minsize=1):
+            thread = await self.run_sync(lambda: threading.current_thread().name)
+            for d_content in batch:
+                d_content.threads.append(thread)
+                await self.put(d_content)
+
+
+@pytest.mark.asyncio
+async def test_sharded_stage():
+    items = [mock.Mock(key=i % 3, threads=[]) for i in range(30)]
+    in_q, out_q = asyncio.Queue(), asyncio.Queue()
+    for item in items:
+        in_q.put_nowait(item)
+    in_q.put_nowait(None)
+    stage = ShardedStage([ThreadRecordingStage() for _ in range(2)], key=lambda d: d.key)
+    stage._connect(in_q, out_q)
+
+    await stage()
+
+    out = []
+    while (item := out_q.get_nowait()) is not None:
+        out.append(item)
+    assert sorted(out, key=id) == sorted(items, key=id)
+    threads_by_key = {}
+    for item in items:
+        threads_by_key.setdefault(item.key, set()).update(item.threads)
+    # Each key is handled by a single replica, in its own thread
+    assert all(len(threads) == 1 for threads in threads_by_key.values())
+    assert all(
+        thread.startswith("ThreadRecordingStage-") for item in items for thread in item.threads
+    )
+
+
+class HoldingStage(Stage):
+    def __init__(self, release):
+        super().__init__()
+        self.release = release
+
+    async def run(self):
+        async for d_content in self.items():
+            await self.release.wait()
+            await self.put(d_content)
+
+
+@pytest.mark.asyncio
+async def test_sharded_stage_does_not_preserve_order():
+    held, passed = asyncio.Event(), asyncio.Event()
+    passed.set()
+    in_q, out_q = asyncio.Queue(), asyncio.Queue()
+    stage = ShardedStage([HoldingStage(held), HoldingStage(passed)], key=lambda d: d.key)
+    stage._connect(in_q, out_q)
+    items = [mock.Mock(key=i) for i in range(10)]
+    slow = next(item for item in items if stage._shard(item) == 0)
+    fast = next(item for item in items if stage._shard(item) == 1)
+    in_q.put_nowait(slow)
+    in_q.put_nowait(fast)
+    in_q.put_nowait(None)
+    future = asyncio.ensure_future(stage())
+
+    # The item of the second replica is passed on while the first replica still holds its own
+    assert await asyncio.wait_for(out_q.get(), 1) is fast
+    held.set()
+    assert await asyncio.wait_for(out_q.get(), 1) is slow
+    await future
+    assert out_q.get_nowait() is None
@@ -3,6 +3,7 @@ from time import sleep
 
 import pulpcore.app.redis_connection
 from pulpcore.cache import Cache
+from pulpcore.cache.cache import LocalCache, _namespaced, dump_entry, load_entry
 
 
 @pytest.fixture
@@ -106,3 +107,53 @@ def test_clear(pulp_redisdb):
     cache.redis.flushdb()
     for key, _, base_key in tuples:
         assert not cache.exists(key, base_key=base_key)
+
+
+def test_content_cache_namespace(pulp_redisdb):
+    """Tests that the content app entries are kept apart from legacy ones, and deleted with them"""
+    cache = Cache()
+    cache.set("key", "legacy", base_key="base")
+    cache.redis.hset(_namespaced("base"), "key", dump_entry({"type": "Response"}))
+    assert cache.get("key", base_key="base") == b"legacy"
+
+    cache.delete("key", base_key="base")
+    assert not cache.redis.hexists(_namespaced("base"), "key")
+    cache.redis.hset(_namespaced("base"), "key", dump_entry({"type": "Response"}))
+    cache.delete(base_key=["base"])
+    assert not cache.redis.exists(_namespaced("base"))
+
+
+def test_entry_format():
+    """Tests serializing entries with binary bodies, compressed or not"""
+    entry = {"headers": {}, "status": 200, "type": "Response"}
+    for body in (b"\x00\xff", b"\x00" * 4096):
+        assert load_entry(dump_entry(entry, body)) == {**entry, "body": body}
+    assert len(dump_entry(entry, b"\x00" * 4096)) < 4096
+    assert load_entry(dump_entry(entry)) == entry
+    # entries stored by older content apps
+    assert load_entry(b'{"body": "00ff", "type": "Response"}') == {
+        "body": b"\x00\xff",
+        "type": "Response",
+    }
+    with pytest.raises(ValueError):
+        load_entry(b"\x07\x00\x00\x00\x00")
+
+
+def test_local_cache():
+    """Tests the eviction and invalidation of the entries of the local cache"""
+    cache = LocalCache(10, ttl=60)
+    cache.set("base1", "key1", b"aaaa")
+    assert cache.get("base1", "key1") is None  # not listening to invalidations
+    cache.listening = True
+    cache.set("base1", "key1", b"aaaa")
+    cache.set("base1", "key2", b"bbbb")
+    cache.get("base1", "key1")
+    cache.set("base2", "key1", b"cccc")
+    assert cache.get("base1", "key1") == b"aaaa"
+    assert cache.get("base1", "key2") is None
+    assert cache.get("base2", "key1") == b"cccc"
+
+    cache.handle_message(b'["base1"]')
+    assert cache.get("base1", "key1") is None
+    assert cache.get("base2", "key1") == b"cccc"
+    assert cache.size == 4
@@ -0,0 +1,49 @@
+import hashlib
+import io
+import os
+import tarfile
+
+import pytest
+
+from pulpcore.app.export_writers import ChunkedHashingWriter, ParallelGzipWriter
+
+
+def test_chunked_hashing_writer(tmp_path):
+    path = str(tmp_path / "export.tar.gz")
+    with ChunkedHashingWriter(path, chunk_size=4) as writer:
+        writer.write(b"abcdef")
+        writer.write(b"gh")
+        writer.write(b"i")
+
+    assert writer.hashes == {
+        path + ".0000": hashlib.sha256(b"abcd").hexdigest(),
+        path + ".0001": hashlib.sha256(b"efgh").hexdigest(),
+        path + ".0002": hashlib.sha256(b"i").hexdigest(),
+    }
+    assert writer.global_hash.hexdigest() == hashlib.sha256(b"abcdefghi").hexdigest()
+    with open(path + ".0001", "rb") as f:
+        assert f.read() == b"efgh"
+
+
+def test_chunked_hashing_writer_removes_files_on_error(tmp_path):
+    path = str(tmp_path / "export.tar.gz")
+    with pytest.raises(RuntimeError):
+        with ChunkedHashingWriter(path) as writer:
+            writer.write(b"abcdef")
+            raise RuntimeError()
+
+    assert os.listdir(tmp_path) == []
+
+
+def test_parallel_gzip_writer_is_readable_by_tarfile():
+    data = os.urandom(1000) * 100
+    output = io.BytesIO()
+    with ParallelGzipWriter(output, threads=3, block_size=4096) as compressed:
+        with tarfile.open("export.tar.gz", "w|", fileobj=compressed) as tar:
+            info = tarfile.TarInfo(name="data")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+    output.seek(0)
+    with tarfile.open(fileobj=output, mode="r:gz") as tar:
+        assert tar.extractfile("data").read() == data
@@ -0,0 +1,102 @@
+import hashlib
+import io
+import json
+import pytest
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+from rest_framework.serializers import ValidationError
+
+from pulpcore.app.models import Artifact
+from pulpcore.app.tasks.importer import (
+    ARTIFACT_MEMBER_RE,
+    _import_artifact_file,
+    _import_artifacts,
+    _place_artifact_file,
+    _place_artifact_files,
+)
+
+
+def test_artifact_member_re():
+    sha256 = hashlib.sha256(b"abc").hexdigest()
+    for prefix in ("artifact/", "artifact/domain/"):
+        name = f"{prefix}{sha256[:2]}/{sha256[2:]}"
+        match = ARTIFACT_MEMBER_RE.match(name)
+        assert match.group(1) + match.group(2) == sha256
+    assert ARTIFACT_MEMBER_RE.match("pulpcore.app.modelresource.ArtifactResource.json") is None
+    assert ARTIFACT_MEMBER_RE.match(f"artifact/{sha256[:2]}/{sha256[2:]}/../x") is None
+
+
+def test_place_artifact_file_checks_sha256():
+    with pytest.raises(ValidationError):
+        _place_artifact_file(hashlib.sha256(b"abc").hexdigest(), b"abd")
+
+
+def test_import_artifact_file_checks_sha256_before_save(tmp_path, monkeypatch):
+    storage = Mock()
+    storage.exists.return_value = False
+    monkeypatch.setattr("pulpcore.app.tasks.importer.default_storage", storage)
+    sha256 = hashlib.sha256(b"abc").hexdigest()
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for data in (b"abd", b"abc"):
+            member = tarfile.TarInfo(f"artifact/{sha256[:2]}/{sha256[2:]}")
+            member.size = len(data)
+            tar.addfile(member, io.BytesIO(data))
+    buffer.seek(0)
+
+    with tarfile.open(fileobj=buffer, mode="r") as tar:
+        corrupted, valid = tar.getmembers()
+        with pytest.raises(ValidationError):
+            _import_artifact_file(tar, corrupted, sha256, tmp_path)
+        storage.save.assert_not_called()
+
+        storage.save.side_effect = lambda name, content: content.read()
+        assert _import_artifact_file(tar, valid, sha256, tmp_path) is True
+        storage.save.assert_called_once()
+        assert storage.save.call_args.args[0] == f"artifact/{sha256[:2]}/{sha256[2:]}"
+
+
+def _artifact_row(data):
+    sha256 = hashlib.sha256(data).hexdigest()
+    row = dict.fromkeys(("md5", "sha1", "sha224", "sha384", "sha512"), "")
+    row.update(
+        file=f"artifact/{sha256[:2]}/{sha256[2:]}", size=len(data), sha256=sha256, pulp_domain=""
+    )
+    return row
+
+
+@pytest.mark.django_db
+def test_import_artifacts(tmp_path, monkeypatch):
+    monkeypatch.setattr(Artifact, "DIGEST_FIELDS", {"sha256"})
+    rows = [_artifact_row(b"a"), _artifact_row(b"b")]
+    Artifact.objects.create(file=rows[0]["file"], size=1, sha256=rows[0]["sha256"])
+    fpath = tmp_path / "artifacts.json"
+    fpath.write_text(json.dumps(rows))
+    pb = Mock()
+
+    assert _import_artifacts(fpath, pb) == 1
+
+    pb.increase_by.assert_called_once_with(2)
+    artifact = Artifact.objects.get(sha256=rows[1]["sha256"])
+    assert artifact.size == 1
+    assert artifact.sha512 is None
+
+
+@pytest.mark.django_db
+def test_place_artifact_files_restores_missing_files(monkeypatch):
+    monkeypatch.setattr(Artifact, "DIGEST_FIELDS", {"sha256"})
+    storage = Mock()
+    storage.exists.side_effect = lambda name: name.endswith(present[2:])
+    monkeypatch.setattr("pulpcore.app.tasks.importer.default_storage", storage)
+    batch = {hashlib.sha256(data).hexdigest(): data for data in (b"a", b"b", b"c")}
+    missing, present, new = batch
+    for sha256 in (missing, present):
+        Artifact.objects.create(file=f"artifact/{sha256[:2]}/{sha256[2:]}", size=1, sha256=sha256)
+
+    with ThreadPoolExecutor(2) as executor:
+        assert _place_artifact_files(dict(batch), executor) == 2
+
+    saved = sorted(call.args[0] for call in storage.save.call_args_list)
+    assert saved == sorted(f"artifact/{sha256[:2]}/{sha256[2:]}" for sha256 in (missing, new))
@@ -0,0 +1,32 @@
+import io
+from unittest.mock import Mock
+
+import pytest
+
+from pulpcore.app.importexport import _artifact_files
+
+
+def _storage(files):
+    storage = Mock()
+    storage.open.side_effect = lambda name, mode: io.BytesIO(files[name])
+    return storage
+
+
+@pytest.mark.parametrize("prefetch", [0, 2])
+def test_artifact_files(settings, monkeypatch, prefetch):
+    settings.EXPORT_PREFETCH_ARTIFACTS = prefetch
+    monkeypatch.setattr("pulpcore.app.importexport.PREFETCH_MAX_ARTIFACT_SIZE", 3)
+    files = {"a": b"aaa", "b": b"bbbb", "c": b"c", "d": b"dd"}
+    artifacts = [Mock(size=len(data), file=Mock()) for data in files.values()]
+    for artifact, name in zip(artifacts, files):
+        artifact.file.name = name
+    storage = _storage(files)
+
+    result = [
+        (artifact, fileobj.read())
+        for artifact, fileobj in _artifact_files(artifacts, storage, "storage.class")
+    ]
+
+    assert result == list(zip(artifacts, files.values()))
+    # Every file is read once
+    assert sorted(call.args[0] for call in storage.open.call_args_list) == ["a", "b", "c", "d"]
@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+import pytest
+
+from pulpcore.app.tasks.orphan import _delete_files
+
+
+def test_delete_files():
+    domain = Mock(storage_class="pulpcore.app.models.storage.FileSystem")
+    storage = Mock()
+    storage.delete.side_effect = lambda name: name == "c" and 1 / 0
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert _delete_files(domain, storage, ["a", "b", "c"], executor) == 1
+
+    assert sorted(call.args[0] for call in storage.delete.call_args_list) == ["a", "b", "c"]
+
+
+def test_delete_files_s3(monkeypatch):
+    pytest.importorskip("storages")
+    monkeypatch.setattr("pulpcore.app.tasks.orphan.S3_DELETE_OBJECTS_MAX_KEYS", 2)
+    domain = Mock(storage_class="storages.backends.s3boto3.S3Boto3Storage")
+    storage = Mock()
+    storage._normalize_name.side_effect = lambda name: "prefix/" + name
+    storage.bucket.delete_objects.side_effect = [{}, {"Errors": [{"Key": "prefix/c"}]}]
+
+    assert _delete_files(domain, storage, ["a", "b", "c"], executor=None) == 1
+
+    requests = [call.kwargs["Delete"] for call in storage.bucket.delete_objects.call_args_list]
+    assert requests == [
+        {"Objects": [{"Key": "prefix/a"}, {"Key": "prefix/b"}], "Quiet": True},
+        {"Objects": [{"Key": "prefix/c"}], "Quiet": True},
+    ]
+    storage.delete.assert_not_called()
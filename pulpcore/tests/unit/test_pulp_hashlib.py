@@ -0,0 +1,17 @@
+import hashlib
+
+from pulpcore.app import pulp_hashlib
+
+
+def test_hashers():
+    """All the hashers are updated with small and large chunks, and the throughput is recorded."""
+    hashers = pulp_hashlib.Hashers(["sha256", "sha512"])
+    small = b"a" * 10
+    large = b"b" * pulp_hashlib.PARALLEL_HASHING_THRESHOLD
+    hashers.update(small)
+    hashers.update(large)
+
+    assert set(hashers) == {"sha256", "sha512"}
+    assert hashers["sha256"].hexdigest() == hashlib.sha256(small + large).hexdigest()
+    assert hashers["sha512"].hexdigest() == hashlib.sha512(small + large).hexdigest()
+    assert pulp_hashlib.throughput()["sha256"]["bytes"] >= len(small + large)
@@ -30,3 +30,18 @@ def test_get_view_name_for_model_not_found(monkeypatch):
     monkeypatch.setattr(util, "get_viewset_for_model", mock.Mock())
     with pytest.raises(LookupError):
         util.get_view_name_for_model(mock.Mock(), "foo")
+
+
+def test_cache_entry_keys(settings):
+    settings.CONTENT_PATH_PREFIX = "/pulp/content/"
+    settings.DOMAIN_ENABLED = False
+    keys = util.cache_entry_keys("base", ["a/b/c.txt"])
+    paths = {key.rsplit(":", 1)[0] for key in keys}
+    assert paths == {
+        "/pulp/content/base",
+        "/pulp/content/base/",
+        "/pulp/content/base/a/",
+        "/pulp/content/base/a/b/",
+        "/pulp/content/base/a/b/c.txt",
+    }
+    assert "/pulp/content/base/a/b/c.txt:HEAD" in keys
@@ -0,0 +1,234 @@
+import signal
+from datetime import timedelta
+from unittest.mock import MagicMock, Mock
+from uuid import uuid4
+
+import pytest
+from django.utils import timezone
+
+from pulpcore.app.models import Task
+from pulpcore.constants import TASK_STATES
+from pulpcore.tasking import worker as worker_module
+from pulpcore.tasking.worker import PulpcoreWorker
+
+
+class FakeProcess:
+    """A task process that is done as soon as its sentinel is selected."""
+
+    def __init__(self, target, args):
+        self.sentinel = object()
+        self.pid = 0
+        self.exitcode = 0
+        self.started = False
+
+    def start(self):
+        self.started = True
+
+    def is_alive(self):
+        return False
+
+    def join(self):
+        pass
+
+
+def _task():
+    task = MagicMock()
+    task.pk = uuid4()
+    task.reserved_resources_record = []
+    return task
+
+
+@pytest.fixture
+def worker(monkeypatch, tmp_path):
+    """A worker with `slots` slots, running its tasks in fake processes."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(worker_module, "connection", Mock())
+    monkeypatch.setattr(worker_module, "Process", FakeProcess)
+    worker = PulpcoreWorker.__new__(PulpcoreWorker)
+    worker.shutdown_requested = False
+    worker.wakeup = False
+    worker.task = None
+    worker.slots = 2
+    worker.task_slots = {}
+    worker.worker = Mock()
+    worker.heartbeat_period = 1
+    worker.task_grace_timeout = 0
+    worker.sentinel = object()
+    worker.beat = Mock(return_value=False)
+    worker.cancel_abandoned_task = Mock()
+    worker.pending = []
+    worker.started = []
+
+    def iter_tasks():
+        while worker.pending:
+            task = worker.pending.pop(0)
+            worker.started.append((task, len(worker.task_slots)))
+            yield task
+
+    worker.iter_tasks = iter_tasks
+    return worker
+
+
+def _select(*steps):
+    """Fake `select.select`, returning the sentinels returned by each step in turn."""
+    steps = iter(steps)
+
+    def select(r, w, x, timeout):
+        return next(steps)(r), [], []
+
+    return Mock(select=select)
+
+
+def _finished(r):
+    return r[2:]
+
+
+def test_supervise_task_slots_runs_tasks_in_slots(worker, monkeypatch):
+    worker.pending = [_task(), _task(), _task()]
+    monkeypatch.setattr(worker_module, "select", _select(_finished, _finished))
+
+    worker.supervise_task_slots(burst=True)
+
+    # The third task waits for a free slot
+    assert [slots for task, slots in worker.started] == [0, 1, 0]
+    assert not worker.task_slots
+    for task, slots in worker.started:
+        task.__enter__.assert_called_once()
+        task.__exit__.assert_called_once()
+    worker.cancel_abandoned_task.assert_not_called()
+
+
+def test_supervise_task_slots_rescans_on_timeout(worker, monkeypatch):
+    task = _task()
+
+    def timeout(r):
+        # The task becomes runnable without notification
+        worker.pending.append(task)
+        return []
+
+    def finish(r):
+        worker.shutdown_requested = True
+        return _finished(r)
+
+    monkeypatch.setattr(worker_module, "select", _select(timeout, finish))
+
+    worker.supervise_task_slots()
+
+    assert worker.started == [(task, 0)]
+    assert not worker.task_slots
+
+
+def test_supervise_task_slots_cancels_task(worker, monkeypatch):
+    task = _task()
+    worker.pending = [task]
+    kill = Mock()
+    monkeypatch.setattr(worker_module.os, "kill", kill)
+
+    def cancel(r):
+        worker._pg_notify_handler(Mock(channel="pulp_worker_cancel", payload=str(task.pk)))
+        return []
+
+    monkeypatch.setattr(worker_module, "select", _select(cancel, _finished))
+
+    worker.supervise_task_slots(burst=True)
+
+    kill.assert_called_once_with(0, signal.SIGUSR1)
+    worker.cancel_abandoned_task.assert_called_once_with(task, TASK_STATES.CANCELED, None)
+    assert not worker.task_slots
+
+
+@pytest.fixture
+def create_task(db):
+    """Create tasks with the given resources, each one created a second after the previous."""
+    now = timezone.now()
+    created = []
+
+    def _create_task(resources, state=TASK_STATES.WAITING, pulp_created=None):
+        task = Task.objects.create(name=uuid4(), state=state, reserved_resources_record=resources)
+        pulp_created = pulp_created or now + timedelta(seconds=len(created))
+        Task.objects.filter(pk=task.pk).update(pulp_created=pulp_created)
+        created.append(task)
+        return task
+
+    return _create_task
+
+
+def _runnable_tasks():
+    worker = PulpcoreWorker.__new__(PulpcoreWorker)
+    return [task.pk for task in worker.iter_runnable_tasks()]
+
+
+def test_runnable_tasks_exclusive_resources(create_task):
+    running = create_task(["a"], state=TASK_STATES.RUNNING)
+    blocked = create_task(["a", "b"])
+    runnable = create_task(["c"])
+    blocked_by_waiting = create_task(["b"])
+    create_task(["c"], state=TASK_STATES.COMPLETED)
+    after_completed = create_task(["d"])
+
+    assert _runnable_tasks() == [runnable.pk, after_completed.pk]
+
+    Task.objects.filter(pk=running.pk).update(state=TASK_STATES.COMPLETED)
+    assert _runnable_tasks() == [blocked.pk, runnable.pk, after_completed.pk]
+    assert blocked_by_waiting.pk not in _runnable_tasks()
+
+
+def test_runnable_tasks_shared_resources(create_task):
+    shared = create_task(["shared:a"], state=TASK_STATES.RUNNING)
+    also_shared = create_task(["shared:a", "b"])
+    exclusive = create_task(["a"])
+    shared_after_exclusive = create_task(["shared:a"])
+
+    assert _runnable_tasks() == [also_shared.pk]
+
+    Task.objects.filter(pk__in=[shared.pk, also_shared.pk]).update(state=TASK_STATES.COMPLETED)
+    assert _runnable_tasks() == [exclusive.pk]
+
+    Task.objects.filter(pk=exclusive.pk).update(state=TASK_STATES.COMPLETED)
+    assert _runnable_tasks() == [shared_after_exclusive.pk]
+
+
+def test_runnable_tasks_window_boundaries(create_task, monkeypatch):
+    monkeypatch.setattr(worker_module, "TASK_SELECTION_WINDOW", 2)
+    pulp_created = timezone.now()
+    # Tasks sharing the timestamp at the boundary of a window
+    tasks = [create_task([str(i)], pulp_created=pulp_created) for i in range(5)]
+    tasks.append(create_task(["5"]))
+
+    assert sorted(_runnable_tasks()) == sorted(task.pk for task in tasks)
+    assert len(_runnable_tasks()) == len(tasks)
+
+
+def test_runnable_tasks_window_carries_resources(
+    create_task, monkeypatch, django_assert_num_queries
+):
+    monkeypatch.setattr(worker_module, "TASK_SELECTION_WINDOW", 2)
+    create_task(["a"], state=TASK_STATES.RUNNING)
+    first_b = create_task(["b"])
+    shared_c = create_task(["shared:c"])
+    create_task(["b"])
+    create_task(["a"])
+
+    # Each task is read once, the resources taken in a window block the tasks of the next ones
+    with django_assert_num_queries(3):
+        assert _runnable_tasks() == [first_b.pk, shared_c.pk]
+
+
+def test_cancel_abandoned_tasks(create_task):
+    running = create_task(["a"], state=TASK_STATES.RUNNING)
+    canceling = create_task(["b"], state=TASK_STATES.CANCELING)
+    in_slot = create_task(["c"], state=TASK_STATES.RUNNING)
+    waiting = create_task(["d"])
+    worker = PulpcoreWorker.__new__(PulpcoreWorker)
+    worker.task = None
+    worker.task_slots = {str(in_slot.pk): Mock()}
+    worker.notify_workers = Mock()
+
+    worker.cancel_abandoned_tasks()
+
+    states = dict(Task.objects.values_list("pk", "state"))
+    assert states[running.pk] == TASK_STATES.FAILED
+    assert states[canceling.pk] == TASK_STATES.CANCELED
+    assert states[in_slot.pk] == TASK_STATES.RUNNING
+    assert states[waiting.pk] == TASK_STATES.WAITING
+    assert worker.notify_workers.call_count == 2